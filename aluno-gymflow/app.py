@@ -0,0 +1,268 @@
+"""
+GymFlow — App do Aluno
+Execução do treino na academia: marca cada série na hora (fila local) e
+consulta o histórico
+"""
+import html
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import db
+from fila import FilaEscrita
+
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+
+@st.cache_resource
+def obter_fila() -> FilaEscrita:
+    """Uma fila por processo; a thread de descarga sobe junto."""
+    return FilaEscrita().iniciar()
+
+
+def com_reserva(chave, fn, *args, **kw):
+    """Lê do banco; sem rede, usa a última cópia guardada na sessão."""
+    try:
+        st.session_state[chave] = fn(*args, **kw)
+    except Exception:
+        if chave not in st.session_state:
+            raise
+        st.session_state["offline"] = True
+    return st.session_state[chave]
+
+st.set_page_config(page_title="GymFlow — Aluno", page_icon="🏋️", layout="centered")
+db.nova_execucao()
+fila = obter_fila()
+st.session_state["offline"] = False
+
+st.markdown("""
+<style>
+@import url('https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=DM+Mono:wght@400;500&family=Figtree:wght@300;400;500;600&display=swap');
+html,body,[class*="css"],.stApp{font-family:'Figtree',sans-serif!important;background:#0e0f13!important;color:#e8eaf0!important}
+.stApp,.main .block-container{background:#0e0f13!important;max-width:1200px}
+section[data-testid="stSidebar"]{background:#16181f!important;border-right:1px solid #2a2d3a!important}
+section[data-testid="stSidebar"] *{color:#e8eaf0!important}
+section[data-testid="stSidebar"] label{color:#7a7f96!important;font-size:11px!important;text-transform:uppercase;letter-spacing:1.5px;font-family:'DM Mono',monospace!important}
+section[data-testid="stSidebar"] [data-baseweb="select"]>div,section[data-testid="stSidebar"] input{background:#1e2029!important;border:1px solid #2a2d3a!important;border-radius:8px!important}
+[data-testid="metric-container"]{background:#16181f!important;border:1px solid #2a2d3a!important;border-radius:14px!important;padding:20px!important;border-top:3px solid #c8f564!important}
+[data-testid="metric-container"] label{font-size:11px!important;text-transform:uppercase!important;letter-spacing:1.5px!important;color:#7a7f96!important;font-family:'DM Mono',monospace!important}
+[data-testid="metric-container"] [data-testid="stMetricValue"]{font-family:'DM Mono',monospace!important;font-size:26px!important}
+.stTabs [data-baseweb="tab-list"]{background:#16181f!important;border-radius:12px!important;padding:4px!important;border:1px solid #2a2d3a!important}
+.stTabs [data-baseweb="tab"]{background:transparent!important;color:#7a7f96!important;border-radius:9px!important;font-weight:600!important;font-size:14px!important;padding:10px 18px!important;border:none!important}
+.stTabs [aria-selected="true"]{background:rgba(200,245,100,0.12)!important;color:#c8f564!important}
+.stTabs [data-baseweb="tab-highlight"],.stTabs [data-baseweb="tab-border"]{display:none!important}
+.stButton>button,.stFormSubmitButton>button{background:#1e2029!important;color:#e8eaf0!important;border:1px solid #2a2d3a!important;border-radius:10px!important;font-family:'Figtree',sans-serif!important;font-weight:600!important}
+.stButton>button:hover{background:#2a2d3a!important;border-color:#c8f564!important;color:#c8f564!important}
+.stFormSubmitButton>button[kind="primaryFormSubmit"],button[kind="primary"]{background:#c8f564!important;color:#0e0f13!important;border:none!important}
+input,textarea,[data-baseweb="input"] input{background:#1e2029!important;border:1px solid #2a2d3a!important;border-radius:9px!important;color:#e8eaf0!important}
+[data-baseweb="input"],[data-baseweb="base-input"]{background:#1e2029!important;border:1px solid #2a2d3a!important;border-radius:9px!important}
+[data-baseweb="select"]>div:first-child{background:#1e2029!important;border:1px solid #2a2d3a!important;border-radius:9px!important;color:#e8eaf0!important}
+[data-baseweb="popover"] ul,[data-baseweb="menu"]{background:#1e2029!important;border:1px solid #2a2d3a!important;border-radius:10px!important}
+[data-baseweb="menu"] li:hover{background:#2a2d3a!important}
+.stTextInput label,.stDateInput label,.stNumberInput label,.stSelectbox label,.stTextArea label{color:#7a7f96!important;font-size:12px!important}
+[data-testid="stForm"]{background:#16181f!important;border:1px solid #2a2d3a!important;border-radius:16px!important;padding:24px!important}
+div[data-testid="stSuccess"]{background:rgba(200,245,100,0.08)!important;border-left:4px solid #c8f564!important;border-radius:10px!important}
+div[data-testid="stError"]{background:rgba(255,107,107,0.08)!important;border-left:4px solid #ff6b6b!important;border-radius:10px!important}
+div[data-testid="stInfo"]{background:rgba(106,240,200,0.08)!important;border-left:4px solid #6af0c8!important;border-radius:10px!important}
+[data-testid="stExpander"]{background:#16181f!important;border:1px solid #2a2d3a!important;border-radius:12px!important}
+hr{border-color:#2a2d3a!important}
+::-webkit-scrollbar{width:6px;height:6px}
+::-webkit-scrollbar-track{background:#0e0f13}
+::-webkit-scrollbar-thumb{background:#2a2d3a;border-radius:3px}
+</style>""", unsafe_allow_html=True)
+
+# ── Sidebar ────────────────────────────────────────────────────────────────
+with st.sidebar:
+    st.markdown("""
+    <div style="padding-bottom:20px;border-bottom:1px solid #2a2d3a;margin-bottom:20px">
+        <div style="font-family:'DM Serif Display',serif;font-size:26px;color:#c8f564">GymFlow</div>
+        <div style="font-family:'DM Mono',monospace;font-size:10px;color:#7a7f96;letter-spacing:2px;text-transform:uppercase">Área do Aluno</div>
+    </div>""", unsafe_allow_html=True)
+
+    alunos_df = com_reserva("alunos", db.listar_alunos, colunas=db.COLS_ALUNO_SELETOR)
+    if alunos_df.empty:
+        st.warning("Nenhum aluno cadastrado.")
+        st.stop()
+    aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
+    aluno_id = st.selectbox("Aluno", options=list(aluno_map.keys()), format_func=lambda x: aluno_map[x])
+
+    # Estado da fila de escrita
+    pendentes = fila.pendentes()
+    st.markdown('<div style="font-size:11px;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:16px 0 8px">Sincronização</div>', unsafe_allow_html=True)
+    if pendentes:
+        st.caption(f"⏳ {pendentes} registro(s) aguardando envio")
+    else:
+        st.caption("✓ Tudo sincronizado")
+    if fila.ultimo_erro:
+        st.caption("⚠️ Sem conexão com o banco — os registros ficam salvos aqui.")
+    rejeitados = fila.rejeitados()
+    if rejeitados:
+        with st.expander(f"⛔ {len(rejeitados)} registro(s) recusado(s) pelo banco"):
+            for r in rejeitados[:20]:
+                st.caption(f"{'Treino' if r['tipo'] == 'treino' else 'Série'} de "
+                           f"{(r['payload'].get('executado_em') or r['payload'].get('iniciado_em', ''))[:16]}: {r['erro']}")
+            if len(rejeitados) > 20:
+                st.caption(f"… e mais {len(rejeitados) - 20}")
+            c1, c2 = st.columns(2)
+            if c1.button("↻ Reenviar", key="reenviar_rejeitados", use_container_width=True):
+                fila.reenviar_rejeitados()
+                st.rerun()
+            if c2.button("🗑️ Descartar", key="descartar_rejeitados", use_container_width=True):
+                fila.descartar_rejeitados()
+                st.rerun()
+    if pendentes and st.button("↻ Sincronizar agora", use_container_width=True):
+        try:
+            while fila.descarregar():
+                pass
+        except Exception as e:
+            st.error(f"Erro: {e}")
+        st.rerun()
+
+tab_treino, tab_hist = st.tabs(["🏋️ Treinar", "📈 Histórico"])
+
+# ══════════════════════════════════════════════════════════════════════════
+# TREINAR
+# ══════════════════════════════════════════════════════════════════════════
+with tab_treino, db.rotulo("Treinar"):
+    sessao = st.session_state.get("sessao")
+    if sessao and sessao["aluno_id"] != aluno_id:
+        sessao = None
+
+    planos_df = com_reserva(f"planos_{aluno_id}", db.listar_planos, aluno_id,
+                            colunas=db.COLS_PLANO_SELETOR)
+    if planos_df.empty:
+        st.info("Você ainda não tem plano de treino. Fale com seu professor.")
+    else:
+        plano_map = {int(r["id"]): f"{r['nome']} — {r['mes']}" for _, r in planos_df.iterrows()}
+        sel_plano = st.selectbox("Plano", options=list(plano_map.keys()),
+                                  format_func=lambda x: plano_map[x], disabled=sessao is not None)
+        if sessao:
+            sel_plano = sessao["plano_id"]
+
+        ficha = com_reserva(f"ficha_{sel_plano}", db.carregar_ficha, sel_plano)
+        if st.session_state["offline"]:
+            st.info("📡 Sem conexão — mostrando a última ficha carregada.")
+
+        if not ficha:
+            st.info("Plano sem treinos ainda.")
+        else:
+            treino_map = {int(t["id"]): f"Treino {t['nome']} — {t['descricao'] or ''}" for t in ficha}
+            if sessao:
+                treino_id = sessao["treino_id"]
+            else:
+                treino_id = st.radio("Treino de hoje", options=list(treino_map.keys()),
+                                     format_func=lambda x: treino_map[x], horizontal=True)
+            treino = next(t for t in ficha if int(t["id"]) == treino_id)
+            itens_por_id = {it["id"]: it for it in treino["itens"]}
+
+            if not sessao:
+                if st.button("▶ Iniciar treino", type="primary", use_container_width=True):
+                    pronto = True
+                    if treino.get("modelo"):
+                        # O histórico aponta para treino_itens: o treino do modelo ganha os seus agora
+                        try:
+                            db.materializar_treino(treino_id)
+                        except Exception as e:
+                            pronto = False
+                            st.error(f"Não foi possível preparar o treino (sem conexão?): {e}")
+                    if pronto:
+                        st.session_state["sessao"] = {
+                            "id": fila.iniciar_treino(aluno_id, treino_id), "aluno_id": aluno_id,
+                            "plano_id": sel_plano, "treino_id": treino_id, "feitas": {},
+                            "inicio": datetime.now(TZ_BR).strftime("%H:%M"),
+                        }
+                        st.rerun()
+            else:
+                feitas = sessao["feitas"]
+                total = sum(len(it["series"]) for it in treino["itens"])
+                st.markdown(f"""
+                <div style="background:#16181f;border:1px solid #2a2d3a;border-top:3px solid #c8f564;border-radius:14px;padding:16px 20px;margin-bottom:12px">
+                    <div style="display:flex;justify-content:space-between;align-items:center">
+                        <span style="font-family:'DM Serif Display',serif;font-size:20px;color:#c8f564">{html.escape(str(treino_map[treino_id]))}</span>
+                        <span style="font-family:'DM Mono',monospace;font-size:12px;color:#7a7f96">início {sessao['inicio']} · {len(feitas)}/{total} séries</span>
+                    </div>
+                </div>""", unsafe_allow_html=True)
+
+            for item in treino["itens"]:
+                item_id = int(item["id"])
+                tipo_badge = "🔺" if item["tipo_serie"] == "piramide" else "➡️"
+                comb_txt = ""
+                if item.get("combinado_com") and item["combinado_com"] in itens_por_id:
+                    comb_txt = f" · 🔗 {html.escape(str(itens_por_id[item['combinado_com']]['exercicio_nome']))}"
+                st.markdown(f"""
+                <div style="background:#1e2029;border-left:3px solid #2a2d3a;border-radius:0 10px 10px 0;padding:12px 16px;margin:10px 0 6px">
+                    <div style="display:flex;justify-content:space-between;align-items:center">
+                        <span style="font-weight:600;color:#e8eaf0;font-size:15px">{tipo_badge} {html.escape(str(item['exercicio_nome']))}</span>
+                        <span style="font-size:11px;color:#7a7f96">⏱ {item['descanso_seg']}s{comb_txt}</span>
+                    </div>
+                    {f'<div style="font-size:11px;color:#6af0c8;margin-top:6px">📝 {html.escape(str(item["observacao"]))}</div>' if item.get("observacao") else ''}
+                </div>""", unsafe_allow_html=True)
+
+                for s in item["series"]:
+                    num = int(s["numero"])
+                    chave = f"{item_id}-{num}"
+                    c1, c2, c3, c4 = st.columns([1, 2, 2, 1])
+                    c1.markdown(f'<div style="font-family:DM Mono,monospace;color:#c8f564;padding-top:30px">{num}ª</div>', unsafe_allow_html=True)
+                    if not sessao:
+                        c2.markdown(f'<div style="padding-top:30px;color:#7a7f96">{int(s["repeticoes"])} reps</div>', unsafe_allow_html=True)
+                        c3.markdown(f'<div style="padding-top:30px;color:#7a7f96">{s["carga"] or "—"} kg</div>', unsafe_allow_html=True)
+                    elif chave in feitas:
+                        reps, carga = feitas[chave]
+                        c2.markdown(f'<div style="padding-top:30px;color:#e8eaf0">{reps} reps</div>', unsafe_allow_html=True)
+                        c3.markdown(f'<div style="padding-top:30px;color:#e8eaf0">{carga or "—"} kg</div>', unsafe_allow_html=True)
+                        c4.markdown('<div style="padding-top:30px;color:#c8f564">✓</div>', unsafe_allow_html=True)
+                    else:
+                        reps = c2.number_input("Reps", min_value=0, max_value=100,
+                                               value=int(s["repeticoes"]), key=f"reps_{chave}")
+                        carga = c3.number_input("kg", min_value=0.0, step=0.5,
+                                                value=float(s["carga"] or 0), key=f"carga_{chave}")
+                        with c4:
+                            st.markdown("<div style='padding-top:12px'></div>", unsafe_allow_html=True)
+                            if st.button("✓", key=f"ok_{chave}"):
+                                # Só grava no SQLite local; o envio ao banco é em lote, em segundo plano
+                                fila.registrar_serie(sessao["id"], item_id, num, int(reps), carga)
+                                feitas[chave] = (int(reps), carga if carga > 0 else None)
+                                st.rerun()
+
+            if sessao:
+                st.markdown("<div style='margin-bottom:12px'></div>", unsafe_allow_html=True)
+                f1, f2 = st.columns(2)
+                if f1.button("🏁 Finalizar treino", type="primary", use_container_width=True):
+                    fila.finalizar_treino(sessao["id"])
+                    del st.session_state["sessao"]
+                    st.success("✓ Treino finalizado!")
+                    st.rerun()
+                if f2.button("✕ Descartar", use_container_width=True):
+                    # A sessão fica aberta no histórico com o que já foi marcado
+                    del st.session_state["sessao"]
+                    st.rerun()
+
+# ══════════════════════════════════════════════════════════════════════════
+# HISTÓRICO
+# ══════════════════════════════════════════════════════════════════════════
+with tab_hist, db.rotulo("Histórico"):
+    st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📈 Histórico</div>', unsafe_allow_html=True)
+    if pendentes:
+        st.caption(f"⏳ {pendentes} registro(s) ainda não enviados não aparecem abaixo.")
+    try:
+        hist_df = db.listar_historico(aluno_id)
+    except Exception:
+        hist_df = None
+        st.info("📡 Sem conexão — o histórico aparece quando a rede voltar.")
+    if hist_df is not None and hist_df.empty:
+        st.info("Nenhum treino registrado ainda.")
+    elif hist_df is not None:
+        def _hora(v):
+            if not v:
+                return "—"
+            return datetime.fromisoformat(str(v).replace("Z", "+00:00")).astimezone(TZ_BR).strftime("%H:%M")
+        show = pd.DataFrame({
+            "Data": pd.to_datetime(hist_df["data"]).dt.strftime("%d/%m/%Y"),
+            "Treino": hist_df["treino_nome"],
+            "Início": hist_df["iniciado_em"].apply(_hora),
+            "Fim": hist_df["finalizado_em"].apply(_hora),
+        })
+        st.dataframe(show, use_container_width=True, hide_index=True)
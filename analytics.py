@@ -0,0 +1,189 @@
+"""
+gymflow/analytics.py — Carga de treino: volume, 1RM estimado, recordes e tendência semanal
+
+O histórico vem em páginas planas (db.iter_historico_*), é juntado com merges e
+agregado com groupby/NumPy — nenhum laço por série. `carregar_series` devolve
+um frame colunar (uma linha por série executada) que as demais funções recebem.
+
+Para painéis, `carregar_progresso` lê os agregados semanais mantidos no banco
+(progresso_semanal) e as funções *_progresso trabalham sobre eles: o custo
+cresce com o número de semanas, não de séries.
+"""
+import numpy as np
+import pandas as pd
+import db
+
+COLUNAS = ["historico_treino_id", "aluno_id", "data", "exercicio_id", "exercicio", "grupo",
+           "serie_numero", "reps", "carga", "volume", "e1rm"]
+
+# Nível de agregação → chaves do groupby
+NIVEIS = {
+    "aluno": ["aluno_id"],
+    "exercicio": ["aluno_id", "exercicio"],
+    "grupo": ["aluno_id", "grupo"],
+}
+
+
+def e1rm(reps, carga) -> np.ndarray:
+    """1RM estimado (Epley): carga × (1 + reps/30); 1 rep é a própria carga; sem reps/carga = NaN."""
+    reps = np.asarray(reps, dtype=np.float32)
+    carga = np.asarray(carga, dtype=np.float32)
+    est = np.where(reps == 1, carga, carga * (1 + reps / 30))
+    return np.where((reps > 0) & (carga > 0), est, np.nan).astype(np.float32)
+
+
+def montar(series, treinos, itens, exercicios) -> pd.DataFrame:
+    """Junta os frames planos (historico_series, historico_treinos, treino_itens, exercicios).
+
+    O exercício é o gravado na série; `itens` só cobre séries antigas sem ele.
+    """
+    if series.empty or treinos.empty:
+        return pd.DataFrame(columns=COLUNAS)
+    df = series.merge(treinos[["id", "aluno_id", "data"]].rename(columns={"id": "historico_treino_id"}),
+                      on="historico_treino_id", how="inner")
+    if "exercicio_id" not in df:
+        df["exercicio_id"] = np.nan
+    df = df.merge(itens[["id", "exercicio_id"]].rename(columns={"id": "treino_item_id",
+                                                                "exercicio_id": "exercicio_do_item"}),
+                  on="treino_item_id", how="left")
+    df["exercicio_id"] = pd.to_numeric(df["exercicio_id"]).fillna(pd.to_numeric(df["exercicio_do_item"]))
+    df = df.merge(exercicios[["id", "nome", "grupo"]]
+                  .rename(columns={"id": "exercicio_id", "nome": "exercicio"}),
+                  on="exercicio_id", how="left")
+
+    reps = pd.to_numeric(df["repeticoes_feitas"], errors="coerce").fillna(0).to_numpy(np.float32)
+    carga = pd.to_numeric(df["carga_usada"], errors="coerce").fillna(0).to_numpy(np.float32)
+    return pd.DataFrame({
+        "historico_treino_id": df["historico_treino_id"].astype("int64"),
+        "aluno_id": df["aluno_id"].astype("int64"),
+        "data": pd.to_datetime(df["data"]),
+        "exercicio_id": df["exercicio_id"].fillna(-1).astype("int64"),
+        "exercicio": df["exercicio"].fillna("—").astype("category"),
+        "grupo": df["grupo"].fillna("—").astype("category"),
+        "serie_numero": df["serie_numero"].astype("int16"),
+        "reps": reps,
+        "carga": carga,
+        "volume": reps * carga,
+        "e1rm": e1rm(reps, carga),
+    })
+
+
+def _juntar(paginas, colunas) -> pd.DataFrame:
+    paginas = list(paginas)
+    return pd.concat(paginas, ignore_index=True) if paginas else pd.DataFrame(columns=db._nomes(colunas))
+
+
+# Qualquer escrita no histórico derruba ("historico", "*") — ver db.py
+@db._cached(db.TTL_FICHA, lambda df, a: {("historico", "*")})
+def carregar_series(aluno_id=None) -> pd.DataFrame:
+    """Todas as séries executadas (ou só as do aluno) num frame colunar."""
+    treinos = _juntar(db.iter_historico_treinos(aluno_id), db.COLS_HIST_TREINO)
+    if treinos.empty:
+        return pd.DataFrame(columns=COLUNAS)
+    paginas = db.iter_historico_series(None if aluno_id is None else treinos["id"].tolist())
+    series = _juntar(paginas, db.COLS_HIST_SERIE)
+    if series.empty:
+        return pd.DataFrame(columns=COLUNAS)
+    sem_exercicio = series.loc[series["exercicio_id"].isna(), "treino_item_id"].dropna()
+    itens = db.mapa_itens_exercicio(sem_exercicio.unique())
+    exercicios = db.listar_exercicios(colunas=db.COLS_EXERCICIO_SELETOR)
+    return montar(series, treinos, itens, exercicios)
+
+
+def volume(df, nivel="exercicio") -> pd.DataFrame:
+    """Séries, reps, volume (reps × carga), carga máxima e 1RM estimado por nível."""
+    chaves = NIVEIS[nivel]
+    return (df.groupby(chaves, observed=True)
+              .agg(series=("reps", "size"), reps=("reps", "sum"), volume=("volume", "sum"),
+                   carga_max=("carga", "max"), e1rm_max=("e1rm", "max"))
+              .reset_index()
+              .sort_values(chaves[:-1] + ["volume"], ascending=[True] * (len(chaves) - 1) + [False],
+                           ignore_index=True))
+
+
+def recordes(df) -> pd.DataFrame:
+    """Melhor série (maior 1RM estimado) de cada aluno × exercício, com a data."""
+    ok = df[df["e1rm"].notna()]
+    top = (ok.sort_values(["e1rm", "data"], ascending=[False, True], kind="stable")
+             .drop_duplicates(["aluno_id", "exercicio_id"]))
+    return (top[["aluno_id", "exercicio", "grupo", "data", "reps", "carga", "e1rm"]]
+              .sort_values(["aluno_id", "e1rm"], ascending=[True, False], ignore_index=True))
+
+
+def marcar_recordes(df) -> pd.Series:
+    """True nas séries que superaram todo 1RM estimado anterior do aluno naquele exercício."""
+    ordem = df.sort_values(["data", "historico_treino_id", "serie_numero"], kind="stable")
+    chaves = [ordem["aluno_id"], ordem["exercicio_id"]]
+    anterior = ordem["e1rm"].fillna(0).groupby(chaves).cummax().groupby(chaves).shift()
+    return (ordem["e1rm"] > anterior).reindex(df.index, fill_value=False)
+
+
+def tendencia_semanal(df, nivel="aluno") -> pd.DataFrame:
+    """Volume, séries, sessões e 1RM máximo por semana (segunda-feira), com variação semanal."""
+    chaves = NIVEIS[nivel]
+    semana = df["data"] - pd.to_timedelta(df["data"].dt.weekday, unit="D")
+    sem = (df.assign(semana=semana)
+             .groupby(chaves + ["semana"], observed=True)
+             .agg(sessoes=("historico_treino_id", "nunique"), series=("reps", "size"),
+                  volume=("volume", "sum"), e1rm_max=("e1rm", "max"))
+             .reset_index())
+    sem["variacao_volume"] = sem.groupby(chaves, observed=True)["volume"].pct_change()
+    return sem
+
+
+# ── Agregados semanais (progresso_semanal) ─────────────────────────────────
+
+COLUNAS_PROGRESSO = ["aluno_id", "exercicio_id", "exercicio", "grupo", "semana",
+                     "series", "reps", "volume", "carga_max", "e1rm_max"]
+
+
+@db._cached(db.TTL_FICHA, lambda df, a: {("historico", "*")})
+def carregar_progresso(aluno_id) -> pd.DataFrame:
+    """Semanas do aluno × exercício (séries, reps, volume, carga e 1RM máximos)."""
+    sem = _juntar(db.iter_progresso_semanal(aluno_id), db.COLS_PROGRESSO)
+    if sem.empty:
+        return pd.DataFrame(columns=COLUNAS_PROGRESSO)
+    exercicios = db.listar_exercicios(colunas=db.COLS_EXERCICIO_SELETOR)
+    sem = sem.merge(exercicios[["id", "nome", "grupo"]]
+                    .rename(columns={"id": "exercicio_id", "nome": "exercicio"}),
+                    on="exercicio_id", how="left")
+    for col in ("volume", "carga_max", "e1rm_max"):
+        sem[col] = pd.to_numeric(sem[col], errors="coerce").astype(np.float32)
+    sem["semana"] = pd.to_datetime(sem["semana"])
+    sem["exercicio"] = sem["exercicio"].fillna("—").astype("category")
+    sem["grupo"] = sem["grupo"].fillna("—").astype("category")
+    return sem[COLUNAS_PROGRESSO]
+
+
+def volume_progresso(sem, nivel="exercicio") -> pd.DataFrame:
+    """Como `volume`, a partir dos agregados semanais."""
+    chaves = NIVEIS[nivel]
+    return (sem.groupby(chaves, observed=True)
+               .agg(series=("series", "sum"), reps=("reps", "sum"), volume=("volume", "sum"),
+                    carga_max=("carga_max", "max"), e1rm_max=("e1rm_max", "max"))
+               .reset_index()
+               .sort_values(chaves[:-1] + ["volume"], ascending=[True] * (len(chaves) - 1) + [False],
+                            ignore_index=True))
+
+
+def tendencia_progresso(sem, nivel="aluno") -> pd.DataFrame:
+    """Como `tendencia_semanal` (sem contagem de sessões), a partir dos agregados."""
+    chaves = NIVEIS[nivel]
+    out = (sem.groupby(chaves + ["semana"], observed=True)
+              .agg(series=("series", "sum"), volume=("volume", "sum"), e1rm_max=("e1rm_max", "max"))
+              .reset_index())
+    out["variacao_volume"] = out.groupby(chaves, observed=True)["volume"].pct_change()
+    return out
+
+
+def recordes_progresso(sem) -> pd.DataFrame:
+    """Semana do maior 1RM estimado de cada exercício; `novos` conta as semanas que bateram o anterior."""
+    ok = sem[sem["e1rm_max"].notna()].sort_values("semana", kind="stable")
+    chaves = [ok["aluno_id"], ok["exercicio_id"]]
+    anterior = ok["e1rm_max"].groupby(chaves).cummax().groupby(chaves).shift()
+    novos = (ok["e1rm_max"] > anterior).groupby(chaves).sum().rename("novos")
+    top = (ok.sort_values(["e1rm_max", "semana"], ascending=[False, True], kind="stable")
+             .drop_duplicates(["aluno_id", "exercicio_id"])
+             .merge(novos.reset_index(), on=["aluno_id", "exercicio_id"]))
+    return (top[["aluno_id", "exercicio", "grupo", "semana", "carga_max", "e1rm_max", "novos"]]
+              .sort_values(["aluno_id", "e1rm_max"], ascending=[True, False], ignore_index=True))
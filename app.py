@@ -2,19 +2,93 @@
 GymFlow — App do Professor
 Cadastro de alunos, exercícios, planos e fichas de treino
 """
-import sys, os
+import sys, os, html
 sys.path.insert(0, os.path.dirname(__file__))
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from streamlit.errors import StreamlitAPIException
+from postgrest.exceptions import APIError
 import db
+import analytics
+import render
+import otimista
+import catalogo
+import importar
 
 TZ_BR = ZoneInfo("America/Sao_Paulo")
+POR_PAGINA = 30
+
+
+def carregar_paginas(pagina, chave, **kw):
+    """Junta as páginas já pedidas com "Carregar mais"; devolve (df, tem_mais)."""
+    partes, cursor = [], None
+    for _ in range(st.session_state.get(chave, 1)):
+        df, cursor = pagina(apos=cursor, page_size=POR_PAGINA, **kw)
+        partes.append(df)
+        if cursor is None:
+            break
+    return pd.concat(partes, ignore_index=True), cursor is not None
+
+
+def botao_carregar_mais(chave, tem_mais):
+    if tem_mais and st.button("↓ Carregar mais", key=f"mais_{chave}", use_container_width=True):
+        st.session_state[chave] = st.session_state.get(chave, 1) + 1
+        recarregar_fragmento()
+
+
+def recarregar_fragmento():
+    """Reroda só o fragmento atual; fora de um rerun de fragmento, o app inteiro.
+
+    Mudanças que outras abas enxergam (alunos, exercícios, planos) usam st.rerun().
+    """
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def importador(tipo, rotulo):
+    """Expander de importação em lote (importar.py); o resumo fica na sessão até a próxima."""
+    chave = f"importacao_{tipo}"
+    with st.expander(f"📥 Importar {rotulo} de planilha (CSV/Excel)"):
+        st.caption(f"Colunas: {importar.COLUNAS[tipo]} — * obrigatória")
+        arquivo = st.file_uploader("Arquivo", type=["csv", "xlsx"], key=f"arquivo_{tipo}",
+                                   label_visibility="collapsed")
+        simular = st.checkbox("Só simular (valida e conta, não grava)", value=True, key=f"simular_{tipo}")
+        if arquivo is not None and st.button("📥 Importar", key=f"importar_{tipo}", use_container_width=True):
+            barra = st.progress(0.0, text="Lendo o arquivo…")
+
+            def progresso(r):
+                fracao = min(r["lidas"] / r["total"], 1.0) if r["total"] else 0.0
+                barra.progress(fracao, text=f"{r['lidas']} linha(s) · {r['novas']} nova(s) · "
+                                            f"{len(r['erros'])} erro(s)")
+            try:
+                st.session_state[chave] = importar.importar(tipo, arquivo, simular=simular,
+                                                            progresso=progresso, nome=arquivo.name)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                if not simular:  # as listas das outras abas mudaram
+                    st.rerun()
+
+        resumo = st.session_state.get(chave)
+        if resumo:
+            st.markdown("**Simulação**" if resumo["simulado"] else "**Última importação**")
+            r1, r2, r3, r4 = st.columns(4)
+            r1.metric("Novos", resumo["novas"])
+            r2.metric("Atualizados", resumo["atualizadas"])
+            r3.metric("Sem mudança", resumo["sem_mudanca"] + resumo["repetidas"])
+            r4.metric("Com erro", len(resumo["erros"]))
+            if resumo["erros"]:
+                st.dataframe(pd.DataFrame(resumo["erros"], columns=["Linha", "Motivo"]),
+                             use_container_width=True, hide_index=True, height=200)
 
 st.set_page_config(page_title="GymFlow — Professor", page_icon="🏋️", layout="wide",
                    initial_sidebar_state="expanded")
+db.nova_execucao()
+otimista.reconciliar()
 
 st.markdown("""
 <style>
@@ -65,358 +139,617 @@ with st.sidebar:
         <div style="font-family:'DM Mono',monospace;font-size:24px;color:#c8f564">{agora.strftime('%H:%M')}</div>
         <div style="font-size:11px;color:#7a7f96">{agora.strftime('%d/%m/%Y')}</div>
     </div>""", unsafe_allow_html=True)
+    painel_debug = st.toggle("🔍 Painel de consultas", key="painel_debug")
+    db.medir_bytes(painel_debug)
 
-# ── Dados globais ──────────────────────────────────────────────────────────
-alunos_df = db.listar_alunos()
-exercicios_df = db.listar_exercicios()
+# ── Navegação ──────────────────────────────────────────────────────────────
+# Só a aba escolhida roda (e consulta o banco); st.tabs executaria todas.
+ABAS = ["👤 Alunos", "💪 Exercícios", "📅 Planos", "📋 Ficha de Treino", "📚 Modelos", "📈 Progresso"]
+aba_atual = st.segmented_control("Navegação", ABAS, default=ABAS[0], key="aba",
+                                 label_visibility="collapsed")
+if aba_atual is None:  # clique na aba já selecionada desmarca; mantém a anterior
+    aba_atual = st.session_state.get("aba_anterior", ABAS[0])
+st.session_state["aba_anterior"] = aba_atual
 
-# ── Tabs ───────────────────────────────────────────────────────────────────
-tab_alunos, tab_exercicios, tab_planos, tab_ficha = st.tabs([
-    "👤 Alunos", "💪 Exercícios", "📅 Planos", "📋 Ficha de Treino"
-])
 
 # ══════════════════════════════════════════════════════════════════════════
 # TAB 1 — ALUNOS
 # ══════════════════════════════════════════════════════════════════════════
-with tab_alunos:
-    st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">👤 Alunos</div>', unsafe_allow_html=True)
-
-    c1, c2 = st.columns([1, 1])
-    c1.metric("Total de alunos", len(alunos_df))
-
-    with st.form("form_aluno", clear_on_submit=True):
-        st.markdown("**Novo aluno**")
-        fa1, fa2, fa3 = st.columns(3)
-        with fa1: a_nome = st.text_input("Nome *")
-        with fa2: a_email = st.text_input("Email")
-        with fa3: a_tel = st.text_input("Telefone")
-        if st.form_submit_button("✓ Cadastrar aluno", type="primary", use_container_width=True):
-            if not a_nome.strip():
-                st.error("Informe o nome do aluno.")
-            else:
-                db.salvar_aluno(a_nome, a_email, a_tel)
-                st.success(f"✓ Aluno '{a_nome}' cadastrado!")
-                st.rerun()
-
-    st.divider()
-    if alunos_df.empty:
-        st.info("Nenhum aluno cadastrado.")
-    else:
-        for _, row in alunos_df.iterrows():
-            with st.expander(f"👤 {row['nome']}"):
-                i1, i2, i3 = st.columns([2, 2, 1])
-                i1.markdown(f"📧 {row['email'] or '—'}")
-                i2.markdown(f"📱 {row['telefone'] or '—'}")
-                if i3.button("Desativar", key=f"del_aluno_{row['id']}"):
-                    db.desativar_aluno(int(row["id"]))
-                    st.success("Aluno desativado.")
+@st.fragment
+def aba_alunos():
+    with db.rotulo("Alunos"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">👤 Alunos</div>', unsafe_allow_html=True)
+
+        alunos_pend = otimista.pendentes("alunos")
+        c1, c2 = st.columns([1, 1])
+        c1.metric("Total de alunos", db.contar_alunos() + len(alunos_pend))
+
+        with st.form("form_aluno", clear_on_submit=True):
+            st.markdown("**Novo aluno**")
+            fa1, fa2, fa3 = st.columns(3)
+            with fa1: a_nome = st.text_input("Nome *")
+            with fa2: a_email = st.text_input("Email")
+            with fa3: a_tel = st.text_input("Telefone")
+            if st.form_submit_button("✓ Cadastrar aluno", type="primary", use_container_width=True):
+                if not a_nome.strip():
+                    st.error("Informe o nome do aluno.")
+                else:
+                    otimista.enviar("alunos", {"nome": a_nome.strip(), "email": a_email, "telefone": a_tel},
+                                    f"Aluno '{a_nome.strip()}'", db.salvar_aluno, a_nome, a_email, a_tel)
                     st.rerun()
+        importador("alunos", "alunos")
+
+        st.divider()
+        for pend in alunos_pend:
+            st.markdown(f'<div style="color:#7a7f96;padding:8px 4px">⏳ {html.escape(pend["nome"])} — salvando…</div>', unsafe_allow_html=True)
+        alunos_pag, mais_alunos = carregar_paginas(db.pagina_alunos, "alunos_paginas")
+        if alunos_pag.empty and not alunos_pend:
+            st.info("Nenhum aluno cadastrado.")
+        else:
+            for _, row in alunos_pag.iterrows():
+                with st.expander(f"👤 {row['nome']}"):
+                    i1, i2, i3 = st.columns([2, 2, 1])
+                    i1.markdown(f"📧 {row['email'] or '—'}")
+                    i2.markdown(f"📱 {row['telefone'] or '—'}")
+                    if i3.button("Desativar", key=f"del_aluno_{row['id']}"):
+                        db.desativar_aluno(int(row["id"]))
+                        st.success("Aluno desativado.")
+                        st.rerun()
+            botao_carregar_mais("alunos_paginas", mais_alunos)
+
 
 # ══════════════════════════════════════════════════════════════════════════
 # TAB 2 — EXERCÍCIOS
 # ══════════════════════════════════════════════════════════════════════════
-with tab_exercicios:
-    st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">💪 Exercícios</div>', unsafe_allow_html=True)
-
-    GRUPOS = ["Peito","Costas","Pernas","Ombro","Bíceps","Tríceps","Abdômen","Cardio","Outro"]
-
-    col_form_ex, col_list_ex = st.columns([1, 1], gap="large")
-
-    with col_form_ex:
-        # Detecta se está em modo edição
-        editando_ex = st.session_state.get("editando_ex_id")
-        ex_edit = None
-        if editando_ex:
-            ex_edit = exercicios_df[exercicios_df["id"] == editando_ex]
-            ex_edit = ex_edit.iloc[0] if not ex_edit.empty else None
-
-        titulo_form = "✏️ Editar exercício" if ex_edit is not None else "Novo exercício"
-        st.markdown(f'<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">{titulo_form}</div>', unsafe_allow_html=True)
-
-        with st.form("form_exercicio", clear_on_submit=True):
-            grupo_idx = GRUPOS.index(ex_edit["grupo"]) if ex_edit is not None and ex_edit["grupo"] in GRUPOS else 0
-            e_grupo = st.selectbox("Grupo muscular", GRUPOS, index=grupo_idx)
-            e_nome = st.text_input("Nome *", value=ex_edit["nome"] if ex_edit is not None else "")
-            e_desc = st.text_input("Descrição (opcional)",
-                                    value=ex_edit["descricao"] if ex_edit is not None and ex_edit["descricao"] else "")
-
-            btn_label = "💾 Salvar alterações" if ex_edit is not None else "✓ Cadastrar exercício"
-            salvar_ex = st.form_submit_button(btn_label, type="primary", use_container_width=True)
-            if ex_edit is not None:
-                cancelar_ex = st.form_submit_button("✕ Cancelar edição", use_container_width=True)
-            else:
-                cancelar_ex = False
-
-            if salvar_ex:
-                if not e_nome.strip():
-                    st.error("Informe o nome do exercício.")
+@st.fragment
+def aba_exercicios():
+    with db.rotulo("Exercícios"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">💪 Exercícios</div>', unsafe_allow_html=True)
+
+        GRUPOS = ["Peito","Costas","Pernas","Ombro","Bíceps","Tríceps","Abdômen","Cardio","Outro"]
+
+        # Índices por id/grupo/nome prontos; só é refeito quando os exercícios mudam
+        cat = catalogo.carregar()
+        col_form_ex, col_list_ex = st.columns([1, 1], gap="large")
+
+        with col_form_ex:
+            # Detecta se está em modo edição
+            editando_ex = st.session_state.get("editando_ex_id")
+            ex_edit = None
+            if editando_ex:
+                ex_edit = cat.get(editando_ex)
+
+            titulo_form = "✏️ Editar exercício" if ex_edit is not None else "Novo exercício"
+            st.markdown(f'<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">{titulo_form}</div>', unsafe_allow_html=True)
+
+            with st.form("form_exercicio", clear_on_submit=True):
+                grupo_idx = GRUPOS.index(ex_edit["grupo"]) if ex_edit is not None and ex_edit["grupo"] in GRUPOS else 0
+                e_grupo = st.selectbox("Grupo muscular", GRUPOS, index=grupo_idx)
+                e_nome = st.text_input("Nome *", value=ex_edit["nome"] if ex_edit is not None else "")
+                e_desc = st.text_input("Descrição (opcional)",
+                                        value=ex_edit["descricao"] if ex_edit is not None and ex_edit["descricao"] else "")
+
+                btn_label = "💾 Salvar alterações" if ex_edit is not None else "✓ Cadastrar exercício"
+                salvar_ex = st.form_submit_button(btn_label, type="primary", use_container_width=True)
+                if ex_edit is not None:
+                    cancelar_ex = st.form_submit_button("✕ Cancelar edição", use_container_width=True)
                 else:
-                    if ex_edit is not None:
-                        # Atualiza direto no Supabase
-                        client = db.get_client()
-                        db._retry(lambda: client.table("exercicios")
-                                  .update({"nome": e_nome.strip(), "grupo": e_grupo,
-                                           "descricao": e_desc or None})
-                                  .eq("id", int(editando_ex)).execute())
-                        st.session_state.pop("editando_ex_id", None)
-                        st.success(f"✓ Exercício '{e_nome}' atualizado!")
+                    cancelar_ex = False
+
+                if salvar_ex:
+                    if not e_nome.strip():
+                        st.error("Informe o nome do exercício.")
                     else:
-                        db.salvar_exercicio(e_nome, e_grupo, e_desc)
-                        st.success(f"✓ Exercício '{e_nome}' cadastrado!")
-                    st.rerun()
+                        if ex_edit is not None:
+                            db.atualizar_exercicio(int(editando_ex), e_nome, e_grupo, e_desc)
+                            st.session_state.pop("editando_ex_id", None)
+                            st.success(f"✓ Exercício '{e_nome}' atualizado!")
+                            st.rerun()
+                        else:
+                            otimista.enviar("exercicios", {"nome": f"{e_nome.strip()} ⏳", "grupo": e_grupo,
+                                                           "descricao": e_desc.strip() or None},
+                                            f"Exercício '{e_nome.strip()}'", db.salvar_exercicio,
+                                            e_nome, e_grupo, e_desc)
+                            st.rerun()
 
-            if cancelar_ex:
-                st.session_state.pop("editando_ex_id", None)
-                st.rerun()
+                if cancelar_ex:
+                    st.session_state.pop("editando_ex_id", None)
+                    recarregar_fragmento()
+            importador("exercicios", "exercícios")
 
-    with col_list_ex:
-        st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Exercícios Cadastrados</div>', unsafe_allow_html=True)
+        with col_list_ex:
+            st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Exercícios Cadastrados</div>', unsafe_allow_html=True)
 
-        if exercicios_df.empty:
-            st.info("Nenhum exercício cadastrado.")
-        else:
-            for grupo in sorted(exercicios_df["grupo"].dropna().unique().tolist()):
-                st.markdown(f'<div style="font-size:12px;font-weight:700;color:#c8f564;text-transform:uppercase;letter-spacing:1.5px;margin:14px 0 6px">{grupo}</div>', unsafe_allow_html=True)
-                df_g = exercicios_df[exercicios_df["grupo"] == grupo]
-                for _, row in df_g.iterrows():
-                    ex_id = int(row["id"])
-                    c_nome, c_edit, c_del = st.columns([6, 1, 1])
-                    with c_nome:
-                        st.markdown(f"""
-                        <div style="background:#16181f;border:1px solid #2a2d3a;border-radius:10px;padding:10px 14px;font-size:13px;color:#e8eaf0">
-                            {row['nome']}
-                            {f'<span style="font-size:11px;color:#7a7f96;margin-left:8px">— {row["descricao"]}</span>' if row.get("descricao") else ''}
-                        </div>""", unsafe_allow_html=True)
-                    with c_edit:
-                        if st.button("✏️", key=f"edit_ex_{ex_id}", help="Editar"):
-                            st.session_state["editando_ex_id"] = ex_id
+            ex_pend = otimista.pendentes("exercicios")
+            if not len(cat) and not ex_pend:
+                st.info("Nenhum exercício cadastrado.")
+            else:
+                busca_ex = st.text_input("Buscar", placeholder="🔎 Buscar exercício (ex: supino incl)",
+                                         key="busca_ex", label_visibility="collapsed")
+                exercicios_df = cat.tabela(cat.buscar(busca_ex))
+                if busca_ex.strip() and exercicios_df.empty:
+                    st.caption("Nenhum exercício encontrado.")
+                # Lista inteira num bloco de HTML; ações por seletor em vez de 2 botões por linha
+                ex_acao_map = dict(zip(exercicios_df["id"].astype(int).tolist(),
+                                       exercicios_df["nome"] + " (" + exercicios_df["grupo"] + ")"))
+                ca_sel, ca_edit, ca_del = st.columns([6, 1, 1])
+                with ca_sel:
+                    ex_acao = st.selectbox("Exercício", options=list(ex_acao_map.keys()),
+                                           format_func=lambda x: ex_acao_map[x], key="ex_acao_sel",
+                                           label_visibility="collapsed")
+                # Busca sem resultado deixa o seletor vazio (None)
+                with ca_edit:
+                    if st.button("✏️", key="edit_ex", help="Editar", disabled=ex_acao is None):
+                        st.session_state["editando_ex_id"] = ex_acao
+                        recarregar_fragmento()
+                with ca_del:
+                    if st.button("🗑", key="del_ex", help="Excluir", disabled=ex_acao is None):
+                        try:
+                            db.excluir_exercicio(ex_acao)
+                        except APIError as e:
+                            if e.code != "23503":
+                                raise
+                            st.error("Não é possível excluir: exercício está em uso em algum treino.")
+                        except db.CircuitoAberto as e:
+                            st.error(str(e))
+                        else:
+                            st.success("Exercício removido.")
                             st.rerun()
-                    with c_del:
-                        if st.button("🗑", key=f"del_ex_{ex_id}", help="Excluir"):
-                            try:
-                                db.excluir_exercicio(ex_id)
-                                st.success(f"Exercício removido.")
-                                st.rerun()
-                            except Exception:
-                                st.error("Não é possível excluir: exercício está em uso em algum treino.")
+
+                lista_ex = pd.concat([exercicios_df[["nome", "grupo", "descricao"]],
+                                      pd.DataFrame(ex_pend, columns=["nome", "grupo", "descricao"])],
+                                     ignore_index=True)
+                st.markdown(render.exercicios_html(lista_ex), unsafe_allow_html=True)
+
 
 # ══════════════════════════════════════════════════════════════════════════
 # TAB 3 — PLANOS
 # ══════════════════════════════════════════════════════════════════════════
-with tab_planos:
-    st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📅 Planos de Treino</div>', unsafe_allow_html=True)
-
-    if alunos_df.empty:
-        st.warning("Cadastre um aluno primeiro.")
-    else:
-        aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
-
-        with st.form("form_plano", clear_on_submit=True):
-            st.markdown("**Novo plano**")
-            fp1, fp2, fp3 = st.columns([2, 1, 1])
-            with fp1:
-                p_aluno = st.selectbox("Aluno", options=list(aluno_map.keys()),
-                                       format_func=lambda x: aluno_map[x])
-            with fp2:
-                agora_br = datetime.now(TZ_BR)
-                p_mes = st.text_input("Mês (YYYY-MM)", value=agora_br.strftime("%Y-%m"))
-            with fp3:
-                MESES_PT = ["","Janeiro","Fevereiro","Março","Abril","Maio","Junho",
-                            "Julho","Agosto","Setembro","Outubro","Novembro","Dezembro"]
-                try:
-                    y, m = p_mes.split("-")
-                    p_nome = f"{MESES_PT[int(m)]}/{y}"
-                except Exception:
-                    p_nome = p_mes
-                st.text_input("Nome do plano", value=p_nome, disabled=True)
-
-            if st.form_submit_button("✓ Criar plano", type="primary", use_container_width=True):
-                db.salvar_plano(p_aluno, p_nome, p_mes)
-                st.success(f"✓ Plano '{p_nome}' criado para {aluno_map[p_aluno]}!")
-                st.rerun()
+@st.fragment
+def aba_planos():
+    with db.rotulo("Planos"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📅 Planos de Treino</div>', unsafe_allow_html=True)
+
+        alunos_df = db.listar_alunos(colunas=db.COLS_ALUNO_SELETOR)
+        if alunos_df.empty:
+            st.warning("Cadastre um aluno primeiro.")
+        else:
+            aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
+
+            with st.form("form_plano", clear_on_submit=True):
+                st.markdown("**Novo plano**")
+                fp1, fp2, fp3 = st.columns([2, 1, 1])
+                with fp1:
+                    p_aluno = st.selectbox("Aluno", options=list(aluno_map.keys()),
+                                           format_func=lambda x: aluno_map[x])
+                with fp2:
+                    agora_br = datetime.now(TZ_BR)
+                    p_mes = st.text_input("Mês (YYYY-MM)", value=agora_br.strftime("%Y-%m"))
+                with fp3:
+                    p_nome = db.nome_do_mes(p_mes)
+                    st.text_input("Nome do plano", value=p_nome, disabled=True)
+
+                if st.form_submit_button("✓ Criar plano", type="primary", use_container_width=True):
+                    db.salvar_plano(p_aluno, p_nome, p_mes)
+                    st.success(f"✓ Plano '{p_nome}' criado para {aluno_map[p_aluno]}!")
+                    st.rerun()
 
-        st.divider()
-        planos_df = db.listar_planos()
-        if not planos_df.empty:
-            planos_df["aluno_nome"] = planos_df["aluno_id"].apply(
-                lambda x: aluno_map.get(int(x), "—"))
-            for aluno_nome in planos_df["aluno_nome"].unique():
-                st.markdown(f"**👤 {aluno_nome}**")
-                df_a = planos_df[planos_df["aluno_nome"] == aluno_nome]
-                for _, row in df_a.iterrows():
-                    c1, c2 = st.columns([4, 1])
-                    c1.markdown(f"📅 {row['nome']} — `{row['mes']}`")
-                    if c2.button("🗑", key=f"del_plano_{row['id']}"):
-                        db.excluir_plano(int(row["id"]))
+            with st.expander("🔁 Copiar plano / virar o mês"):
+                todos_planos = db.listar_planos(colunas=db.COLS_PLANO_SELETOR)
+                if todos_planos.empty:
+                    st.caption("Nenhum plano para copiar ainda.")
+                else:
+                    copia_map = {int(r["id"]): f"{aluno_map.get(int(r['aluno_id']), '—')} — {r['nome']}"
+                                 for _, r in todos_planos.iterrows()}
+                    with st.form("form_copiar_plano"):
+                        cp1, cp2 = st.columns([3, 1])
+                        with cp1:
+                            c_plano = st.selectbox("Plano de origem", options=list(copia_map.keys()),
+                                                   format_func=lambda x: copia_map[x])
+                        with cp2:
+                            proximo = (datetime.now(TZ_BR).replace(day=1) + timedelta(days=32)).strftime("%Y-%m")
+                            c_mes = st.text_input("Para o mês", value=proximo)
+                        c_alunos = st.multiselect("Para os alunos (vazio = o dono do plano)",
+                                                  options=list(aluno_map.keys()), format_func=lambda x: aluno_map[x])
+                        if st.form_submit_button("Copiar plano", use_container_width=True):
+                            novos = db.clonar_plano(c_plano, c_mes, aluno_ids=c_alunos or None)
+                            st.success(f"✓ {len(novos)} plano(s) '{db.nome_do_mes(c_mes)}' criado(s)")
+                    vm_mes = st.text_input("Virar o mês: copiar o plano do mês anterior de todos os alunos ativos para",
+                                           value=datetime.now(TZ_BR).strftime("%Y-%m"), key="virar_mes_destino")
+                    if st.button("🔁 Virar o mês", key="virar_mes", use_container_width=True):
+                        novos = db.virar_mes(vm_mes)
+                        st.success(f"✓ {len(novos)} plano(s) copiado(s) de {db.mes_anterior(vm_mes)} para {vm_mes}")
+            importador("planos", "planos")
+
+            st.divider()
+            filtro_aluno = st.selectbox("Filtrar por aluno", options=[None] + list(aluno_map.keys()),
+                                        format_func=lambda x: "Todos" if x is None else aluno_map[x],
+                                        key="planos_filtro_aluno")
+            chave_pag = f"planos_paginas_{filtro_aluno}"
+            planos_df, mais_planos = carregar_paginas(db.pagina_planos, chave_pag, aluno_id=filtro_aluno,
+                                                      colunas=db.COLS_PLANO_SELETOR)
+            if not planos_df.empty:
+                planos_df["aluno_nome"] = planos_df["aluno_id"].apply(
+                    lambda x: aluno_map.get(int(x), "—"))
+                st.markdown(render.planos_html(planos_df[["aluno_nome", "nome", "mes"]]),
+                            unsafe_allow_html=True)
+                plano_del_map = {int(r["id"]): f"{r['aluno_nome']} — {r['nome']}" for _, r in planos_df.iterrows()}
+                pd1, pd2 = st.columns([4, 1])
+                with pd1:
+                    plano_del = st.selectbox("Plano", options=list(plano_del_map.keys()),
+                                             format_func=lambda x: plano_del_map[x], key="del_plano_sel",
+                                             label_visibility="collapsed")
+                with pd2:
+                    if st.button("🗑 Excluir", key="del_plano", use_container_width=True,
+                                 help="Apaga treinos, exercícios e séries do plano. O histórico dos alunos "
+                                      "fica (exercícios, cargas, progresso), sem o nome do treino."):
+                        db.excluir_plano(plano_del)
                         st.rerun()
+                st.caption(f"{len(planos_df)} de {db.contar_planos(filtro_aluno)} plano(s)")
+                botao_carregar_mais(chave_pag, mais_planos)
+
 
 # ══════════════════════════════════════════════════════════════════════════
 # TAB 4 — FICHA DE TREINO
 # ══════════════════════════════════════════════════════════════════════════
-with tab_ficha:
-    st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📋 Ficha de Treino</div>', unsafe_allow_html=True)
+@st.fragment
+def aba_ficha():
+    with db.rotulo("Ficha"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📋 Ficha de Treino</div>', unsafe_allow_html=True)
+
+        # As três listas são independentes: saem juntas (a tela espera só a mais lenta)
+        alunos_df, planos_df, cat = db.em_paralelo(
+            lambda: db.listar_alunos(colunas=db.COLS_ALUNO_SELETOR),
+            lambda: db.listar_planos(colunas=db.COLS_PLANO_SELETOR),
+            catalogo.carregar,
+        )
+        if planos_df.empty or alunos_df.empty:
+            st.warning("Cadastre um aluno e crie um plano primeiro.")
+        else:
+            aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
+            planos_df["aluno_nome"] = planos_df["aluno_id"].apply(lambda x: aluno_map.get(int(x), "—"))
+            planos_df["label"] = planos_df["aluno_nome"] + " — " + planos_df["nome"]
+            plano_map = {int(r["id"]): r["label"] for _, r in planos_df.iterrows()}
+
+            sel_plano = st.selectbox("Selecione o plano", options=list(plano_map.keys()),
+                                      format_func=lambda x: plano_map[x])
+
+            # Plano inteiro (treinos → itens → séries) numa única consulta
+            ficha = db.carregar_ficha(sel_plano)
+
+            # ── Layout duas colunas ──────────────────────────────────────────
+            col_esq, col_dir = st.columns([1, 1], gap="large")
+
+            # ── COLUNA ESQUERDA — Formulários ────────────────────────────────
+            with col_esq:
+                st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Adicionar Treino</div>', unsafe_allow_html=True)
+
+                with st.form("form_treino", clear_on_submit=True):
+                    ft1, ft2 = st.columns([1, 2])
+                    with ft1:
+                        t_nome = st.text_input("Treino", placeholder="A, B, C...")
+                    with ft2:
+                        t_desc = st.text_input("Descrição", placeholder="Ex: Peito e Tríceps")
+                    if st.form_submit_button("+ Adicionar treino", use_container_width=True):
+                        if t_nome.strip():
+                            ordem = len(ficha)
+                            db.salvar_treino(sel_plano, t_nome.upper(), t_desc, ordem)
+                            recarregar_fragmento()
+
+                if ficha:
+
+                    # Selectbox para escolher em qual treino adicionar exercício
+                    st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:20px 0 12px">Adicionar Exercício</div>', unsafe_allow_html=True)
+
+                    treino_sel_map = {int(t["id"]): f"Treino {t['nome']} — {t['descricao'] or ''}" for t in ficha}
+                    treino_sel_id = st.selectbox("Treino de destino", options=list(treino_sel_map.keys()),
+                                                  format_func=lambda x: treino_sel_map[x], key="treino_dest")
+
+                    itens_dest = next(t["itens"] for t in ficha if int(t["id"]) == treino_sel_id)
+
+                    ex_busca = st.text_input("Buscar exercício", placeholder="Ex: supino incl", key="ex_busca")
+                    ex_opcoes = cat.buscar(ex_busca)
+                    if not ex_opcoes:
+                        st.caption("Nenhum exercício encontrado — mostrando todos.")
+                        ex_opcoes = cat.buscar("")
+
+                    fi1, fi2 = st.columns([3, 1])
+                    with fi1:
+                        ex_sel = st.selectbox("Exercício", options=ex_opcoes, format_func=cat.nome, key="ex_novo")
+                    with fi2:
+                        tipo_s = st.selectbox("Tipo", options=["linear","piramide"],
+                                               format_func=lambda x: "Linear" if x == "linear" else "Pirâmide",
+                                               key="tipo_novo")
+
+                    fi3, fi4 = st.columns([1, 2])
+                    with fi3:
+                        descanso = st.number_input("Descanso (s)", min_value=10, max_value=300,
+                                                    value=60, step=5, key="desc_novo")
+                    with fi4:
+                        comb_opts = {"": "— Nenhum —"}
+                        comb_opts.update({str(int(it["id"])): it["exercicio_nome"] for it in itens_dest})
+                        comb_sel = st.selectbox("Combinado com", options=list(comb_opts.keys()),
+                                                 format_func=lambda x: comb_opts[x], key="comb_novo")
+
+                    obs_item = st.text_input("Observação", key="obs_novo")
+
+                    n_series = st.number_input("Nº de séries", min_value=1, max_value=8, value=3,
+                                                step=1, key="ns_novo")
+
+                    st.markdown('<div style="font-size:12px;color:#7a7f96;margin:8px 0 4px">Séries</div>', unsafe_allow_html=True)
+                    series_cols = st.columns(int(n_series))
+                    series_keys = list(range(int(n_series)))
+                    for i in series_keys:
+                        with series_cols[i]:
+                            st.markdown(f"**{i+1}ª**")
+                            st.number_input("Reps", min_value=1, max_value=100,
+                                             value=12, key=f"reps_novo_{i}")
+                            st.number_input("kg", min_value=0.0, step=0.5,
+                                             value=0.0, key=f"carga_novo_{i}")
+
+                    if st.button("✓ Adicionar exercício", type="primary",
+                                  use_container_width=True, key="btn_add_ex"):
+                        # Um cartão pode ter removido itens sem rerodar este formulário
+                        dest = next((t for t in db.carregar_ficha(sel_plano) if int(t["id"]) == treino_sel_id), None)
+                        mapa = {}
+                        if dest is not None and dest["modelo"]:
+                            # Treino ainda no modelo: copia os itens antes de editar (ids novos)
+                            mapa = db.materializar_treino(treino_sel_id, personalizar=True)
+                            dest = next((t for t in db.carregar_ficha(sel_plano) if int(t["id"]) == treino_sel_id), None)
+                        itens_dest = dest["itens"] if dest is not None else []
+                        comb_id = mapa.get(int(comb_sel), int(comb_sel)) if comb_sel else None
+                        if comb_id not in {it["id"] for it in itens_dest}:
+                            comb_id = None
+                        series_vals = [(st.session_state[f"reps_novo_{i}"],
+                                        st.session_state[f"carga_novo_{i}"]) for i in series_keys]
+                        series_vals = [(reps, carga if carga > 0 else None) for reps, carga in series_vals]
+                        item = dict(treino_id=treino_sel_id, exercicio_id=ex_sel,
+                                    ordem=len(itens_dest) + len(otimista.pendentes("treino_itens", treino_id=treino_sel_id)),
+                                    tipo_serie=tipo_s, descanso_seg=descanso, combinado_com=comb_id,
+                                    observacao=obs_item)
+                        # Aparece no cartão já; o banco confirma (ou desfaz) em segundo plano
+                        otimista.enviar("treino_itens",
+                                        {**item, "exercicio_nome": f"{cat.nome(ex_sel)} ⏳",
+                                         "series": [{"numero": n, "repeticoes": r, "carga": c}
+                                                    for n, (r, c) in enumerate(series_vals, 1)]},
+                                        f"Exercício '{cat.nome(ex_sel)}'", db.salvar_item_com_series,
+                                        item, series_vals)
+                        st.rerun()
 
-    planos_df = db.listar_planos()
-    if planos_df.empty or alunos_df.empty:
-        st.warning("Cadastre um aluno e crie um plano primeiro.")
-    else:
-        aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
-        planos_df["aluno_nome"] = planos_df["aluno_id"].apply(lambda x: aluno_map.get(int(x), "—"))
-        planos_df["label"] = planos_df["aluno_nome"] + " — " + planos_df["nome"]
-        plano_map = {int(r["id"]): r["label"] for _, r in planos_df.iterrows()}
+            # ── COLUNA DIREITA — Treinos criados ─────────────────────────────
+            with col_dir:
+                st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Treinos do Plano</div>', unsafe_allow_html=True)
 
-        sel_plano = st.selectbox("Selecione o plano", options=list(plano_map.keys()),
-                                  format_func=lambda x: plano_map[x])
+                if not ficha:
+                    st.markdown("""
+                    <div style="background:#16181f;border:1px dashed #2a2d3a;border-radius:14px;padding:32px;text-align:center;color:#7a7f96">
+                        Nenhum treino criado ainda.<br>Adicione um treino ao lado.
+                    </div>""", unsafe_allow_html=True)
+                else:
+                    for treino in ficha:
+                        card_treino(sel_plano, int(treino["id"]))
+
+
+@st.fragment
+def card_treino(plano_id, treino_id):
+    """Um treino da ficha; remover exercício reroda só este cartão."""
+    with db.rotulo("Ficha"):
+        treino = next((t for t in db.carregar_ficha(plano_id) if int(t["id"]) == treino_id), None)
+        if treino is None:
+            return
+        itens = treino["itens"]
+
+        # Treino inteiro num st.markdown (memoizado pelo conteúdo), com os itens ainda salvando
+        pend = otimista.pendentes("treino_itens", treino_id=treino_id)
+        st.markdown(render.treino_html({**treino, "itens": itens + pend}), unsafe_allow_html=True)
+
+        if itens:
+            item_map = {int(it["id"]): it["exercicio_nome"] for it in itens}
+            ci1, ci2 = st.columns([4, 1])
+            with ci1:
+                item_del = st.selectbox("Exercício", options=list(item_map.keys()),
+                                        format_func=lambda x: item_map[x],
+                                        key=f"del_item_sel_{treino_id}",
+                                        label_visibility="collapsed")
+            with ci2:
+                if st.button("🗑 Remover", key=f"del_item_{treino_id}", use_container_width=True):
+                    if treino["modelo"]:  # primeira edição: o treino ganha itens próprios
+                        item_del = db.materializar_treino(treino_id, personalizar=True).get(item_del, item_del)
+                    db.excluir_item(item_del)
+                    recarregar_fragmento()
+
+        # Some da lista de treinos de destino do formulário: reroda a aba inteira
+        if st.button(f"🗑 Excluir treino {treino['nome']}", key=f"del_treino_{treino_id}",
+                     help="O histórico dos alunos fica (exercícios, cargas, progresso), sem o nome do treino."):
+            db.excluir_treino(treino_id)
+            st.rerun()
+
+        st.markdown("<div style='margin-bottom:12px'></div>", unsafe_allow_html=True)
 
-        treinos_df = db.listar_treinos(sel_plano)
 
-        # ── Layout duas colunas ──────────────────────────────────────────
+# ══════════════════════════════════════════════════════════════════════════
+# TAB 5 — MODELOS
+# ══════════════════════════════════════════════════════════════════════════
+@st.fragment
+def aba_modelos():
+    with db.rotulo("Modelos"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📚 Modelos de Treino</div>', unsafe_allow_html=True)
+
+        alunos_df, planos_df, modelos_df = db.em_paralelo(
+            lambda: db.listar_alunos(colunas=db.COLS_ALUNO_SELETOR),
+            lambda: db.listar_planos(colunas=db.COLS_PLANO_SELETOR),
+            lambda: db.listar_modelos(),
+        )
+        aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
+        modelo_map = {int(r["id"]): r["nome"] for _, r in modelos_df.iterrows()}
+
         col_esq, col_dir = st.columns([1, 1], gap="large")
 
-        # ── COLUNA ESQUERDA — Formulários ────────────────────────────────
         with col_esq:
-            st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Adicionar Treino</div>', unsafe_allow_html=True)
-
-            with st.form("form_treino", clear_on_submit=True):
-                ft1, ft2 = st.columns([1, 2])
-                with ft1:
-                    t_nome = st.text_input("Treino", placeholder="A, B, C...")
-                with ft2:
-                    t_desc = st.text_input("Descrição", placeholder="Ex: Peito e Tríceps")
-                if st.form_submit_button("+ Adicionar treino", use_container_width=True):
-                    if t_nome.strip():
-                        ordem = len(treinos_df)
-                        db.salvar_treino(sel_plano, t_nome.upper(), t_desc, ordem)
-                        st.rerun()
-
-            if not treinos_df.empty:
-                ex_map = {int(r["id"]): r["nome"] for _, r in exercicios_df.iterrows()}
-
-                # Selectbox para escolher em qual treino adicionar exercício
-                st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:20px 0 12px">Adicionar Exercício</div>', unsafe_allow_html=True)
-
-                treino_sel_map = {int(r["id"]): f"Treino {r['nome']} — {r['descricao'] or ''}" for _, r in treinos_df.iterrows()}
-                treino_sel_id = st.selectbox("Treino de destino", options=list(treino_sel_map.keys()),
-                                              format_func=lambda x: treino_sel_map[x], key="treino_dest")
-
-                itens_dest = db.listar_itens(treino_sel_id)
-
-                fi1, fi2 = st.columns([3, 1])
-                with fi1:
-                    ex_sel = st.selectbox("Exercício", options=list(ex_map.keys()),
-                                           format_func=lambda x: ex_map[x], key="ex_novo")
-                with fi2:
-                    tipo_s = st.selectbox("Tipo", options=["linear","piramide"],
-                                           format_func=lambda x: "Linear" if x == "linear" else "Pirâmide",
-                                           key="tipo_novo")
-
-                fi3, fi4 = st.columns([1, 2])
-                with fi3:
-                    descanso = st.number_input("Descanso (s)", min_value=10, max_value=300,
-                                                value=60, step=5, key="desc_novo")
-                with fi4:
-                    comb_opts = {"": "— Nenhum —"}
-                    if not itens_dest.empty:
-                        comb_opts.update({str(int(r["id"])): r["exercicio_nome"]
-                                           for _, r in itens_dest.iterrows()})
-                    comb_sel = st.selectbox("Combinado com", options=list(comb_opts.keys()),
-                                             format_func=lambda x: comb_opts[x], key="comb_novo")
-
-                obs_item = st.text_input("Observação", key="obs_novo")
-
-                n_series = st.number_input("Nº de séries", min_value=1, max_value=8, value=3,
-                                            step=1, key="ns_novo")
-
-                st.markdown('<div style="font-size:12px;color:#7a7f96;margin:8px 0 4px">Séries</div>', unsafe_allow_html=True)
-                series_cols = st.columns(int(n_series))
-                series_keys = list(range(int(n_series)))
-                for i in series_keys:
-                    with series_cols[i]:
-                        st.markdown(f"**{i+1}ª**")
-                        st.number_input("Reps", min_value=1, max_value=100,
-                                         value=12, key=f"reps_novo_{i}")
-                        st.number_input("kg", min_value=0.0, step=0.5,
-                                         value=0.0, key=f"carga_novo_{i}")
-
-                if st.button("✓ Adicionar exercício", type="primary",
-                              use_container_width=True, key="btn_add_ex"):
-                    comb_id = int(comb_sel) if comb_sel else None
-                    series_vals = [(st.session_state[f"reps_novo_{i}"],
-                                    st.session_state[f"carga_novo_{i}"]) for i in series_keys]
-                    item = db.salvar_item(
-                        treino_id=treino_sel_id, exercicio_id=ex_sel,
-                        ordem=len(itens_dest), tipo_serie=tipo_s,
-                        descanso_seg=descanso, combinado_com=comb_id, observacao=obs_item
-                    )
-                    item_id = item["id"]
-                    for i, (reps, carga) in enumerate(series_vals):
-                        db.salvar_serie(item_id, i+1, reps, carga if carga > 0 else None)
-                    st.success("✓ Exercício adicionado!")
-                    st.rerun()
+            st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Salvar treino como modelo</div>', unsafe_allow_html=True)
+            if planos_df.empty:
+                st.caption("Crie um plano com treinos na Ficha de Treino primeiro.")
+            else:
+                plano_map = {int(r["id"]): f"{aluno_map.get(int(r['aluno_id']), '—')} — {r['nome']}"
+                             for _, r in planos_df.iterrows()}
+                m_plano = st.selectbox("Plano", options=list(plano_map.keys()),
+                                       format_func=lambda x: plano_map[x], key="modelo_plano")
+                ficha = {int(t["id"]): t for t in db.carregar_ficha(m_plano)}
+                if not ficha:
+                    st.caption("Este plano não tem treinos.")
+                else:
+                    m_treino = st.selectbox("Treino", options=list(ficha.keys()), key="modelo_treino",
+                                            format_func=lambda x: f"Treino {ficha[x]['nome']} — {ficha[x]['descricao'] or ''}")
+                    m_nome = st.text_input("Nome do modelo", placeholder="Ex: Hipertrofia A — Peito",
+                                           key="modelo_nome")
+                    if st.button("✓ Salvar modelo", type="primary", use_container_width=True, key="btn_salvar_modelo"):
+                        if not m_nome.strip():
+                            st.error("Dê um nome ao modelo.")
+                        elif m_nome.strip() in modelo_map.values():
+                            st.error("Já existe um modelo com esse nome.")
+                        else:
+                            db.modelo_de_treino(ficha[m_treino], m_nome.strip())
+                            recarregar_fragmento()
+
+            if modelo_map and aluno_map:
+                st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:20px 0 12px">Atribuir a alunos</div>', unsafe_allow_html=True)
+                with st.form("form_atribuir_modelo"):
+                    a_modelo = st.selectbox("Modelo", options=list(modelo_map.keys()),
+                                            format_func=lambda x: modelo_map[x])
+                    a_alunos = st.multiselect("Alunos", options=list(aluno_map.keys()),
+                                              format_func=lambda x: aluno_map[x])
+                    a_todos = st.checkbox("Todos os alunos")
+                    am1, am2 = st.columns(2)
+                    with am1:
+                        a_mes = st.text_input("Mês (YYYY-MM)", value=datetime.now(TZ_BR).strftime("%Y-%m"))
+                    with am2:
+                        a_nome = st.text_input("Nome do treino", placeholder="Próxima letra do plano")
+                    if st.form_submit_button("Atribuir modelo", use_container_width=True):
+                        destino = list(aluno_map.keys()) if a_todos else a_alunos
+                        if not destino:
+                            st.error("Escolha pelo menos um aluno.")
+                        else:
+                            novos = db.atribuir_modelo(a_modelo, destino, a_mes, nome=a_nome.strip().upper() or None)
+                            st.success(f"✓ '{modelo_map[a_modelo]}' atribuído a {len(novos)} aluno(s) "
+                                       f"em {db.nome_do_mes(a_mes)}")
 
-        # ── COLUNA DIREITA — Treinos criados ─────────────────────────────
         with col_dir:
-            st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Treinos do Plano</div>', unsafe_allow_html=True)
+            st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Biblioteca</div>', unsafe_allow_html=True)
+            if not modelo_map:
+                st.caption("Nenhum modelo ainda. Salve um treino como modelo ao lado.")
+            else:
+                modelos = db.em_paralelo(*[lambda m=m: db.carregar_modelo(m) for m in modelo_map])
+                for modelo in filter(None, modelos):
+                    st.markdown(render.treino_html(modelo), unsafe_allow_html=True)
+                md1, md2 = st.columns([4, 1])
+                with md1:
+                    modelo_del = st.selectbox("Modelo", options=list(modelo_map.keys()),
+                                              format_func=lambda x: modelo_map[x], key="del_modelo_sel",
+                                              label_visibility="collapsed")
+                with md2:
+                    if st.button("🗑 Excluir", key="del_modelo", use_container_width=True):
+                        try:
+                            db.excluir_modelo(modelo_del)
+                            recarregar_fragmento()
+                        except APIError as e:
+                            if e.code != "23503":
+                                raise
+                            st.warning("Modelo em uso por treinos de alunos — não pode ser excluído.")
+
 
-            if treinos_df.empty:
-                st.markdown("""
-                <div style="background:#16181f;border:1px dashed #2a2d3a;border-radius:14px;padding:32px;text-align:center;color:#7a7f96">
-                    Nenhum treino criado ainda.<br>Adicione um treino ao lado.
-                </div>""", unsafe_allow_html=True)
+# ══════════════════════════════════════════════════════════════════════════
+# TAB 6 — PROGRESSO
+# ══════════════════════════════════════════════════════════════════════════
+@st.fragment
+def aba_progresso():
+    with db.rotulo("Progresso"):
+        st.markdown('<div style="font-family:\'DM Serif Display\',serif;font-size:24px;color:#e8eaf0;margin-bottom:20px">📈 Progresso</div>', unsafe_allow_html=True)
+
+        alunos_df = db.listar_alunos(colunas=db.COLS_ALUNO_SELETOR)
+        if alunos_df.empty:
+            st.warning("Cadastre um aluno primeiro.")
+        else:
+            aluno_map = {int(r["id"]): r["nome"] for _, r in alunos_df.iterrows()}
+            pg1, pg2 = st.columns([2, 1])
+            with pg1:
+                prog_aluno = st.selectbox("Aluno", options=list(aluno_map.keys()),
+                                           format_func=lambda x: aluno_map[x], key="prog_aluno")
+            with pg2:
+                prog_nivel = st.radio("Agrupar por", options=["exercicio", "grupo"], horizontal=True,
+                                      format_func=lambda x: "Exercício" if x == "exercicio" else "Grupo",
+                                      key="prog_nivel")
+
+            # Agregados semanais mantidos no banco: custo por semana, não por série
+            prog = analytics.carregar_progresso(prog_aluno)
+            if prog.empty:
+                st.info("Nenhuma série registrada por este aluno ainda.")
             else:
-                for _, treino in treinos_df.iterrows():
-                    treino_id = int(treino["id"])
-                    itens_df = db.listar_itens(treino_id)
-
-                    # Cabeçalho do treino
-                    st.markdown(f"""
-                    <div style="background:#16181f;border:1px solid #2a2d3a;border-top:3px solid #c8f564;border-radius:14px;padding:16px 20px;margin-bottom:4px">
-                        <div style="display:flex;justify-content:space-between;align-items:center">
-                            <div>
-                                <span style="font-family:'DM Serif Display',serif;font-size:20px;color:#c8f564">Treino {treino['nome']}</span>
-                                <span style="font-size:13px;color:#7a7f96;margin-left:10px">{treino['descricao'] or ''}</span>
-                            </div>
-                            <span style="font-size:12px;color:#7a7f96">{len(itens_df)} exercício(s)</span>
-                        </div>
-                    </div>""", unsafe_allow_html=True)
+                rec = analytics.recordes_progresso(prog)
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Semanas", prog["semana"].nunique())
+                m2.metric("Séries", int(prog["series"].sum()))
+                m3.metric("Volume (kg)", f"{prog['volume'].sum():,.0f}".replace(",", "."))
+                m4.metric("Recordes", int(rec["novos"].sum()))
+
+                st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:20px 0 12px">Volume semanal</div>', unsafe_allow_html=True)
+                semanal = analytics.tendencia_progresso(prog, prog_nivel)
+                st.line_chart(semanal.pivot_table(index="semana", columns=prog_nivel, values="volume",
+                                                  aggfunc="sum", observed=True))
+
+                pc1, pc2 = st.columns(2)
+                with pc1:
+                    st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Volume total</div>', unsafe_allow_html=True)
+                    vol = analytics.volume_progresso(prog, prog_nivel)
+                    st.dataframe(vol[[prog_nivel, "series", "volume", "carga_max", "e1rm_max"]].rename(columns={
+                        prog_nivel: "Exercício" if prog_nivel == "exercicio" else "Grupo", "series": "Séries",
+                        "volume": "Volume (kg)", "carga_max": "Carga máx.", "e1rm_max": "1RM est."}),
+                        use_container_width=True, hide_index=True)
+                with pc2:
+                    st.markdown('<div style="font-size:13px;font-weight:600;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin-bottom:12px">Recordes (1RM estimado)</div>', unsafe_allow_html=True)
+                    st.dataframe(pd.DataFrame({
+                        "Exercício": rec["exercicio"], "Semana": rec["semana"].dt.strftime("%d/%m/%Y"),
+                        "Carga máx.": rec["carga_max"].map("{:g}kg".format),
+                        "1RM est.": rec["e1rm_max"].round(1),
+                    }), use_container_width=True, hide_index=True)
+
+
+# ── Aba ativa ──────────────────────────────────────────────────────────────
+VISOES = dict(zip(ABAS, [aba_alunos, aba_exercicios, aba_planos, aba_ficha, aba_modelos, aba_progresso]))
+VISOES[aba_atual]()
+
+# Escritas otimistas em voo: um fragmento confere a cada segundo e reroda o app
+# quando o banco responde (por isso enviar() é seguido de st.rerun(), não do
+# rerun só do fragmento — o fim do script precisa rodar para o vigia subir)
+otimista.acompanhar()
 
-                    if itens_df.empty:
-                        st.markdown('<div style="color:#7a7f96;font-size:13px;padding:8px 20px;margin-bottom:12px">Nenhum exercício ainda.</div>', unsafe_allow_html=True)
-                    else:
-                        for idx, item in itens_df.iterrows():
-                            item_id = int(item["id"])
-                            series_df = db.listar_series(item_id)
-                            tipo_badge = "🔺" if item["tipo_serie"] == "piramide" else "➡️"
-                            comb_txt = ""
-                            if item.get("combinado_com"):
-                                item_comb = itens_df[itens_df["id"] == item["combinado_com"]]
-                                if not item_comb.empty:
-                                    comb_txt = f"🔗 {item_comb.iloc[0]['exercicio_nome']}"
-
-                            series_html = ""
-                            for _, s in series_df.iterrows():
-                                carga_txt = f"/{s['carga']}kg" if s['carga'] else ""
-                                series_html += f'<span style="background:#1e2029;border:1px solid #2a2d3a;border-radius:6px;padding:3px 8px;margin-right:4px;font-family:DM Mono,monospace;font-size:11px;color:#c8f564">{int(s["numero"])}ª {int(s["repeticoes"])}x{carga_txt}</span>'
-
-                            col_info, col_del = st.columns([9, 1])
-                            with col_info:
-                                st.markdown(f"""
-                                <div style="background:#1e2029;border-left:3px solid #2a2d3a;border-radius:0 10px 10px 0;padding:12px 16px;margin-bottom:6px">
-                                    <div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:6px">
-                                        <span style="font-weight:600;color:#e8eaf0;font-size:14px">{tipo_badge} {item['exercicio_nome']}</span>
-                                        <span style="font-size:11px;color:#7a7f96">⏱ {item['descanso_seg']}s {'· ' + comb_txt if comb_txt else ''}</span>
-                                    </div>
-                                    <div style="flex-wrap:wrap">{series_html}</div>
-                                    {f'<div style="font-size:11px;color:#6af0c8;margin-top:6px">📝 {item["observacao"]}</div>' if item.get("observacao") else ''}
-                                </div>""", unsafe_allow_html=True)
-                            with col_del:
-                                if st.button("🗑", key=f"del_item_{item_id}"):
-                                    db.excluir_series_do_item(item_id)
-                                    db.excluir_item(item_id)
-                                    st.rerun()
-
-                    if st.button(f"🗑 Excluir treino {treino['nome']}", key=f"del_treino_{treino_id}"):
-                        db.excluir_treino(treino_id)
-                        st.rerun()
 
-                    st.markdown("<div style='margin-bottom:12px'></div>", unsafe_allow_html=True)
+# ══════════════════════════════════════════════════════════════════════════
+# PAINEL DE CONSULTAS (depuração)
+# ══════════════════════════════════════════════════════════════════════════
+if painel_debug:
+    with st.sidebar:
+        chamadas = db.chamadas()
+        st.markdown('<div style="font-size:11px;color:#7a7f96;text-transform:uppercase;letter-spacing:1.5px;margin:16px 0 8px">Consultas deste rerun</div>', unsafe_allow_html=True)
+        if not chamadas:
+            st.caption("Nenhuma consulta — tudo veio do cache.")
+        else:
+            cham_df = pd.DataFrame(chamadas)
+            d1, d2 = st.columns(2)
+            d1.metric("Consultas", len(cham_df))
+            d2.metric("Tempo (ms)", f"{cham_df['latencia_ms'].sum():.0f}")
+            d1.metric("Linhas", int(cham_df["linhas"].sum()))
+            d2.metric("KB", f"{cham_df['bytes'].fillna(0).sum() / 1024:.1f}")
+            st.caption(f"Retentativas: {int(cham_df['retentativas'].sum())} · "
+                       f"Erros: {int(cham_df['erro'].notna().sum())}")
+            st.dataframe(cham_df.groupby("rotulo", sort=False)
+                         .agg(consultas=("tabela", "size"), ms=("latencia_ms", "sum"))
+                         .round(1), use_container_width=True)
+            st.markdown("**Mais lentas**")
+            st.dataframe(cham_df.nlargest(5, "latencia_ms")[["rotulo", "funcao", "tabela", "op", "linhas", "latencia_ms"]],
+                         hide_index=True, use_container_width=True)
+            st.download_button("⬇ JSONL deste rerun", db.exportar_chamadas(chamadas),
+                               file_name="gymflow_consultas.jsonl", mime="application/json",
+                               use_container_width=True)
+        st.download_button("⬇ JSONL completo", db.exportar_chamadas(),
+                           file_name="gymflow_consultas_todas.jsonl", mime="application/json",
+                           use_container_width=True)
@@ -0,0 +1,273 @@
+"""
+gymflow/bench.py — Benchmark do db.py e da renderização do app do professor
+
+Semeia um banco SQLite local (db_local) com dados sintéticos na escala pedida,
+mede cada função do db.py e uma renderização headless completa do app.py e
+reporta p50/p95, nº de consultas e pico de memória. Cada execução é gravada
+numa linha de JSON para comparar com as anteriores e pegar regressões.
+
+    python bench.py --escala pequena
+    python bench.py --escala grande --repeticoes 10 --comparar
+    python bench.py --alunos 1000 --exercicios 500 --planos 10000 --historico 1000000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ESCALAS = {
+    "pequena": dict(alunos=50, exercicios=100, planos=200, historico=20_000),
+    "media": dict(alunos=300, exercicios=300, planos=2_000, historico=200_000),
+    "grande": dict(alunos=1_000, exercicios=500, planos=10_000, historico=1_000_000),
+}
+GRUPOS = ["Peito", "Costas", "Pernas", "Ombro", "Bíceps", "Tríceps", "Abdômen", "Cardio", "Outro"]
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+# ── Semeadura ──────────────────────────────────────────────────────────────
+
+def semear(caminho, alunos, exercicios, planos, historico, seed=42,
+           treinos_por_plano=3, itens_por_treino=6, series_por_item=3) -> dict:
+    """Popula o SQLite direto com executemany; devolve ids úteis para os casos."""
+    import db_local
+    rnd = random.Random(seed)
+    client = db_local.LocalClient(caminho)
+    conn = client.conn
+    hoje = date.today()
+    with conn:
+        conn.executemany("insert into alunos (id, nome, email, telefone, ativo) values (?,?,?,?,?)",
+                         ((i, f"Aluno {i:05d}", f"aluno{i}@gym.test", None, rnd.random() > 0.1)
+                          for i in range(1, alunos + 1)))
+        conn.executemany("insert into exercicios (id, nome, grupo, descricao) values (?,?,?,?)",
+                         ((i, f"Exercício {i:04d}", GRUPOS[i % len(GRUPOS)], None)
+                          for i in range(1, exercicios + 1)))
+        conn.executemany("insert into planos (id, aluno_id, nome, mes, ativo) values (?,?,?,?,?)",
+                         ((i, rnd.randint(1, alunos), f"Plano {i}",
+                           f"{2020 + i % 6}-{1 + i % 12:02d}", True) for i in range(1, planos + 1)))
+        treinos, itens, series = [], [], []
+        for p in range(1, planos + 1):
+            for t in range(treinos_por_plano):
+                tid = len(treinos) + 1
+                treinos.append((tid, p, "ABCDEF"[t], GRUPOS[t], t))
+                for o in range(itens_por_treino):
+                    iid = len(itens) + 1
+                    itens.append((iid, tid, rnd.randint(1, exercicios), o,
+                                  rnd.choice(["linear", "piramide"]), 60, None, None))
+                    for n in range(1, series_por_item + 1):
+                        series.append((len(series) + 1, iid, n, 12 - n, float(rnd.randint(0, 40) * 2.5)))
+        conn.executemany("insert into treinos (id, plano_id, nome, descricao, ordem) values (?,?,?,?,?)", treinos)
+        conn.executemany("insert into treino_itens (id, treino_id, exercicio_id, ordem, tipo_serie, "
+                         "descanso_seg, combinado_com, observacao) values (?,?,?,?,?,?,?,?)", itens)
+        conn.executemany("insert into series (id, treino_item_id, numero, repeticoes, carga) "
+                         "values (?,?,?,?,?)", series)
+        sessoes = max(1, historico // 20)
+        hist_treinos = []
+        for h in range(1, sessoes + 1):
+            dia = hoje - timedelta(days=rnd.randint(0, 365))
+            inicio = datetime(dia.year, dia.month, dia.day, 18, tzinfo=timezone.utc)
+            hist_treinos.append((h, rnd.randint(1, alunos), rnd.randint(1, len(treinos)), str(dia),
+                                 inicio.isoformat(), (inicio + timedelta(hours=1)).isoformat()))
+        conn.executemany("insert into historico_treinos (id, aluno_id, treino_id, data, iniciado_em, "
+                         "finalizado_em) values (?,?,?,?,?,?)", hist_treinos)
+        conn.executemany(
+            "insert into historico_series (historico_treino_id, treino_item_id, serie_numero, "
+            "repeticoes_feitas, carga_usada, executado_em) values (?,?,?,?,?,?)",
+            ((1 + k // 20, rnd.randint(1, len(itens)), 1 + k % 3, rnd.randint(6, 15),
+              float(rnd.randint(0, 40) * 2.5), hist_treinos[k // 20][4]) for k in range(historico)))
+    conn.execute("analyze")
+    plano_maior = conn.execute("select plano_id from treinos group by plano_id order by count(*) desc "
+                               "limit 1").fetchone()[0]
+    aluno = conn.execute("select aluno_id from planos where id = ?", (plano_maior,)).fetchone()[0]
+    client.conn.close()
+    return {"plano_id": plano_maior, "aluno_id": aluno, "treino_id": treinos[0][0] if treinos else None,
+            "item_id": itens[0][0] if itens else None, "exercicio_id": 1}
+
+
+# ── Medição ────────────────────────────────────────────────────────────────
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))]
+
+
+def medir(fn, repeticoes, frio=True) -> dict:
+    """p50/p95 em ms, consultas por chamada e pico de memória (KiB) de `fn`."""
+    import db
+    # Uma passada com tracemalloc só para a memória; o tracing distorce o tempo
+    if frio:
+        db.limpar_cache()
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tempos, consultas = [], []
+    for _ in range(repeticoes):
+        if frio:
+            db.limpar_cache()
+        antes = db.metricas_retry().get("chamadas", 0)
+        t0 = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - t0) * 1000)
+        consultas.append(db.metricas_retry().get("chamadas", 0) - antes)
+    return {"p50_ms": round(_percentil(tempos, 50), 3), "p95_ms": round(_percentil(tempos, 95), 3),
+            "consultas": max(consultas), "pico_kib": round(pico / 1024, 1)}
+
+
+def casos(ids) -> dict:
+    """Nome → callable para cada operação medida."""
+    import db
+    import analytics
+    import catalogo
+
+    def criar_e_excluir_item():
+        item = db.salvar_item_com_series(
+            dict(treino_id=ids["treino_id"], exercicio_id=ids["exercicio_id"], ordem=99,
+                 tipo_serie="linear", descanso_seg=60),
+            [(12, 20), (10, 25), (8, 30), (6, 35)])
+        db.excluir_item(item["id"])
+
+    def criar_e_excluir_plano():
+        plano = db.salvar_plano(ids["aluno_id"], "Bench", "2099-01")
+        treino = db.salvar_treino(plano["id"], "A", "Bench", 0)
+        db.salvar_item_com_series(
+            dict(treino_id=treino["id"], exercicio_id=ids["exercicio_id"], ordem=0,
+                 tipo_serie="linear", descanso_seg=60), [(12, 20)] * 3)
+        db.excluir_plano(plano["id"])
+
+    return {
+        "listar_alunos": lambda: db.listar_alunos(),
+        "listar_alunos(todos)": lambda: db.listar_alunos(apenas_ativos=False),
+        "listar_exercicios": lambda: db.listar_exercicios(),
+        "catalogo: montar": lambda: catalogo.carregar.sem_cache(),
+        "catalogo: buscar('supino incl')": lambda: catalogo.carregar().buscar("supino incl"),
+        "listar_planos": lambda: db.listar_planos(),
+        "listar_planos(aluno)": lambda: db.listar_planos(ids["aluno_id"]),
+        "pagina_planos": lambda: db.pagina_planos(),
+        "iter_planos (tabela toda)": lambda: sum(len(p) for p in db.iter_planos()),
+        "listar_treinos": lambda: db.listar_treinos(ids["plano_id"]),
+        "listar_itens": lambda: db.listar_itens(ids["treino_id"]),
+        "listar_series": lambda: db.listar_series(ids["item_id"]),
+        "carregar_ficha": lambda: db.carregar_ficha(ids["plano_id"]),
+        "ficha: 3 listas em sequência": lambda: [db.listar_alunos(), db.listar_planos(), db.listar_exercicios()],
+        "ficha: 3 listas em_paralelo": lambda: db.em_paralelo(db.listar_alunos, db.listar_planos,
+                                                            db.listar_exercicios),
+        "listar_historico": lambda: db.listar_historico(ids["aluno_id"]),
+        "analytics.carregar_series(aluno)": lambda: analytics.carregar_series.sem_cache(ids["aluno_id"]),
+        "analytics.tendencia_semanal(aluno)": lambda: analytics.tendencia_semanal(
+            analytics.carregar_series(ids["aluno_id"])),
+        "salvar_item_com_series+excluir": criar_e_excluir_item,
+        "plano_completo+excluir": criar_e_excluir_plano,
+    }
+
+
+# Abas do app.py (só a selecionada executa)
+ABAS = ["👤 Alunos", "💪 Exercícios", "📅 Planos", "📋 Ficha de Treino", "📚 Modelos", "📈 Progresso"]
+
+
+def renderizar(aba=None):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP, default_timeout=600)
+    if aba:
+        at.session_state["aba"] = aba
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+# ── Relatório ──────────────────────────────────────────────────────────────
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def imprimir(resultados: dict, anterior: dict | None, limite: float) -> list[str]:
+    regressoes = []
+    print(f"{'caso':<34}{'p50 ms':>10}{'p95 ms':>10}{'consultas':>11}{'pico KiB':>11}  Δp50")
+    for nome, r in resultados.items():
+        delta = ""
+        base = (anterior or {}).get(nome)
+        if base and base["p50_ms"] > 0:
+            variacao = r["p50_ms"] / base["p50_ms"] - 1
+            delta = f"{variacao:+.0%}"
+            if variacao > limite or r["consultas"] > base["consultas"]:
+                delta += " ⚠"
+                regressoes.append(nome)
+        print(f"{nome:<34}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['consultas']:>11}{r['pico_kib']:>11.0f}  {delta}")
+    return regressoes
+
+
+def _anterior(saida, escala):
+    if not os.path.exists(saida):
+        return None
+    ultimo = None
+    with open(saida, encoding="utf-8") as f:
+        for linha in f:
+            registro = json.loads(linha)
+            if registro["escala"] == escala:
+                ultimo = registro
+    return ultimo["resultados"] if ultimo else None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    for campo in ("alunos", "exercicios", "planos", "historico"):
+        ap.add_argument(f"--{campo}", type=int, help="sobrepõe o valor da escala")
+    ap.add_argument("--repeticoes", type=int, default=20)
+    ap.add_argument("--renders", type=int, default=5, help="execuções headless do app.py")
+    ap.add_argument("--banco", help="arquivo SQLite novo (padrão: temporário)")
+    ap.add_argument("--sobrescrever", action="store_true", help="apaga o --banco se ele já existir")
+    ap.add_argument("--saida", default="bench_resultados.jsonl")
+    ap.add_argument("--comparar", action="store_true", help="compara com a última execução na mesma escala")
+    ap.add_argument("--limite", type=float, default=0.20, help="piora de p50 tolerada (0.20 = 20%%)")
+    args = ap.parse_args(argv)
+
+    escala = dict(ESCALAS[args.escala])
+    escala.update({k: getattr(args, k) for k in escala if getattr(args, k) is not None})
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(prefix="gymflow-bench-"), "bench.db")
+    if os.path.exists(caminho):
+        # O --banco pode ser o banco local de verdade ou um backup restaurado
+        if not args.sobrescrever:
+            ap.error(f"{caminho} já existe; use outro arquivo ou --sobrescrever para apagá-lo")
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+
+    t0 = time.perf_counter()
+    ids = semear(caminho, **escala)
+    print(f"semeado {escala} em {time.perf_counter() - t0:.1f}s → {caminho}")
+
+    os.environ["GYMFLOW_SQLITE"] = caminho
+    resultados = {nome: medir(fn, args.repeticoes) for nome, fn in casos(ids).items()}
+    resultados["render app.py (frio)"] = medir(renderizar, args.renders)
+    resultados["render app.py (cache quente)"] = medir(renderizar, args.renders, frio=False)
+    for aba in ABAS[1:]:
+        resultados[f"render {aba} (frio)"] = medir(lambda: renderizar(aba), args.renders)
+
+    chave = json.dumps(escala, sort_keys=True)
+    regressoes = imprimir(resultados, _anterior(args.saida, chave) if args.comparar else None, args.limite)
+    with open(args.saida, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"quando": datetime.now(timezone.utc).isoformat(), "commit": _commit(),
+                            "escala": chave, "resultados": resultados}, ensure_ascii=False) + "\n")
+    if regressoes:
+        print(f"regressões acima de {args.limite:.0%}: {', '.join(regressoes)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
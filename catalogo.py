@@ -0,0 +1,136 @@
+"""
+gymflow/catalogo.py — Catálogo de exercícios indexado em memória, com busca aproximada
+
+O catálogo é montado uma vez por versão dos dados (cacheado como listar_exercicios,
+com a mesma tag ("exercicios", "*"): uma escrita em exercícios o reconstrói) e já
+traz os índices por id, por grupo e por nome normalizado (sem acento, minúsculo).
+`buscar("supino incl")` casa trechos de palavras e tolera erros de digitação por
+trigramas, no estilo do pg_trgm: o custo é o das listas de trigramas da consulta,
+não uma varredura com máscaras a cada rerun.
+"""
+import unicodedata
+from collections import defaultdict
+from typing import Optional
+import numpy as np
+import pandas as pd
+import db
+
+# Fração dos trigramas da consulta presentes no nome para contar como parecido
+LIMIAR = 0.5
+
+
+def normalizar(texto) -> str:
+    """Minúsculo, sem acento, só letras/dígitos separados por um espaço."""
+    if texto is None or texto != texto:  # None / NaN
+        return ""
+    s = unicodedata.normalize("NFKD", str(texto))
+    s = "".join(c if c.isalnum() else " " for c in s if not unicodedata.combining(c))
+    return " ".join(s.lower().split())
+
+
+def trigramas(normalizado: str) -> set:
+    """Trigramas de cada palavra com a borda do pg_trgm ("  p", " pa", ..., "la ")."""
+    tri = set()
+    for palavra in normalizado.split():
+        p = f"  {palavra} "
+        tri.update(p[i:i + 3] for i in range(len(p) - 2))
+    return tri
+
+
+class Catalogo:
+    """Exercícios (id, nome, grupo, descricao) com índices prontos; somente leitura."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.ids = self.df["id"].astype("int64").to_numpy()
+        self._pos = {int(i): p for p, i in enumerate(self.ids)}
+        self._nomes = dict(zip(self.ids.tolist(), self.df["nome"].astype(str)))
+        grupos = self.df["grupo"].fillna("—").astype(str)
+        self._por_grupo = {g: self.ids[pos].tolist() for g, pos in grupos.groupby(grupos, sort=True).indices.items()}
+        self._norm = [normalizar(n) for n in self.df["nome"]]
+
+        postagens = defaultdict(list)
+        self._n_tri = np.zeros(len(self.ids), dtype=np.int32)
+        for p, nome in enumerate(self._norm):
+            tri = trigramas(nome)
+            self._n_tri[p] = len(tri)
+            for t in tri:
+                postagens[t].append(p)
+        self._tri = {t: np.asarray(ps, dtype=np.int32) for t, ps in postagens.items()}
+
+    # Imutável: o cache de db devolve cópias; aqui a cópia é o próprio objeto
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, exercicio_id):
+        return int(exercicio_id) in self._pos
+
+    def get(self, exercicio_id) -> Optional[dict]:
+        p = self._pos.get(int(exercicio_id))
+        return None if p is None else self.df.iloc[p].to_dict()
+
+    def nome(self, exercicio_id) -> str:
+        """Nome pelo id (serve de format_func de selectbox)."""
+        return self._nomes.get(int(exercicio_id), "—")
+
+    def grupos(self) -> list[str]:
+        return list(self._por_grupo)
+
+    def do_grupo(self, grupo) -> list[int]:
+        """Ids do grupo, por nome."""
+        return list(self._por_grupo.get(grupo, ()))
+
+    def tabela(self, ids=None) -> pd.DataFrame:
+        """Linhas dos `ids`, na ordem dada (todas, na ordem grupo/nome, sem `ids`)."""
+        if ids is None:
+            return self.df.copy()
+        return self.df.iloc[[self._pos[int(i)] for i in ids]].reset_index(drop=True)
+
+    def buscar(self, texto, grupo=None, limite=None) -> list[int]:
+        """Ids que casam com `texto`, do mais ao menos parecido.
+
+        Primeiro os nomes que contêm todos os trechos digitados ("supino incl"),
+        depois os parecidos por trigramas ("supno"). Texto vazio = tudo, na ordem
+        do catálogo. `grupo` restringe a um grupo muscular.
+        """
+        consulta = normalizar(texto)
+        if grupo is not None:
+            candidatos = np.asarray([self._pos[i] for i in self._por_grupo.get(grupo, ())], dtype=np.int32)
+        else:
+            candidatos = np.arange(len(self.ids), dtype=np.int32)
+        if not consulta or not len(candidatos):
+            return self.ids[candidatos[:limite]].tolist()
+
+        tri = trigramas(consulta)
+        comuns = np.zeros(len(self.ids), dtype=np.int32)
+        for t in tri:
+            ps = self._tri.get(t)
+            if ps is not None:
+                comuns[ps] += 1
+        trechos = consulta.split()
+        if min(map(len, trechos)) >= 3:
+            # Quem contém um trecho de 3+ letras divide ao menos um trigrama com ele
+            candidatos = candidatos[comuns[candidatos] > 0]
+        comuns = comuns[candidatos]
+        cobre = comuns / len(tri)
+        # Desempate entre parecidos: o nome mais curto (pg_trgm similarity)
+        similar = comuns / (len(tri) + self._n_tri[candidatos] - comuns)
+
+        contem = np.fromiter((all(t in self._norm[p] for t in trechos) for p in candidatos),
+                             dtype=bool, count=len(candidatos))
+        ok = contem | (cobre >= LIMIAR)
+        candidatos, contem, cobre, similar = candidatos[ok], contem[ok], cobre[ok], similar[ok]
+        ordem = np.lexsort((candidatos, -similar, -cobre, ~contem))
+        return self.ids[candidatos[ordem][:limite]].tolist()
+
+
+@db._cached(db.TTL_CATALOGO, lambda c, a: {("exercicios", "*")})
+def carregar() -> Catalogo:
+    """Catálogo da versão atual dos exercícios (reconstruído só quando eles mudam)."""
+    return Catalogo(db.listar_exercicios())
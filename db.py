@@ -2,130 +2,681 @@
 gymflow/db.py — Acesso ao Supabase (compartilhado entre professor e aluno)
 """
 from __future__ import annotations
+import contextlib
+import contextvars
+import copy
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
 import time as time_module
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 from datetime import date
 from typing import Optional
 import pandas as pd
 
 
+# ── Backend ────────────────────────────────────────────────────────────────
+# As funções deste módulo falam a API de consulta do PostgREST
+# (table().select().eq()...execute(), insert/upsert/update/delete, rpc).
+# Dois backends a implementam: o cliente Supabase e o db_local.LocalClient
+# (SQLite embutido, mesmo esquema), escolhido por GYMFLOW_SQLITE=<arquivo ou
+# :memory:> no ambiente ou por [sqlite] path = "..." no secrets.toml.
+
+def _caminho_sqlite() -> Optional[str]:
+    caminho = os.environ.get("GYMFLOW_SQLITE")
+    if not caminho and "sqlite" in st.secrets:
+        caminho = st.secrets["sqlite"]["path"]
+    return caminho
+
+
+def _credenciais() -> tuple[str, str]:
+    return st.secrets["supabase"]["url"], st.secrets["supabase"]["key"]
+
+
 @st.cache_resource
 def get_client() -> Client:
-    url = st.secrets["supabase"]["url"]
-    key = st.secrets["supabase"]["key"]
-    return create_client(url, key)
+    caminho = _caminho_sqlite()
+    if caminho:
+        import db_local
+        return db_local.LocalClient(caminho)
+    return create_client(*_credenciais())
+
+
+# ── Retentativas e disjuntor ───────────────────────────────────────────────
+
+class CircuitoAberto(Exception):
+    """A tabela falhou seguidamente; as chamadas falham na hora até o disjuntor esfriar."""
+
+
+# Códigos do Postgres/PostgREST que indicam falha passageira (conexão, timeout, deadlock)
+_PG_TRANSITORIOS = {"40001", "40P01", "53300", "57014", "57P01", "57P03",
+                    "PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter total; só repete erros transitórios."""
+
+    def __init__(self, tentativas=3, base=0.2, teto=2.0):
+        self.tentativas = tentativas
+        self.base = base
+        self.teto = teto
+
+    def espera(self, tentativa: int) -> float:
+        return random.uniform(0, min(self.teto, self.base * 2 ** tentativa))
+
+    def transitorio(self, e: Exception) -> bool:
+        if isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError)):
+            return True
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code >= 500 or e.response.status_code == 429
+        if isinstance(e, APIError):
+            code = str(e.code or "")
+            if code.isdigit() and len(code) == 3:
+                return code.startswith("5") or code == "429"
+            return code in _PG_TRANSITORIOS or code.startswith("08")
+        return False
+
+
+def _respondeu(e: Exception) -> bool:
+    """O erro veio de uma resposta do servidor (e não de rede ou do nosso código)."""
+    return isinstance(e, (APIError, httpx.HTTPStatusError))
+
+
+class CircuitBreaker:
+    """Abre após `limite` falhas transitórias seguidas; depois de `esfriar` s deixa passar uma sonda."""
+
+    def __init__(self, limite=5, esfriar=30.0):
+        self.limite = limite
+        self.esfriar = esfriar
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.falhas < self.limite:
+                return True
+            agora = time_module.monotonic()
+            if agora >= self.aberto_ate:
+                # meio-aberto: uma chamada de sonda, as demais seguem barradas
+                self.aberto_ate = agora + self.esfriar
+                return True
+            return False
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+
+    def falha(self) -> bool:
+        """Registra a falha; devolve True se o disjuntor (re)abriu."""
+        with self._lock:
+            self.falhas += 1
+            if self.falhas >= self.limite:
+                self.aberto_ate = time_module.monotonic() + self.esfriar
+                return True
+            return False
+
+
+RETRY_PADRAO = RetryPolicy()
+_disjuntores: dict[str, CircuitBreaker] = {}
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+
+def _contar(nome, valor=1):
+    with _metricas_lock:
+        _metricas[nome] += valor
+
+
+def metricas_retry() -> dict:
+    """Contadores de chamadas, retentativas, segundos dormidos e disparos do disjuntor."""
+    with _metricas_lock:
+        return dict(_metricas)
 
 
-def _retry(fn, retries=3, delay=1.5):
-    last_err = None
-    for attempt in range(retries):
-        try:
-            return fn()
-        except Exception as e:
-            last_err = e
-            if attempt < retries - 1:
-                time_module.sleep(delay)
-    raise last_err
+def _tabela(q) -> str:
+    if getattr(q, "tabela", None):
+        return q.tabela
+    req = getattr(q, "request", None)
+    if req is not None:
+        caminho = str(req.path.path if hasattr(req.path, "path") else req.path)
+        partes = caminho.rstrip("/").split("/")
+        return "/".join(partes[-2:]) if len(partes) > 1 and partes[-2] == "rpc" else partes[-1]
+    return "?"
+
+
+def _disjuntor(tabela: str) -> CircuitBreaker:
+    with _metricas_lock:
+        return _disjuntores.setdefault(tabela, CircuitBreaker())
+
+
+def _liberar(tabela: str) -> CircuitBreaker:
+    """Disjuntor da tabela; levanta CircuitoAberto se ele barra a chamada."""
+    disjuntor = _disjuntor(tabela)
+    if not disjuntor.permitir():
+        _contar("falhas_rapidas")
+        raise CircuitoAberto(f"Supabase indisponível para '{tabela}', tente em instantes.")
+    return disjuntor
+
+
+def _apos_falha(e: Exception, politica: RetryPolicy, disjuntor: CircuitBreaker, tentativa: int) -> Optional[float]:
+    """Classifica e contabiliza a falha; devolve os segundos até a próxima tentativa, ou None para propagar."""
+    if not politica.transitorio(e):
+        # 4xx/validação: o servidor respondeu, não adianta repetir. Erro
+        # nosso (TypeError, KeyError...) não diz nada da saúde da tabela
+        if _respondeu(e):
+            disjuntor.sucesso()
+        return None
+    _contar("falhas_transitorias")
+    if disjuntor.falha():
+        _contar("disjuntor_disparos")
+    if tentativa == politica.tentativas - 1 or not disjuntor.permitir():
+        return None
+    espera = politica.espera(tentativa)
+    _contar("retentativas")
+    _contar("espera_s", espera)
+    return espera
+
+
+def _retry(q, politica: Optional[RetryPolicy] = None, funcao: Optional[str] = None):
+    """Executa `q` (query do PostgREST ou callable) com backoff e disjuntor por tabela.
+
+    `funcao` é o nome que vai para a instrumentação; por padrão, o de quem chamou.
+    Helpers (_pagina, _varrer...) repassam o da função pública que os usou.
+    """
+    politica = politica or RETRY_PADRAO
+    executar = q.execute if hasattr(q, "execute") else q
+    tabela = _tabela(q)
+    funcao = funcao or sys._getframe(1).f_code.co_name
+    inicio = time_module.perf_counter()
+    resp, erro, tentativa = None, None, 0
+    try:
+        disjuntor = _liberar(tabela)
+        for tentativa in range(politica.tentativas):
+            _contar("chamadas")
+            try:
+                resp = executar()
+            except Exception as e:
+                espera = _apos_falha(e, politica, disjuntor, tentativa)
+                if espera is None:
+                    raise
+                time_module.sleep(espera)
+            else:
+                disjuntor.sucesso()
+                return resp
+    except Exception as e:
+        erro = e
+        raise
+    finally:
+        _registrar(q, tabela, funcao, inicio, resp, tentativa, erro)
+
+
+# ── Instrumentação ─────────────────────────────────────────────────────────
+# Toda chamada que passa por _retry vira um registro (tabela, operação, filtros,
+# linhas, bytes, latência, retentativas). Os registros levam a sessão do Streamlit,
+# o nº do rerun (db.nova_execucao) e o rótulo ativo (db.rotulo), para o painel de
+# depuração saber qual aba ou laço do app.py gerou cada consulta.
+
+_registros: deque = deque(maxlen=5000)
+_rotulo = contextvars.ContextVar("gymflow_rotulo", default="")
+# st.session_state: {"execucao": nº do rerun, "lidos": {chave: (geração, valor)}, "bytes": medir_bytes}
+_RERUN = "_gymflow_rerun"
+# Padrões do processo (servidor, jobs); no app medir_bytes vale só para a sessão
+_perfil = {"bytes": os.environ.get("GYMFLOW_PERFIL") == "1",
+           "jsonl": os.environ.get("GYMFLOW_PERFIL_JSONL")}
+
+
+def _sessao() -> str:
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else "local"
+
+
+def _rerun() -> Optional[dict]:
+    """Estado do rerun atual, guardado na sessão (sai da memória junto com ela); None fora do Streamlit."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st.session_state.setdefault(_RERUN, {"execucao": 0, "lidos": {}})
+
+
+def nova_execucao():
+    """Marca o início de um rerun do script na sessão atual."""
+    rerun = _rerun()
+    if rerun is not None:
+        with _cache_lock:
+            rerun["execucao"] += 1
+            rerun["lidos"] = {}
+
+
+@contextlib.contextmanager
+def rotulo(nome: str):
+    """Atribui as consultas feitas dentro do bloco a `nome` (ex. a aba do app)."""
+    token = _rotulo.set(nome)
+    try:
+        yield
+    finally:
+        _rotulo.reset(token)
+
+
+def medir_bytes(ativo: bool):
+    """Liga a medição do tamanho das respostas (serializa o JSON, então custa CPU).
+
+    No app vale para a sessão que chamou; fora do Streamlit, para o processo.
+    """
+    rerun = _rerun()
+    if rerun is None:
+        _perfil["bytes"] = ativo
+    else:
+        rerun["bytes"] = ativo
+
+
+def _descrever(q) -> tuple[str, dict]:
+    """Operação e filtros de uma query do PostgREST ou do db_local."""
+    if getattr(q, "op", None):
+        return q.op, {col: f"{op}.{valor}" for op, col, valor in q.filtros}
+    if getattr(q, "nome", None) and getattr(q, "params", None) is not None:
+        return "rpc", dict(q.params)
+    req = getattr(q, "request", None)
+    if req is None:
+        return "?", {}
+    metodo = req.http_method.upper()
+    if "/rpc/" in str(req.path):
+        op = "rpc"
+    elif metodo == "POST":
+        op = "upsert" if "resolution=" in req.headers.get("Prefer", "") else "insert"
+    else:
+        op = {"GET": "select", "HEAD": "select", "PATCH": "update", "DELETE": "delete"}.get(metodo, metodo)
+    return op, {k: v for k, v in req.params.multi_items() if k not in ("select", "columns")}
+
+
+def _registrar(q, tabela, funcao, inicio, resp, tentativa, erro):
+    op, filtros = _descrever(q)
+    dados = getattr(resp, "data", None)
+    rerun = _rerun()
+    medir = _perfil["bytes"] or bool(rerun and rerun.get("bytes"))
+    registro = {
+        "ts": time_module.time(), "sessao": _sessao(), "execucao": rerun["execucao"] if rerun else 0,
+        "rotulo": _rotulo.get(), "funcao": funcao, "tabela": tabela, "op": op, "filtros": filtros,
+        "linhas": len(dados) if isinstance(dados, list) else int(dados is not None),
+        "bytes": len(json.dumps(dados, default=str)) if medir and dados is not None else None,
+        "latencia_ms": round((time_module.perf_counter() - inicio) * 1000, 3),
+        "retentativas": tentativa, "erro": type(erro).__name__ if erro else None,
+    }
+    _registros.append(registro)
+    if _perfil["jsonl"]:
+        with _metricas_lock, open(_perfil["jsonl"], "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, default=str, ensure_ascii=False) + "\n")
+
+
+def _execucao_atual() -> int:
+    rerun = _rerun()
+    return rerun["execucao"] if rerun else 0
+
+
+def chamadas(somente_execucao_atual=True) -> list[dict]:
+    """Registros da sessão atual (por padrão, só do rerun em andamento)."""
+    s = _sessao()
+    atual = _execucao_atual()
+    return [r for r in list(_registros)
+            if r["sessao"] == s and (not somente_execucao_atual or r["execucao"] == atual)]
+
+
+def exportar_chamadas(registros=None) -> str:
+    """Registros em JSON lines, para análise offline."""
+    registros = list(_registros) if registros is None else registros
+    return "".join(json.dumps(r, default=str, ensure_ascii=False) + "\n" for r in registros)
+
+
+# ── Leituras em paralelo ───────────────────────────────────────────────────
+# Consultas independentes (ex.: alunos + planos + exercícios de uma tela) saem
+# ao mesmo tempo: a tela espera a mais lenta, não a soma. O cliente HTTP do
+# Supabase (httpx) é seguro entre threads; o LocalClient serializa no seu lock.
+
+_LEITURA = "gymflow-leitura"
+_PARALELO = int(os.environ.get("GYMFLOW_PARALELO", "8"))
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(_PARALELO)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=_PARALELO, thread_name_prefix=_LEITURA)
+        return _pool
+
+
+def em_paralelo(*chamadas) -> list:
+    """Roda os callables sem argumento ao mesmo tempo; devolve os resultados na ordem.
+
+    O primeiro erro é relançado depois que todas terminam.
+    Ex.: alunos, planos = db.em_paralelo(db.listar_alunos, lambda: db.listar_planos(aid))
+    """
+    if len(chamadas) < 2 or threading.current_thread().name.startswith(_LEITURA):
+        # Uma só, ou já dentro do pool (esperar o próprio pool pode travar)
+        return [fn() for fn in chamadas]
+    get_client()  # cria o cliente (st.cache_resource) aqui, antes de espalhar as threads
+    ctx_st = get_script_run_ctx(suppress_warning=True)
+    # Mesmo rótulo (contextvars) da thread que pediu
+    if ctx_st is None:
+        futuros = [_executor().submit(contextvars.copy_context().run, fn) for fn in chamadas]
+    else:
+        futuros = [_na_sessao(ctx_st, contextvars.copy_context(), fn, i) for i, fn in enumerate(chamadas)]
+    erros = [f.exception() for f in futuros]
+    for e in erros:
+        if e is not None:
+            raise e
+    return [f.result() for f in futuros]
+
+
+def _na_sessao(ctx_st, ctx, fn, i) -> Future:
+    """Roda `fn` numa thread nova com a sessão do Streamlit de quem pediu.
+
+    Thread nova e não do pool: a API pública só prende o contexto à thread
+    (add_script_run_ctx), não solta, e ele não pode passar para outra sessão.
+    """
+    futuro = Future()
+
+    def rodar():
+        with _vagas:
+            try:
+                futuro.set_result(ctx.run(fn))
+            except BaseException as e:
+                futuro.set_exception(e)
+
+    thread = threading.Thread(target=rodar, name=f"{_LEITURA}-s{i}", daemon=True)
+    add_script_run_ctx(thread, ctx_st)
+    thread.start()
+    return futuro
 
 
 def _df(resp, cols):
-    return pd.DataFrame(resp.data) if resp.data else pd.DataFrame(columns=cols)
+    return pd.DataFrame(resp.data) if resp.data else pd.DataFrame(columns=_nomes(cols))
+
+
+# ── Projeções ──────────────────────────────────────────────────────────────
+# Colunas pedidas por padrão a cada listar_* (sem created_at) e visões enxutas
+# para selectbox/mapas id → nome. "*" continua aceito quando se quer tudo.
+
+COLS_ALUNO = "id, nome, email, telefone, ativo"
+COLS_ALUNO_SELETOR = "id, nome"
+COLS_EXERCICIO = "id, nome, grupo, descricao"
+COLS_EXERCICIO_SELETOR = "id, nome, grupo"
+COLS_PLANO = "id, aluno_id, nome, mes, ativo"
+COLS_PLANO_SELETOR = "id, aluno_id, nome, mes"
+COLS_TREINO = "id, plano_id, nome, descricao, ordem"
+COLS_ITEM = "id, treino_id, exercicio_id, ordem, tipo_serie, descanso_seg, combinado_com, observacao"
+COLS_SERIE = "id, treino_item_id, numero, repeticoes, carga"
+
+
+def _projecao(colunas: str) -> str:
+    """Garante o id na projeção: o cache invalida pelas linhas devolvidas."""
+    if colunas.strip() == "*" or "id" in _nomes(colunas):
+        return colunas
+    return "id, " + colunas
+
+
+def _vazio(colunas: str, padrao: str) -> str:
+    """Colunas do DataFrame vazio para a projeção pedida."""
+    return padrao + ", created_at" if colunas.strip() == "*" else _projecao(colunas)
+
+
+def _nomes(cols) -> list[str]:
+    return [c.strip() for c in cols.split(",")] if isinstance(cols, str) else list(cols)
+
+
+# ── Cache de leitura ───────────────────────────────────────────────────────
+# Memória do processo, compartilhada entre reruns e sessões. Chave = (função, args).
+# Cada entrada guarda "tags": o escopo consultado (ex. ("series", "item", 7)) e as
+# linhas devolvidas (ex. ("planos", 3)). As escritas invalidam só as tags que tocam,
+# então salvar_serie derruba as séries daquele item e a ficha que o contém, nada mais.
+#
+# Por cima do TTL, cada chave vai ao banco no máximo uma vez por rerun: chamadas
+# iguais simultâneas (em_paralelo, fragmentos) esperam a que já está em voo, e o
+# que um rerun já leu continua valendo até o próximo db.nova_execucao() mesmo que
+# o TTL vença no meio. Qualquer escrita (_invalidar) descarta os dois atalhos.
+
+TTL_CATALOGO = 600   # exercícios
+TTL_CADASTRO = 300   # alunos e planos
+TTL_FICHA = 120      # treinos, itens e séries
+
+_cache: dict = {}
+_cache_tags: dict = {}
+_cache_lock = threading.RLock()
+_cache_geracao = 0
+_em_voo: dict = {}        # chave → (geração, Future) da consulta em andamento
+# O que o rerun atual já leu fica em st.session_state (_rerun()), não aqui
+
+
+def _ids(linhas, tabela):
+    if isinstance(linhas, pd.DataFrame):
+        linhas = linhas.to_dict("records") if "id" in linhas else []
+    return {(tabela, int(r["id"])) for r in linhas if r.get("id") is not None}
+
+
+def _copia(valor):
+    return valor.copy() if isinstance(valor, pd.DataFrame) else copy.deepcopy(valor)
+
+
+def _cached(ttl, tags):
+    """Memoiza uma função listar_* por TTL; `tags(resultado, args)` devolve as tags da entrada."""
+    def deco(fn):
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            chave = (fn.__name__, tuple(bound.arguments.items()))
+            # Fora do Streamlit não há rerun: só o TTL e a consulta em voo valem
+            rerun = _rerun()
+            agora = time_module.monotonic()
+            with _cache_lock:
+                geracao = _cache_geracao
+                lido = rerun["lidos"].get(chave) if rerun else None
+                hit = _cache.get(chave)
+                voo = _em_voo.get(chave)
+                if lido and lido[0] == geracao:
+                    return _copia(lido[1])
+                if not (hit and hit[0] > agora) and (voo is None or voo[0] != geracao):
+                    voo = _em_voo[chave] = (geracao, Future())
+                    lider = True
+                else:
+                    lider = False
+            if hit and hit[0] > agora:
+                valor = hit[1]
+            elif not lider:
+                _contar("coalescidas")
+                valor = voo[1].result()
+            if not lider:
+                _lembrar(rerun, chave, geracao, valor)
+                return _copia(valor)
+
+            try:
+                valor = fn(*args, **kwargs)
+                entrada_tags = tags(valor, bound.arguments)
+            except BaseException as e:
+                voo[1].set_exception(e)
+                raise
+            finally:
+                with _cache_lock:
+                    if _em_voo.get(chave) is voo:
+                        del _em_voo[chave]
+            voo[1].set_result(valor)
+            with _cache_lock:
+                # Uma escrita durante a consulta pode ter tornado o resultado velho
+                if geracao == _cache_geracao:
+                    _cache[chave] = (agora + ttl, valor, entrada_tags)
+                    for t in entrada_tags:
+                        _cache_tags.setdefault(t, set()).add(chave)
+            _lembrar(rerun, chave, geracao, valor)
+            return _copia(valor)
+        wrapper.sem_cache = fn
+        return wrapper
+    return deco
+
+
+def _lembrar(rerun, chave, geracao, valor):
+    if rerun is not None:
+        with _cache_lock:
+            rerun["lidos"][chave] = (geracao, valor)
+
+
+def _invalidar(*tags):
+    global _cache_geracao
+    with _cache_lock:
+        _cache_geracao += 1
+        for t in tags:
+            for chave in _cache_tags.pop(t, ()):
+                _cache.pop(chave, None)
+
+
+def limpar_cache():
+    global _cache_geracao
+    with _cache_lock:
+        _cache_geracao += 1
+        _cache.clear()
+        _cache_tags.clear()
+    # Os "lidos" de cada sessão ficam velhos pela geração; o da sessão atual sai já
+    rerun = _rerun()
+    if rerun is not None:
+        rerun["lidos"] = {}
 
 
 # ── Alunos ─────────────────────────────────────────────────────────────────
 
-def listar_alunos(apenas_ativos=True) -> pd.DataFrame:
+@_cached(TTL_CADASTRO, lambda df, a: {("alunos", "*")})
+def listar_alunos(apenas_ativos=True, colunas=COLS_ALUNO) -> pd.DataFrame:
     client = get_client()
-    def _q():
-        q = client.table("alunos").select("*").order("nome")
-        if apenas_ativos:
-            q = q.eq("ativo", True)
-        return q.execute()
-    return _df(_retry(_q), ["id","nome","email","telefone","ativo","created_at"])
+    q = client.table("alunos").select(_projecao(colunas)).order("nome")
+    if apenas_ativos:
+        q = q.eq("ativo", True)
+    return _df(_retry(q), _vazio(colunas, COLS_ALUNO))
 
 def salvar_aluno(nome, email="", telefone="", aluno_id=None) -> dict:
     client = get_client()
     payload = {"nome": nome.strip(), "email": email or None, "telefone": telefone or None, "ativo": True}
     if aluno_id:
         payload["id"] = aluno_id
-        resp = _retry(lambda: client.table("alunos").upsert(payload).execute())
+        resp = _retry(client.table("alunos").upsert(payload))
     else:
-        resp = _retry(lambda: client.table("alunos").insert(payload).execute())
+        resp = _retry(client.table("alunos").insert(payload))
+    _invalidar(("alunos", "*"))
     return resp.data[0] if resp.data else payload
 
 def desativar_aluno(aluno_id: int):
     client = get_client()
-    _retry(lambda: client.table("alunos").update({"ativo": False}).eq("id", aluno_id).execute())
+    _retry(client.table("alunos").update({"ativo": False}).eq("id", aluno_id))
+    _invalidar(("alunos", "*"))
 
 
 # ── Exercícios ─────────────────────────────────────────────────────────────
 
-def listar_exercicios() -> pd.DataFrame:
+@_cached(TTL_CATALOGO, lambda df, a: {("exercicios", "*")})
+def listar_exercicios(colunas=COLS_EXERCICIO) -> pd.DataFrame:
     client = get_client()
-    resp = _retry(lambda: client.table("exercicios").select("*").order("grupo").order("nome").execute())
-    return _df(resp, ["id","nome","grupo","descricao","created_at"])
+    resp = _retry(client.table("exercicios").select(_projecao(colunas)).order("grupo").order("nome"))
+    return _df(resp, _vazio(colunas, COLS_EXERCICIO))
 
 def salvar_exercicio(nome, grupo, descricao="") -> dict:
     client = get_client()
     payload = {"nome": nome.strip(), "grupo": grupo, "descricao": descricao or None}
-    resp = _retry(lambda: client.table("exercicios").upsert(payload, on_conflict="nome").execute())
+    resp = _retry(client.table("exercicios").upsert(payload, on_conflict="nome"))
+    # O upsert por nome pode mudar o grupo de um exercício já usado em fichas
+    tags = _ids(resp.data or [], "exercicios")
+    _invalidar(("exercicios", "*"), *tags)
     return resp.data[0] if resp.data else payload
 
+def atualizar_exercicio(ex_id: int, nome, grupo, descricao=""):
+    client = get_client()
+    _retry(client.table("exercicios")
+           .update({"nome": nome.strip(), "grupo": grupo, "descricao": descricao or None})
+           .eq("id", ex_id))
+    _invalidar(("exercicios", "*"), ("exercicios", int(ex_id)))
+
 def excluir_exercicio(ex_id: int):
     client = get_client()
-    _retry(lambda: client.table("exercicios").delete().eq("id", ex_id).execute())
+    _retry(client.table("exercicios").delete().eq("id", ex_id))
+    _invalidar(("exercicios", "*"), ("exercicios", int(ex_id)))
 
 
 # ── Planos ─────────────────────────────────────────────────────────────────
 
-def listar_planos(aluno_id=None) -> pd.DataFrame:
+def _tags_planos(df, a):
+    return _ids(df, "planos") | {("planos", "aluno", int(a["aluno_id"])) if a["aluno_id"] else ("planos", "*")}
+
+@_cached(TTL_CADASTRO, _tags_planos)
+def listar_planos(aluno_id=None, colunas=COLS_PLANO) -> pd.DataFrame:
     client = get_client()
-    def _q():
-        q = client.table("planos").select("*").order("mes", desc=True)
-        if aluno_id:
-            q = q.eq("aluno_id", aluno_id)
-        return q.execute()
-    return _df(_retry(_q), ["id","aluno_id","nome","mes","ativo","created_at"])
+    q = client.table("planos").select(_projecao(colunas)).order("mes", desc=True)
+    if aluno_id:
+        q = q.eq("aluno_id", aluno_id)
+    return _df(_retry(q), _vazio(colunas, COLS_PLANO))
 
 def salvar_plano(aluno_id, nome, mes) -> dict:
     client = get_client()
     payload = {"aluno_id": aluno_id, "nome": nome.strip(), "mes": mes, "ativo": True}
-    resp = _retry(lambda: client.table("planos").insert(payload).execute())
+    resp = _retry(client.table("planos").insert(payload))
+    _invalidar(("planos", "*"), ("planos", "aluno", int(aluno_id)))
     return resp.data[0] if resp.data else payload
 
 def excluir_plano(plano_id: int):
+    # Treinos, itens e séries caem junto (ON DELETE CASCADE, ver supabase/migrations)
     client = get_client()
-    _retry(lambda: client.table("planos").delete().eq("id", plano_id).execute())
+    _retry(client.table("planos").delete().eq("id", plano_id))
+    _invalidar(("planos", int(plano_id)), ("planos", "*"), ("treinos", "plano", int(plano_id)))
 
 
 # ── Treinos ────────────────────────────────────────────────────────────────
 
-def listar_treinos(plano_id) -> pd.DataFrame:
+@_cached(TTL_FICHA, lambda df, a: _ids(df, "treinos") | {("treinos", "plano", int(a["plano_id"]))})
+def listar_treinos(plano_id, colunas=COLS_TREINO) -> pd.DataFrame:
     client = get_client()
-    resp = _retry(lambda: client.table("treinos").select("*").eq("plano_id", plano_id).order("ordem").execute())
-    return _df(resp, ["id","plano_id","nome","descricao","ordem","created_at"])
+    resp = _retry(client.table("treinos").select(_projecao(colunas)).eq("plano_id", plano_id).order("ordem"))
+    return _df(resp, _vazio(colunas, COLS_TREINO))
 
 def salvar_treino(plano_id, nome, descricao="", ordem=0) -> dict:
     client = get_client()
     payload = {"plano_id": plano_id, "nome": nome.strip(), "descricao": descricao or None, "ordem": ordem}
-    resp = _retry(lambda: client.table("treinos").insert(payload).execute())
+    resp = _retry(client.table("treinos").insert(payload))
+    _invalidar(("treinos", "plano", int(plano_id)))
     return resp.data[0] if resp.data else payload
 
 def excluir_treino(treino_id: int):
+    # Itens e séries caem junto (ON DELETE CASCADE)
     client = get_client()
-    _retry(lambda: client.table("treinos").delete().eq("id", treino_id).execute())
+    _retry(client.table("treinos").delete().eq("id", treino_id))
+    _invalidar(("treinos", int(treino_id)))
 
 
 # ── Itens do treino ────────────────────────────────────────────────────────
 
-def listar_itens(treino_id) -> pd.DataFrame:
+def _tags_itens(df, a):
+    tags = _ids(df, "treino_itens") | {("treino_itens", "treino", int(a["treino_id"]))}
+    if "exercicio_id" in df:
+        tags |= {("exercicios", int(e)) for e in df["exercicio_id"].dropna()}
+    return tags
+
+@_cached(TTL_FICHA, _tags_itens)
+def listar_itens(treino_id, colunas=COLS_ITEM) -> pd.DataFrame:
     client = get_client()
-    resp = _retry(lambda: client.table("treino_itens").select("*, exercicios(nome, grupo)")
-                  .eq("treino_id", treino_id).order("ordem").execute())
+    resp = _retry(client.table("treino_itens").select(f"{_projecao(colunas)}, exercicios(nome, grupo)")
+                  .eq("treino_id", treino_id).order("ordem"))
+    return _itens_df(resp, colunas)
+
+def _itens_df(resp, colunas):
     if not resp.data:
-        return pd.DataFrame(columns=["id","treino_id","exercicio_id","ordem",
-                                      "tipo_serie","descanso_seg","combinado_com","observacao"])
+        return pd.DataFrame(columns=_nomes(_vazio(colunas, COLS_ITEM)))
     df = pd.DataFrame(resp.data)
     df["exercicio_nome"] = df["exercicios"].apply(lambda x: x["nome"] if isinstance(x, dict) else "—")
     df["exercicio_grupo"] = df["exercicios"].apply(lambda x: x["grupo"] if isinstance(x, dict) else "—")
@@ -139,32 +690,532 @@ def salvar_item(treino_id, exercicio_id, ordem, tipo_serie, descanso_seg,
         "tipo_serie": tipo_serie, "descanso_seg": descanso_seg,
         "combinado_com": combinado_com or None, "observacao": observacao or None,
     }
-    resp = _retry(lambda: client.table("treino_itens").insert(payload).execute())
+    resp = _retry(client.table("treino_itens").insert(payload))
+    _invalidar(("treino_itens", "treino", int(treino_id)))
     return resp.data[0] if resp.data else payload
 
 def excluir_item(item_id: int):
+    # Séries caem junto (ON DELETE CASCADE); combinado_com de outros itens vira NULL
     client = get_client()
-    _retry(lambda: client.table("treino_itens").delete().eq("id", item_id).execute())
+    _retry(client.table("treino_itens").delete().eq("id", item_id))
+    _invalidar(("treino_itens", int(item_id)))
 
 
 # ── Séries ─────────────────────────────────────────────────────────────────
 
-def listar_series(treino_item_id) -> pd.DataFrame:
+@_cached(TTL_FICHA, lambda df, a: {("series", "item", int(a["treino_item_id"]))})
+def listar_series(treino_item_id, colunas=COLS_SERIE) -> pd.DataFrame:
     client = get_client()
-    resp = _retry(lambda: client.table("series").select("*")
-                  .eq("treino_item_id", treino_item_id).order("numero").execute())
-    return _df(resp, ["id","treino_item_id","numero","repeticoes","carga","created_at"])
+    resp = _retry(client.table("series").select(_projecao(colunas))
+                  .eq("treino_item_id", treino_item_id).order("numero"))
+    return _df(resp, _vazio(colunas, COLS_SERIE))
 
 def salvar_serie(treino_item_id, numero, repeticoes, carga=None) -> dict:
     client = get_client()
     payload = {"treino_item_id": treino_item_id, "numero": numero,
                "repeticoes": repeticoes, "carga": float(carga) if carga else None}
-    resp = _retry(lambda: client.table("series").insert(payload).execute())
+    resp = _retry(client.table("series").insert(payload))
+    _invalidar(("series", "item", int(treino_item_id)))
     return resp.data[0] if resp.data else payload
 
 def excluir_series_do_item(treino_item_id: int):
     client = get_client()
-    _retry(lambda: client.table("series").delete().eq("treino_item_id", treino_item_id).execute())
+    _retry(client.table("series").delete().eq("treino_item_id", treino_item_id))
+    _invalidar(("series", "item", int(treino_item_id)))
+
+
+# ── Paginação (keyset) ─────────────────────────────────────────────────────
+# Cada página devolve (DataFrame, cursor). O cursor é a chave de ordenação da
+# última linha; a próxima página pede "depois dele" com um filtro or=(...) em vez
+# de OFFSET, então o custo por página não cresce com a posição. cursor None = fim.
+
+ORDEM_ALUNOS = (("nome", False), ("id", False))
+ORDEM_EXERCICIOS = (("grupo", False), ("nome", False), ("id", False))
+ORDEM_PLANOS = (("mes", True), ("id", True))
+
+
+def _literal(v) -> str:
+    """Valor entre aspas para filtros do PostgREST (escapa \\ e \")."""
+    return '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _apos(q, ordem, cursor):
+    """Filtra `q` às linhas posteriores a `cursor` na ordenação `ordem`."""
+    termos = []
+    for i, (col, desc) in enumerate(ordem):
+        conds = [f"{c}.eq.{_literal(v)}" for (c, _), v in zip(ordem[:i], cursor[:i])]
+        conds.append(f"{col}.{'lt' if desc else 'gt'}.{_literal(cursor[i])}")
+        termos.append(conds[0] if len(conds) == 1 else f"and({','.join(conds)})")
+    return q.or_(",".join(termos))
+
+
+def _pagina(tabela, ordem, colunas, padrao, apos, page_size, filtros=(), funcao=None):
+    resp = _retry(_consulta_pagina(get_client(), tabela, ordem, colunas, apos, page_size, filtros),
+                  funcao=funcao)
+    return _fim_pagina(resp, ordem, colunas, padrao, page_size)
+
+def _consulta_pagina(client, tabela, ordem, colunas, apos, page_size, filtros=()):
+    cols = _projecao(colunas)
+    if cols.strip() != "*":
+        cols += "".join(f", {c}" for c, _ in ordem if c not in _nomes(cols))
+    q = client.table(tabela).select(cols)
+    for col, valor in filtros:
+        q = q.in_(col, list(valor)) if isinstance(valor, (list, tuple, set)) else q.eq(col, valor)
+    if apos is not None:
+        q = _apos(q, ordem, apos)
+    for col, desc in ordem:
+        q = q.order(col, desc=desc)
+    return q.limit(page_size)
+
+def _fim_pagina(resp, ordem, colunas, padrao, page_size):
+    linhas = resp.data or []
+    cursor = tuple(linhas[-1][c] for c, _ in ordem) if len(linhas) == page_size else None
+    return _df(resp, _vazio(colunas, padrao)), cursor
+
+
+@_cached(TTL_CADASTRO, lambda p, a: {("alunos", "*")})
+def pagina_alunos(apos=None, page_size=50, apenas_ativos=True, colunas=COLS_ALUNO):
+    filtros = [("ativo", True)] if apenas_ativos else []
+    return _pagina("alunos", ORDEM_ALUNOS, colunas, COLS_ALUNO, apos, page_size, filtros, "pagina_alunos")
+
+@_cached(TTL_CATALOGO, lambda p, a: {("exercicios", "*")})
+def pagina_exercicios(apos=None, page_size=100, colunas=COLS_EXERCICIO):
+    return _pagina("exercicios", ORDEM_EXERCICIOS, colunas, COLS_EXERCICIO, apos, page_size,
+                   funcao="pagina_exercicios")
+
+@_cached(TTL_CADASTRO, lambda p, a: _tags_planos(p[0], a))
+def pagina_planos(apos=None, page_size=50, aluno_id=None, colunas=COLS_PLANO):
+    filtros = [("aluno_id", aluno_id)] if aluno_id else []
+    return _pagina("planos", ORDEM_PLANOS, colunas, COLS_PLANO, apos, page_size, filtros, "pagina_planos")
+
+
+def _iterar(pagina, **kw):
+    # Vai direto ao banco: varrer a tabela inteira não deve encher o cache
+    cursor = None
+    while True:
+        df, cursor = pagina.sem_cache(apos=cursor, **kw)
+        if not df.empty:
+            yield df
+        if cursor is None:
+            return
+
+def iter_alunos(page_size=500, apenas_ativos=True, colunas=COLS_ALUNO):
+    """Gera páginas (DataFrame) de alunos em ordem de nome."""
+    return _iterar(pagina_alunos, page_size=page_size, apenas_ativos=apenas_ativos, colunas=colunas)
+
+def iter_exercicios(page_size=500, colunas=COLS_EXERCICIO):
+    """Gera páginas (DataFrame) de exercícios em ordem de grupo e nome."""
+    return _iterar(pagina_exercicios, page_size=page_size, colunas=colunas)
+
+def iter_planos(page_size=500, aluno_id=None, colunas=COLS_PLANO):
+    """Gera páginas (DataFrame) de planos do mês mais recente ao mais antigo."""
+    return _iterar(pagina_planos, page_size=page_size, aluno_id=aluno_id, colunas=colunas)
+
+
+@_cached(TTL_CADASTRO, lambda n, a: {("alunos", "*")})
+def contar_alunos(apenas_ativos=True) -> int:
+    client = get_client()
+    q = client.table("alunos").select("id", count="exact", head=True)
+    if apenas_ativos:
+        q = q.eq("ativo", True)
+    return _retry(q).count or 0
+
+# Exclusões não sabem o aluno do plano; toda escrita em planos derruba ("planos", "*")
+@_cached(TTL_CADASTRO, lambda n, a: {("planos", "*")})
+def contar_planos(aluno_id=None) -> int:
+    client = get_client()
+    q = client.table("planos").select("id", count="exact", head=True)
+    if aluno_id:
+        q = q.eq("aluno_id", aluno_id)
+    return _retry(q).count or 0
+
+
+# ── Inserção em lote ───────────────────────────────────────────────────────
+
+_ESCOPO_PAI = {"planos": ("aluno", "aluno_id"), "treinos": ("plano", "plano_id"),
+               "treino_itens": ("treino", "treino_id"), "series": ("item", "treino_item_id")}
+
+def _tags_insercao(tabela, linhas):
+    """Tags de cache afetadas por linhas novas (ou sobrescritas) em `tabela`."""
+    tags = {(tabela, "*")} | _ids(linhas, tabela)
+    if tabela in _ESCOPO_PAI:
+        nome, col = _ESCOPO_PAI[tabela]
+        tags |= {(tabela, nome, int(r[col])) for r in linhas if r.get(col) is not None}
+    return tags
+
+def bulk_insert(table, rows, chunk_size=500, upsert=False, on_conflict="",
+                ignore_duplicates=False) -> list[dict]:
+    """Insere `rows` em lotes de `chunk_size` (um POST com array por lote)."""
+    client = get_client()
+    rows = list(rows)
+    inseridas = []
+    for i in range(0, len(rows), chunk_size):
+        lote = rows[i:i + chunk_size]
+        if upsert:
+            resp = _retry(client.table(table).upsert(lote, on_conflict=on_conflict,
+                                                     ignore_duplicates=ignore_duplicates))
+        else:
+            resp = _retry(client.table(table).insert(lote))
+        inseridas.extend(resp.data or [])
+    if rows:
+        _invalidar(*_tags_insercao(table, rows + inseridas))
+    return inseridas
+
+def salvar_item_com_series(item: dict, series: list) -> dict:
+    """Cria o item do treino e todas as suas séries: duas requisições, não 1+N.
+
+    `item` recebe os mesmos campos de salvar_item; `series` é uma lista de
+    dicts com "repeticoes" e "carga" (opcional) ou de tuplas (repeticoes, carga).
+    """
+    novo = salvar_item(**item)
+    linhas = []
+    for i, s in enumerate(series):
+        reps, carga = (s["repeticoes"], s.get("carga")) if isinstance(s, dict) else s
+        linhas.append({"treino_item_id": novo["id"], "numero": i + 1,
+                       "repeticoes": reps, "carga": float(carga) if carga else None})
+    novo["series"] = bulk_insert("series", linhas)
+    return novo
+
+
+# ── Ficha completa ─────────────────────────────────────────────────────────
+
+SELECT_FICHA = ("id, nome, descricao, ordem, modelo_id, personalizado, "
+                "treino_itens(id, exercicio_id, ordem, tipo_serie, descanso_seg, combinado_com, "
+                "observacao, exercicios(nome, grupo), series(numero, repeticoes, carga)), "
+                "modelos(nome, modelo_itens(id, exercicio_id, ordem, tipo_serie, descanso_seg, combinado_com, "
+                "observacao, exercicios(nome, grupo), modelo_series(numero, repeticoes, carga)))")
+
+def _tags_ficha(ficha, a):
+    tags = {("treinos", "plano", int(a["plano_id"]))} | _ids(ficha, "treinos")
+    for treino in ficha:
+        if treino.get("modelo_id") is not None:
+            tags.add(("modelos", int(treino["modelo_id"])))
+        tags.add(("treino_itens", "treino", int(treino["id"])))
+        tags |= _ids(treino["itens"], "treino_itens")
+        for item in treino["itens"]:
+            tags.add(("series", "item", int(item["id"])))
+            if item.get("exercicio_id") is not None:
+                tags.add(("exercicios", int(item["exercicio_id"])))
+    return tags
+
+@_cached(TTL_FICHA, _tags_ficha)
+def carregar_ficha(plano_id) -> list[dict]:
+    """Treinos → itens → exercício → séries do plano numa única consulta embutida.
+
+    Retorna a lista de treinos (por ordem), cada um com a chave "itens" já
+    ordenada e cada item com "exercicio_nome", "exercicio_grupo" e "series".
+    Treino de modelo ainda sem itens próprios traz os do modelo e "modelo": True
+    (ids de modelo_itens: antes de editar ou executar, materializar_treino).
+    """
+    client = get_client()
+    resp = _retry(client.table("treinos").select(SELECT_FICHA).eq("plano_id", plano_id).order("ordem"))
+    return _montar_ficha(resp.data)
+
+def _montar_ficha(linhas) -> list[dict]:
+    ficha = []
+    for treino in linhas or []:
+        itens = treino.pop("treino_itens", None) or []
+        modelo = treino.pop("modelos", None)
+        treino["modelo_nome"] = modelo["nome"] if isinstance(modelo, dict) else None
+        treino["modelo"] = isinstance(modelo, dict) and not itens and not treino.get("personalizado")
+        if treino["modelo"]:
+            treino["itens"] = _montar_itens(modelo.get("modelo_itens") or [], "modelo_series")
+        else:
+            treino["itens"] = _montar_itens(itens)
+        ficha.append(treino)
+    return ficha
+
+def _montar_itens(itens, series="series") -> list[dict]:
+    itens.sort(key=lambda x: (x.get("ordem") or 0, x["id"]))
+    for item in itens:
+        ex = item.pop("exercicios", None)
+        item["exercicio_nome"] = ex["nome"] if isinstance(ex, dict) else "—"
+        item["exercicio_grupo"] = ex["grupo"] if isinstance(ex, dict) else "—"
+        item["series"] = sorted(item.pop(series, None) or [], key=lambda s: s["numero"])
+    return itens
+
+
+# ── Cópia de plano (virada de mês) ─────────────────────────────────────────
+# clonar_plano / virar_mes são funções SQL (supabase/migrations/20261018000003_
+# clonar_plano.sql): a cópia inteira, com os combinado_com remapeados, é uma
+# transação no servidor. Sem a migração, a cópia sai em lote pelo PostgREST
+# (uma requisição por tabela) e, se algo falhar, os planos novos são apagados.
+
+MESES = ["", "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+         "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+
+def nome_do_mes(mes: str) -> str:
+    """"2026-10" → "Outubro/2026" (o texto volta como veio se não for YYYY-MM)."""
+    try:
+        ano, m = mes.split("-")
+        return f"{MESES[int(m)]}/{ano}"
+    except (ValueError, IndexError):
+        return mes
+
+
+def mes_anterior(mes: str) -> str:
+    ano, m = map(int, mes.split("-"))
+    return f"{ano - 1}-12" if m == 1 else f"{ano}-{m - 1:02d}"
+
+
+def _sem_funcao(e: APIError) -> bool:
+    return str(e.code or "") in ("PGRST202", "42883")
+
+
+def _ordens_unicas(ordens) -> list[int]:
+    """Mesma sequência, com repetidos desempatados (0, 0, 1 → 0, 1, 2)."""
+    saida = []
+    for o in ordens:
+        o = o or 0
+        saida.append(o if not saida or o > saida[-1] else saida[-1] + 1)
+    return saida
+
+
+def _clonar_em_lote(copias, novo_mes, nome, funcao) -> list[dict]:
+    """`copias` = [(plano_origem_id, aluno_id)]; mesma cópia do RPC, em ~5 requisições.
+
+    O PostgREST não promete devolver as linhas na ordem do envio: cada cópia é
+    casada com a origem por uma chave que volta na resposta (o aluno do plano;
+    pai + ordem de treinos e itens, com a ordem desempatada para ser única).
+    """
+    client = get_client()
+    copias = list({a: (p, a) for p, a in copias}.values())   # um plano por aluno
+    origens = sorted({p for p, _ in copias})
+    fichas = dict(zip(origens, em_paralelo(*(functools.partial(carregar_ficha.sem_cache, p) for p in origens))))
+    planos = bulk_insert("planos", [{"aluno_id": a, "nome": nome, "mes": novo_mes, "ativo": True}
+                                    for _, a in copias])
+    try:
+        plano_de = {int(p["aluno_id"]): p["id"] for p in planos}
+        origem_treino = {}   # (plano novo, ordem) → treino de origem
+        for origem, aluno in copias:
+            ficha = fichas[origem]
+            for t, ordem in zip(ficha, _ordens_unicas(t.get("ordem") for t in ficha)):
+                origem_treino[(plano_de[aluno], ordem)] = t
+        treinos = bulk_insert("treinos", [{"plano_id": plano_id, "nome": t["nome"],
+                                           "descricao": t.get("descricao"), "ordem": ordem,
+                                           "modelo_id": t.get("modelo_id"),
+                                           "personalizado": bool(t.get("personalizado"))}
+                                          for (plano_id, ordem), t in origem_treino.items()])
+        origem_item = {}   # (treino novo, ordem) → (plano novo, item de origem, linha a inserir)
+        for novo in treinos:
+            t = origem_treino[(novo["plano_id"], novo["ordem"])]
+            if t.get("modelo_id") is not None and not t.get("personalizado"):
+                continue   # treino ainda fiel ao modelo vai só como vínculo
+            for it, ordem in zip(t["itens"], _ordens_unicas(it.get("ordem") for it in t["itens"])):
+                origem_item[(novo["id"], ordem)] = (novo["plano_id"], it, {
+                    "treino_id": novo["id"], "exercicio_id": it["exercicio_id"], "ordem": ordem,
+                    "tipo_serie": it["tipo_serie"], "descanso_seg": it.get("descanso_seg"),
+                    "combinado_com": None, "observacao": it.get("observacao")})
+        itens = bulk_insert("treino_itens", [linha for _, _, linha in origem_item.values()])
+        copia_de = {novo["id"]: origem_item[(novo["treino_id"], novo["ordem"])] for novo in itens}
+        mapa = {(plano_id, it["id"]): novo_id for novo_id, (plano_id, it, _) in copia_de.items()}
+        combinados = [{**linha, "id": novo_id, "combinado_com": mapa.get((plano_id, it["combinado_com"]))}
+                      for novo_id, (plano_id, it, linha) in copia_de.items() if it.get("combinado_com")]
+        if combinados:
+            bulk_insert("treino_itens", combinados, upsert=True, on_conflict="id")
+        bulk_insert("series", [{"treino_item_id": novo_id, "numero": s["numero"],
+                                "repeticoes": s["repeticoes"], "carga": s.get("carga")}
+                               for novo_id, (_, it, _) in copia_de.items() for s in it["series"]])
+    except Exception:
+        ids = [p["id"] for p in planos]
+        if ids:
+            _retry(client.table("planos").delete().in_("id", ids), funcao=funcao)
+        raise
+    return planos
+
+
+def _apos_copia(planos):
+    _invalidar(("planos", "*"), *{("planos", "aluno", int(p["aluno_id"])) for p in planos})
+    return planos
+
+
+def clonar_plano(plano_id, novo_mes, aluno_ids=None, nome=None) -> list[dict]:
+    """Copia o plano (treinos, itens, séries, bi-sets) para `novo_mes`.
+
+    Sem `aluno_ids` a cópia é do próprio aluno; com a lista, cada aluno recebe
+    a sua. `nome` padrão: o do mês ("Novembro/2026"). Devolve os planos criados.
+    """
+    client = get_client()
+    nome = nome or nome_do_mes(novo_mes)
+    alunos = [int(a) for a in aluno_ids] if aluno_ids else None
+    try:
+        resp = _retry(client.rpc("clonar_plano", {"p_plano_id": int(plano_id), "p_mes": novo_mes,
+                                                  "p_nome": nome, "p_aluno_ids": alunos}))
+        return _apos_copia(resp.data or [])
+    except APIError as e:
+        if not _sem_funcao(e):
+            raise
+    origem = _retry(client.table("planos").select("id, aluno_id").eq("id", plano_id)).data
+    if not origem:
+        raise ValueError(f"plano {plano_id} não existe")
+    copias = [(int(plano_id), a) for a in alunos or [int(origem[0]["aluno_id"])]]
+    return _apos_copia(_clonar_em_lote(copias, novo_mes, nome, "clonar_plano"))
+
+
+def virar_mes(novo_mes, mes_origem=None, nome=None) -> list[dict]:
+    """Copia o plano de `mes_origem` (padrão: mês anterior) de cada aluno ativo para `novo_mes`.
+
+    Quem já tem plano em `novo_mes` fica de fora, então repetir é seguro.
+    """
+    client = get_client()
+    mes_origem = mes_origem or mes_anterior(novo_mes)
+    nome = nome or nome_do_mes(novo_mes)
+    try:
+        resp = _retry(client.rpc("virar_mes", {"p_mes_origem": mes_origem, "p_mes_destino": novo_mes,
+                                               "p_nome": nome}))
+        return _apos_copia(resp.data or [])
+    except APIError as e:
+        if not _sem_funcao(e):
+            raise
+    ativos = set(listar_alunos.sem_cache(colunas="id")["id"].astype(int))
+    origem = _retry(client.table("planos").select("id, aluno_id").eq("mes", mes_origem).order("id")).data or []
+    destino = _retry(client.table("planos").select("aluno_id").eq("mes", novo_mes)).data or []
+    ja_tem = {int(p["aluno_id"]) for p in destino}
+    ultimo = {int(p["aluno_id"]): int(p["id"]) for p in origem}   # o mais recente de cada aluno
+    copias = [(plano, aluno) for aluno, plano in sorted(ultimo.items()) if aluno in ativos and aluno not in ja_tem]
+    return _apos_copia(_clonar_em_lote(copias, novo_mes, nome, "virar_mes")) if copias else []
+
+
+# ── Modelos de treino ──────────────────────────────────────────────────────
+# Biblioteca de treinos prontos (supabase/migrations/20261018000004_modelos_treino.sql).
+# Atribuir um modelo grava só a linha em treinos (modelo_id); itens e séries
+# continuam no modelo até materializar_treino copiá-los para o treino, na
+# primeira edição do professor ou no primeiro treino executado pelo aluno.
+
+COLS_MODELO = "id, nome, descricao"
+SELECT_MODELO = ("id, nome, descricao, modelo_itens(id, exercicio_id, ordem, tipo_serie, descanso_seg, "
+                 "combinado_com, observacao, exercicios(nome, grupo), modelo_series(numero, repeticoes, carga))")
+
+
+@_cached(TTL_CATALOGO, lambda df, a: {("modelos", "*")})
+def listar_modelos(colunas=COLS_MODELO) -> pd.DataFrame:
+    client = get_client()
+    resp = _retry(client.table("modelos").select(_projecao(colunas)).order("nome"))
+    return _df(resp, _vazio(colunas, COLS_MODELO))
+
+@_cached(TTL_CATALOGO, lambda m, a: {("modelos", int(a["modelo_id"]))})
+def carregar_modelo(modelo_id) -> Optional[dict]:
+    """Modelo no formato de um treino de carregar_ficha ("itens" com "series")."""
+    client = get_client()
+    resp = _retry(client.table("modelos").select(SELECT_MODELO).eq("id", modelo_id))
+    if not resp.data:
+        return None
+    modelo = resp.data[0]
+    modelo["itens"] = _montar_itens(modelo.pop("modelo_itens", None) or [], "modelo_series")
+    return modelo
+
+def _copiar_para(tabela, col_pai, pai_id, itens, tabela_series, col_series) -> dict:
+    """Grava `itens` (formato de carregar_ficha) sob `pai_id`; devolve o mapa id velho → id novo."""
+    linhas = [{col_pai: pai_id, "exercicio_id": it["exercicio_id"], "ordem": it.get("ordem") or 0,
+               "tipo_serie": it["tipo_serie"], "descanso_seg": it.get("descanso_seg"),
+               "combinado_com": None, "observacao": it.get("observacao")} for it in itens]
+    novos = [int(n["id"]) for n in bulk_insert(tabela, linhas)]
+    mapa = {it["id"]: novo for it, novo in zip(itens, novos) if "id" in it}   # item sem id não faz par
+    pares = [{**linha, "id": novo, "combinado_com": mapa[it["combinado_com"]]}
+             for it, linha, novo in zip(itens, linhas, novos) if it.get("combinado_com") in mapa]
+    if pares:
+        bulk_insert(tabela, pares, upsert=True, on_conflict="id")
+    bulk_insert(tabela_series, [{col_series: novo, "numero": s["numero"],
+                                 "repeticoes": s["repeticoes"], "carga": s.get("carga")}
+                                for it, novo in zip(itens, novos) for s in it.get("series") or []])
+    return mapa
+
+def salvar_modelo(nome, descricao="", itens=()) -> dict:
+    """Cria o modelo com itens e séries (4 requisições no máximo).
+
+    `itens` no formato de carregar_ficha: exercicio_id, tipo_serie, descanso_seg,
+    observacao, combinado_com (id de outro item da lista) e "series".
+    """
+    client = get_client()
+    payload = {"nome": nome.strip(), "descricao": descricao or None}
+    modelo = _retry(client.table("modelos").insert(payload)).data[0]
+    _copiar_para("modelo_itens", "modelo_id", modelo["id"], list(itens), "modelo_series", "modelo_item_id")
+    _invalidar(("modelos", "*"))
+    return modelo
+
+def modelo_de_treino(treino: dict, nome, descricao=None) -> dict:
+    """Salva um treino de carregar_ficha como modelo."""
+    return salvar_modelo(nome, descricao if descricao is not None else treino.get("descricao"), treino["itens"])
+
+def excluir_modelo(modelo_id: int):
+    # Modelo ainda vinculado a treinos: o banco recusa (23503)
+    client = get_client()
+    _retry(client.table("modelos").delete().eq("id", modelo_id))
+    _invalidar(("modelos", "*"), ("modelos", int(modelo_id)))
+
+
+def _letra(n: int) -> str:
+    return chr(ord("A") + n) if n < 26 else str(n + 1)
+
+def atribuir_modelo(modelo_id, aluno_ids, mes, nome=None, descricao=None) -> list[dict]:
+    """Põe o modelo no plano de `mes` de cada aluno (criando o plano se faltar).
+
+    Grava uma linha em treinos por aluno, num único POST; nome padrão = próxima
+    letra do plano. Devolve os treinos criados.
+    """
+    client = get_client()
+    modelo = carregar_modelo(modelo_id)
+    if modelo is None:
+        raise ValueError(f"modelo {modelo_id} não existe")
+    alunos = sorted({int(a) for a in aluno_ids})
+    plano_de = {}
+    for i in range(0, len(alunos), _FATIA_IN):
+        for p in _retry(client.table("planos").select("id, aluno_id").eq("mes", mes)
+                        .in_("aluno_id", alunos[i:i + _FATIA_IN]).order("id")).data or []:
+            plano_de[int(p["aluno_id"])] = int(p["id"])   # o mais recente do mês
+    faltam = [a for a in alunos if a not in plano_de]
+    if faltam:
+        for p in bulk_insert("planos", [{"aluno_id": a, "nome": nome_do_mes(mes), "mes": mes, "ativo": True}
+                                        for a in faltam]):
+            plano_de[int(p["aluno_id"])] = int(p["id"])
+    planos = sorted(set(plano_de.values()))
+    ja_tem = Counter()
+    for i in range(0, len(planos), _FATIA_IN):
+        ja_tem.update(int(t["plano_id"]) for t in _retry(client.table("treinos").select("plano_id")
+                                                         .in_("plano_id", planos[i:i + _FATIA_IN])).data or [])
+    return bulk_insert("treinos", [{"plano_id": p, "nome": nome or _letra(ja_tem[p]),
+                                    "descricao": descricao if descricao is not None else modelo.get("descricao"),
+                                    "ordem": ja_tem[p], "modelo_id": int(modelo_id), "personalizado": False}
+                                   for p in planos])
+
+
+_MATERIALIZAR = "materializar_treino"
+
+def _materializar_em_lote(treino_id, personalizar):
+    client = get_client()
+    alvo = _retry(client.table("treinos").select("id, modelo_id, personalizado").eq("id", treino_id),
+                  funcao=_MATERIALIZAR).data
+    if not alvo:
+        raise ValueError(f"treino {treino_id} não existe")
+    alvo = alvo[0]
+    if personalizar and not alvo["personalizado"]:
+        _retry(client.table("treinos").update({"personalizado": True}).eq("id", treino_id),
+               funcao=_MATERIALIZAR)
+    if alvo["modelo_id"] is None or alvo["personalizado"] or _retry(
+            client.table("treino_itens").select("id").eq("treino_id", treino_id).limit(1),
+            funcao=_MATERIALIZAR).data:
+        return []
+    modelo = carregar_modelo.sem_cache(alvo["modelo_id"])
+    mapa = _copiar_para("treino_itens", "treino_id", int(treino_id), modelo["itens"], "series", "treino_item_id")
+    return [{"modelo_item_id": velho, "treino_item_id": novo} for velho, novo in mapa.items()]
+
+def materializar_treino(treino_id, personalizar=False) -> dict:
+    """Copia os itens do modelo para o treino (se ainda não tem); devolve {item do modelo: item do treino}.
+
+    `personalizar=True` marca o treino como editado: clonar_plano passa a copiar
+    os itens dele, não o vínculo com o modelo.
+    """
+    client = get_client()
+    try:
+        linhas = _retry(client.rpc("materializar_treino", {"p_treino_id": int(treino_id),
+                                                           "p_personalizar": bool(personalizar)})).data or []
+    except APIError as e:
+        if not _sem_funcao(e):
+            raise
+        linhas = _materializar_em_lote(treino_id, personalizar)
+    _invalidar(("treinos", int(treino_id)), ("treino_itens", "treino", int(treino_id)))
+    return {int(l["modelo_item_id"]): int(l["treino_item_id"]) for l in linhas}
 
 
 # ── Histórico ──────────────────────────────────────────────────────────────
@@ -174,15 +1225,17 @@ def iniciar_treino(aluno_id, treino_id) -> dict:
     client = get_client()
     payload = {"aluno_id": aluno_id, "treino_id": treino_id,
                "data": str(date.today()), "iniciado_em": datetime.now(timezone.utc).isoformat()}
-    resp = _retry(lambda: client.table("historico_treinos").insert(payload).execute())
+    resp = _retry(client.table("historico_treinos").insert(payload))
+    _invalidar(("historico", "*"))
     return resp.data[0] if resp.data else payload
 
 def finalizar_treino(historico_id: int):
     from datetime import datetime, timezone
     client = get_client()
-    _retry(lambda: client.table("historico_treinos")
+    _retry(client.table("historico_treinos")
            .update({"finalizado_em": datetime.now(timezone.utc).isoformat()})
-           .eq("id", historico_id).execute())
+           .eq("id", historico_id))
+    _invalidar(("historico", "*"))
 
 def registrar_serie_executada(historico_treino_id, treino_item_id, serie_numero,
                                repeticoes_feitas=None, carga_usada=None) -> dict:
@@ -196,17 +1249,119 @@ def registrar_serie_executada(historico_treino_id, treino_item_id, serie_numero,
         "carga_usada": float(carga_usada) if carga_usada else None,
         "executado_em": datetime.now(timezone.utc).isoformat(),
     }
-    resp = _retry(lambda: client.table("historico_series").insert(payload).execute())
+    resp = _retry(client.table("historico_series").insert(payload))
+    _invalidar(("historico", "*"))
     return resp.data[0] if resp.data else payload
 
+def sincronizar_treinos_executados(linhas: list[dict]) -> list[dict]:
+    """Upsert em lote de historico_treinos pelo id_cliente (reenvio idempotente)."""
+    salvos = bulk_insert("historico_treinos", linhas, upsert=True, on_conflict="id_cliente")
+    _invalidar(("historico", "*"))
+    return salvos
+
+def registrar_series_executadas(linhas: list[dict]) -> list[dict]:
+    """Grava várias séries executadas num POST; id_cliente repetido é ignorado."""
+    for linha in linhas:
+        if linha.get("carga_usada") is not None:
+            linha["carga_usada"] = float(linha["carga_usada"]) or None
+    salvas = bulk_insert("historico_series", linhas, upsert=True, on_conflict="id_cliente",
+                         ignore_duplicates=True)
+    _invalidar(("historico", "*"))
+    return salvas
+
+@_cached(TTL_FICHA, lambda df, a: {("historico", "*")})
 def listar_historico(aluno_id, limit=30) -> pd.DataFrame:
     client = get_client()
-    resp = _retry(lambda: client.table("historico_treinos")
+    resp = _retry(client.table("historico_treinos")
                   .select("*, treinos(nome, descricao)")
-                  .eq("aluno_id", aluno_id).order("data", desc=True).limit(limit).execute())
+                  .eq("aluno_id", aluno_id).order("data", desc=True).limit(limit))
+    return _historico_df(resp)
+
+def _historico_df(resp):
     if not resp.data:
         return pd.DataFrame()
     df = pd.DataFrame(resp.data)
     df["treino_nome"] = df["treinos"].apply(lambda x: x["nome"] if isinstance(x, dict) else "—")
     df["treino_desc"] = df["treinos"].apply(lambda x: x.get("descricao","") if isinstance(x, dict) else "")
     return df
+
+
+# ── Histórico em massa (análises) ──────────────────────────────────────────
+# Leituras planas, sem embed, paginadas por id: quem junta as tabelas é o
+# pandas (ver analytics.py). Filtros por lista de ids vão em fatias de _FATIA_IN
+# para a URL não estourar.
+
+COLS_HIST_TREINO = "id, aluno_id, treino_id, data"
+COLS_HIST_SERIE = "id, historico_treino_id, treino_item_id, exercicio_id, serie_numero, repeticoes_feitas, carga_usada"
+ORDEM_ID = (("id", False),)
+_FATIA_IN = 200
+
+
+def _varrer(tabela, colunas, filtros=(), page_size=1000, apos=None, funcao=None):
+    cursor = apos
+    while True:
+        df, cursor = _pagina(tabela, ORDEM_ID, colunas, colunas, cursor, page_size, filtros, funcao)
+        if not df.empty:
+            yield df
+        if cursor is None:
+            return
+
+def _varrer_em(tabela, colunas, coluna, ids, page_size=1000, apos=None, funcao=None):
+    ids = sorted({int(i) for i in ids})
+    for i in range(0, len(ids), _FATIA_IN):
+        yield from _varrer(tabela, colunas, [(coluna, ids[i:i + _FATIA_IN])], page_size, apos, funcao)
+
+def iter_historico_treinos(aluno_id=None, page_size=1000, colunas=COLS_HIST_TREINO):
+    """Gera páginas de historico_treinos (todas, ou só do aluno) em ordem de id."""
+    filtros = [("aluno_id", aluno_id)] if aluno_id else []
+    return _varrer("historico_treinos", colunas, filtros, page_size, funcao="iter_historico_treinos")
+
+def iter_historico_series(historico_ids=None, page_size=1000, colunas=COLS_HIST_SERIE, apos_id=None):
+    """Gera páginas de historico_series em ordem de id; `apos_id` pula o que já foi lido."""
+    apos = (apos_id,) if apos_id is not None else None
+    if historico_ids is None:
+        return _varrer("historico_series", colunas, page_size=page_size, apos=apos,
+                       funcao="iter_historico_series")
+    return _varrer_em("historico_series", colunas, "historico_treino_id", historico_ids, page_size, apos,
+                      "iter_historico_series")
+
+def mapa_itens_exercicio(item_ids) -> pd.DataFrame:
+    """treino_item_id → exercicio_id para os itens pedidos (colunas id, exercicio_id)."""
+    partes = list(_varrer_em("treino_itens", "id, exercicio_id", "id", item_ids, funcao="mapa_itens_exercicio"))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=["id", "exercicio_id"])
+
+
+# ── Progresso (agregados) ──────────────────────────────────────────────────
+# progresso_diario / progresso_semanal são mantidos pelo gatilho em
+# historico_series (supabase/migrations/20261018000002_progresso_rollups.sql);
+# aqui só se lê. Sem coluna id: pagina pela chave (semana, exercicio_id).
+
+COLS_PROGRESSO = "aluno_id, exercicio_id, semana, series, reps, volume, carga_max, e1rm_max"
+ORDEM_PROGRESSO = (("semana", False), ("exercicio_id", False))
+
+
+def _consulta_progresso(client, aluno_id, cursor, page_size, colunas):
+    q = client.table("progresso_semanal").select(colunas).eq("aluno_id", aluno_id)
+    if cursor is not None:
+        q = _apos(q, ORDEM_PROGRESSO, cursor)
+    for col, desc in ORDEM_PROGRESSO:
+        q = q.order(col, desc=desc)
+    return q.limit(page_size)
+
+def iter_progresso_semanal(aluno_id, page_size=1000, colunas=COLS_PROGRESSO):
+    """Gera páginas (DataFrame) das semanas do aluno × exercício, da mais antiga à atual."""
+    client = get_client()
+    cursor = None
+    while True:
+        linhas = _retry(_consulta_progresso(client, aluno_id, cursor, page_size, colunas)).data or []
+        if linhas:
+            yield pd.DataFrame(linhas)
+        if len(linhas) < page_size:
+            return
+        cursor = tuple(linhas[-1][c] for c, _ in ORDEM_PROGRESSO)
+
+def recalcular_progresso():
+    """Reconstrói os agregados a partir do histórico inteiro (carga inicial / reparo)."""
+    client = get_client()
+    _retry(client.rpc("recalcular_progresso", {}))
+    _invalidar(("historico", "*"))
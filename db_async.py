@@ -0,0 +1,477 @@
+"""
+gymflow/db_async.py — Espelho assíncrono do db.py para jobs em lote
+
+Mesmas funções e mesmos retornos do db.py, em versão `async`, sobre o cliente
+assíncrono do Supabase. Todas as consultas compartilham um httpx.AsyncClient
+HTTP/2 com pool de conexões, então centenas de consultas concorrentes (importação,
+análises, lembretes) saem multiplexadas em poucas conexões, sem threads:
+
+    async def main():
+        fichas = await db_async.reunir(*(db_async.carregar_ficha(p) for p in ids))
+    asyncio.run(main())
+
+Retentativas, disjuntor e instrumentação são os do db.py. Não há cache de
+leitura (é para o app). As escritas chamam db._invalidar, mas o cache é do
+processo: um job rodando fora do Streamlit não limpa o do servidor, que só
+enxerga as mudanças quando o TTL vence (ou com limpar_cache lá).
+Com o backend SQLite (GYMFLOW_SQLITE) as chamadas rodam direto no LocalClient.
+"""
+from __future__ import annotations
+import asyncio
+import inspect
+import os
+import sys
+import time as time_module
+import weakref
+from datetime import date, datetime, timezone
+from typing import Optional
+import httpx
+import pandas as pd
+from supabase import AsyncClientOptions, acreate_client
+import db
+from db import (COLS_ALUNO, COLS_EXERCICIO, COLS_PLANO, COLS_TREINO, COLS_ITEM, COLS_SERIE,
+                COLS_HIST_TREINO, COLS_HIST_SERIE, COLS_PROGRESSO, RetryPolicy)
+
+# ── Cliente HTTP ───────────────────────────────────────────────────────────
+# Padrões via ambiente; configurar() troca antes (ou entre) os jobs.
+
+_config = {
+    "timeout": float(os.environ.get("GYMFLOW_HTTP_TIMEOUT", "30")),
+    "timeout_conexao": float(os.environ.get("GYMFLOW_HTTP_TIMEOUT_CONEXAO", "10")),
+    "max_conexoes": int(os.environ.get("GYMFLOW_HTTP_CONEXOES", "20")),
+    "max_ociosas": int(os.environ.get("GYMFLOW_HTTP_OCIOSAS", "10")),
+    "http2": os.environ.get("GYMFLOW_HTTP2", "1") != "0",
+}
+# Um cliente por event loop: conexões do httpx não atravessam loops (asyncio.run repetido)
+_clientes: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def configurar(timeout=None, timeout_conexao=None, max_conexoes=None, max_ociosas=None, http2=None):
+    """Ajusta timeouts (s) e limites do pool; vale para os clientes criados depois."""
+    novos = {"timeout": timeout, "timeout_conexao": timeout_conexao, "max_conexoes": max_conexoes,
+             "max_ociosas": max_ociosas, "http2": http2}
+    _config.update({k: v for k, v in novos.items() if v is not None})
+
+
+def _http() -> httpx.AsyncClient:
+    # O tempo esperando vaga no pool conta como fila, não como falha: sem teto
+    return httpx.AsyncClient(
+        http2=_config["http2"],
+        timeout=httpx.Timeout(_config["timeout"], connect=_config["timeout_conexao"], pool=None),
+        limits=httpx.Limits(max_connections=_config["max_conexoes"],
+                            max_keepalive_connections=_config["max_ociosas"]),
+    )
+
+
+async def get_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _clientes:
+        if db._caminho_sqlite():
+            _clientes[loop] = (db.get_client(), None)
+        else:
+            url, key = db._credenciais()
+            http = _http()
+            _clientes[loop] = (await acreate_client(url, key, AsyncClientOptions(httpx_client=http)), http)
+    return _clientes[loop][0]
+
+
+async def fechar():
+    """Fecha as conexões do loop atual (fim do job)."""
+    _, http = _clientes.pop(asyncio.get_running_loop(), (None, None))
+    if http is not None:
+        await http.aclose()
+
+
+async def reunir(*corrotinas, limite: Optional[int] = None) -> list:
+    """asyncio.gather com no máximo `limite` em voo (padrão: o tamanho do pool)."""
+    vagas = asyncio.Semaphore(limite or _config["max_conexoes"])
+
+    async def uma(c):
+        async with vagas:
+            return await c
+    return await asyncio.gather(*(uma(c) for c in corrotinas))
+
+
+# ── Retentativas ───────────────────────────────────────────────────────────
+
+async def _retry(q, politica: Optional[RetryPolicy] = None, funcao: Optional[str] = None):
+    """Como db._retry, mas aguarda a query e dorme com asyncio.sleep."""
+    politica = politica or db.RETRY_PADRAO
+    executar = q.execute if hasattr(q, "execute") else q
+    tabela = db._tabela(q)
+    funcao = funcao or sys._getframe(1).f_code.co_name
+    inicio = time_module.perf_counter()
+    resp, erro, tentativa = None, None, 0
+    try:
+        disjuntor = db._liberar(tabela)
+        for tentativa in range(politica.tentativas):
+            db._contar("chamadas")
+            try:
+                resp = executar()
+                if inspect.isawaitable(resp):   # o LocalClient responde na hora
+                    resp = await resp
+            except Exception as e:
+                espera = db._apos_falha(e, politica, disjuntor, tentativa)
+                if espera is None:
+                    raise
+                await asyncio.sleep(espera)
+            else:
+                disjuntor.sucesso()
+                return resp
+    except Exception as e:
+        erro = e
+        raise
+    finally:
+        db._registrar(q, tabela, funcao, inicio, resp, tentativa, erro)
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _primeira(resp, payload) -> dict:
+    return resp.data[0] if resp.data else payload
+
+
+# ── Alunos ─────────────────────────────────────────────────────────────────
+
+async def listar_alunos(apenas_ativos=True, colunas=COLS_ALUNO) -> pd.DataFrame:
+    client = await get_client()
+    q = client.table("alunos").select(db._projecao(colunas)).order("nome")
+    if apenas_ativos:
+        q = q.eq("ativo", True)
+    return db._df(await _retry(q), db._vazio(colunas, COLS_ALUNO))
+
+async def salvar_aluno(nome, email="", telefone="", aluno_id=None) -> dict:
+    client = await get_client()
+    payload = {"nome": nome.strip(), "email": email or None, "telefone": telefone or None, "ativo": True}
+    if aluno_id:
+        payload["id"] = aluno_id
+        resp = await _retry(client.table("alunos").upsert(payload))
+    else:
+        resp = await _retry(client.table("alunos").insert(payload))
+    db._invalidar(("alunos", "*"))
+    return _primeira(resp, payload)
+
+async def desativar_aluno(aluno_id: int):
+    client = await get_client()
+    await _retry(client.table("alunos").update({"ativo": False}).eq("id", aluno_id))
+    db._invalidar(("alunos", "*"))
+
+
+# ── Exercícios ─────────────────────────────────────────────────────────────
+
+async def listar_exercicios(colunas=COLS_EXERCICIO) -> pd.DataFrame:
+    client = await get_client()
+    resp = await _retry(client.table("exercicios").select(db._projecao(colunas)).order("grupo").order("nome"))
+    return db._df(resp, db._vazio(colunas, COLS_EXERCICIO))
+
+async def salvar_exercicio(nome, grupo, descricao="") -> dict:
+    client = await get_client()
+    payload = {"nome": nome.strip(), "grupo": grupo, "descricao": descricao or None}
+    resp = await _retry(client.table("exercicios").upsert(payload, on_conflict="nome"))
+    db._invalidar(("exercicios", "*"), *db._ids(resp.data or [], "exercicios"))
+    return _primeira(resp, payload)
+
+async def atualizar_exercicio(ex_id: int, nome, grupo, descricao=""):
+    client = await get_client()
+    await _retry(client.table("exercicios")
+                 .update({"nome": nome.strip(), "grupo": grupo, "descricao": descricao or None})
+                 .eq("id", ex_id))
+    db._invalidar(("exercicios", "*"), ("exercicios", int(ex_id)))
+
+async def excluir_exercicio(ex_id: int):
+    client = await get_client()
+    await _retry(client.table("exercicios").delete().eq("id", ex_id))
+    db._invalidar(("exercicios", "*"), ("exercicios", int(ex_id)))
+
+
+# ── Planos ─────────────────────────────────────────────────────────────────
+
+async def listar_planos(aluno_id=None, colunas=COLS_PLANO) -> pd.DataFrame:
+    client = await get_client()
+    q = client.table("planos").select(db._projecao(colunas)).order("mes", desc=True)
+    if aluno_id:
+        q = q.eq("aluno_id", aluno_id)
+    return db._df(await _retry(q), db._vazio(colunas, COLS_PLANO))
+
+async def salvar_plano(aluno_id, nome, mes) -> dict:
+    client = await get_client()
+    payload = {"aluno_id": aluno_id, "nome": nome.strip(), "mes": mes, "ativo": True}
+    resp = await _retry(client.table("planos").insert(payload))
+    db._invalidar(("planos", "*"), ("planos", "aluno", int(aluno_id)))
+    return _primeira(resp, payload)
+
+async def excluir_plano(plano_id: int):
+    client = await get_client()
+    await _retry(client.table("planos").delete().eq("id", plano_id))
+    db._invalidar(("planos", int(plano_id)), ("planos", "*"), ("treinos", "plano", int(plano_id)))
+
+
+# ── Treinos, itens e séries ────────────────────────────────────────────────
+
+async def listar_treinos(plano_id, colunas=COLS_TREINO) -> pd.DataFrame:
+    client = await get_client()
+    resp = await _retry(client.table("treinos").select(db._projecao(colunas))
+                        .eq("plano_id", plano_id).order("ordem"))
+    return db._df(resp, db._vazio(colunas, COLS_TREINO))
+
+async def salvar_treino(plano_id, nome, descricao="", ordem=0) -> dict:
+    client = await get_client()
+    payload = {"plano_id": plano_id, "nome": nome.strip(), "descricao": descricao or None, "ordem": ordem}
+    resp = await _retry(client.table("treinos").insert(payload))
+    db._invalidar(("treinos", "plano", int(plano_id)))
+    return _primeira(resp, payload)
+
+async def excluir_treino(treino_id: int):
+    client = await get_client()
+    await _retry(client.table("treinos").delete().eq("id", treino_id))
+    db._invalidar(("treinos", int(treino_id)))
+
+async def listar_itens(treino_id, colunas=COLS_ITEM) -> pd.DataFrame:
+    client = await get_client()
+    resp = await _retry(client.table("treino_itens")
+                        .select(f"{db._projecao(colunas)}, exercicios(nome, grupo)")
+                        .eq("treino_id", treino_id).order("ordem"))
+    return db._itens_df(resp, colunas)
+
+async def salvar_item(treino_id, exercicio_id, ordem, tipo_serie, descanso_seg,
+                      combinado_com=None, observacao="") -> dict:
+    client = await get_client()
+    payload = {
+        "treino_id": treino_id, "exercicio_id": exercicio_id, "ordem": ordem,
+        "tipo_serie": tipo_serie, "descanso_seg": descanso_seg,
+        "combinado_com": combinado_com or None, "observacao": observacao or None,
+    }
+    resp = await _retry(client.table("treino_itens").insert(payload))
+    db._invalidar(("treino_itens", "treino", int(treino_id)))
+    return _primeira(resp, payload)
+
+async def excluir_item(item_id: int):
+    client = await get_client()
+    await _retry(client.table("treino_itens").delete().eq("id", item_id))
+    db._invalidar(("treino_itens", int(item_id)))
+
+async def listar_series(treino_item_id, colunas=COLS_SERIE) -> pd.DataFrame:
+    client = await get_client()
+    resp = await _retry(client.table("series").select(db._projecao(colunas))
+                        .eq("treino_item_id", treino_item_id).order("numero"))
+    return db._df(resp, db._vazio(colunas, COLS_SERIE))
+
+async def salvar_serie(treino_item_id, numero, repeticoes, carga=None) -> dict:
+    client = await get_client()
+    payload = {"treino_item_id": treino_item_id, "numero": numero,
+               "repeticoes": repeticoes, "carga": float(carga) if carga else None}
+    resp = await _retry(client.table("series").insert(payload))
+    db._invalidar(("series", "item", int(treino_item_id)))
+    return _primeira(resp, payload)
+
+async def excluir_series_do_item(treino_item_id: int):
+    client = await get_client()
+    await _retry(client.table("series").delete().eq("treino_item_id", treino_item_id))
+    db._invalidar(("series", "item", int(treino_item_id)))
+
+
+async def carregar_ficha(plano_id) -> list[dict]:
+    """Treinos → itens → exercício → séries do plano (mesmo formato de db.carregar_ficha)."""
+    client = await get_client()
+    resp = await _retry(client.table("treinos").select(db.SELECT_FICHA).eq("plano_id", plano_id).order("ordem"))
+    return db._montar_ficha(resp.data)
+
+
+# ── Paginação e contagens ──────────────────────────────────────────────────
+
+async def _pagina(tabela, ordem, colunas, padrao, apos, page_size, filtros=(), funcao=None):
+    client = await get_client()
+    resp = await _retry(db._consulta_pagina(client, tabela, ordem, colunas, apos, page_size, filtros),
+                        funcao=funcao)
+    return db._fim_pagina(resp, ordem, colunas, padrao, page_size)
+
+async def pagina_alunos(apos=None, page_size=50, apenas_ativos=True, colunas=COLS_ALUNO):
+    filtros = [("ativo", True)] if apenas_ativos else []
+    return await _pagina("alunos", db.ORDEM_ALUNOS, colunas, COLS_ALUNO, apos, page_size, filtros,
+                         "pagina_alunos")
+
+async def pagina_exercicios(apos=None, page_size=100, colunas=COLS_EXERCICIO):
+    return await _pagina("exercicios", db.ORDEM_EXERCICIOS, colunas, COLS_EXERCICIO, apos, page_size,
+                         funcao="pagina_exercicios")
+
+async def pagina_planos(apos=None, page_size=50, aluno_id=None, colunas=COLS_PLANO):
+    filtros = [("aluno_id", aluno_id)] if aluno_id else []
+    return await _pagina("planos", db.ORDEM_PLANOS, colunas, COLS_PLANO, apos, page_size, filtros,
+                         "pagina_planos")
+
+
+async def _iterar(pagina, **kw):
+    cursor = None
+    while True:
+        df, cursor = await pagina(apos=cursor, **kw)
+        if not df.empty:
+            yield df
+        if cursor is None:
+            return
+
+def iter_alunos(page_size=500, apenas_ativos=True, colunas=COLS_ALUNO):
+    """Páginas (DataFrame) de alunos em ordem de nome: `async for df in ...`."""
+    return _iterar(pagina_alunos, page_size=page_size, apenas_ativos=apenas_ativos, colunas=colunas)
+
+def iter_exercicios(page_size=500, colunas=COLS_EXERCICIO):
+    return _iterar(pagina_exercicios, page_size=page_size, colunas=colunas)
+
+def iter_planos(page_size=500, aluno_id=None, colunas=COLS_PLANO):
+    return _iterar(pagina_planos, page_size=page_size, aluno_id=aluno_id, colunas=colunas)
+
+
+async def contar_alunos(apenas_ativos=True) -> int:
+    client = await get_client()
+    q = client.table("alunos").select("id", count="exact", head=True)
+    if apenas_ativos:
+        q = q.eq("ativo", True)
+    return (await _retry(q)).count or 0
+
+async def contar_planos(aluno_id=None) -> int:
+    client = await get_client()
+    q = client.table("planos").select("id", count="exact", head=True)
+    if aluno_id:
+        q = q.eq("aluno_id", aluno_id)
+    return (await _retry(q)).count or 0
+
+
+# ── Inserção em lote ───────────────────────────────────────────────────────
+
+async def bulk_insert(table, rows, chunk_size=500, upsert=False, on_conflict="",
+                      ignore_duplicates=False, concorrencia=4) -> list[dict]:
+    """Como db.bulk_insert, com até `concorrencia` lotes em voo ao mesmo tempo."""
+    client = await get_client()
+    rows = list(rows)
+
+    async def lote(parte):
+        if upsert:
+            q = client.table(table).upsert(parte, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+        else:
+            q = client.table(table).insert(parte)
+        return (await _retry(q, funcao="bulk_insert")).data or []
+
+    partes = await reunir(*(lote(rows[i:i + chunk_size]) for i in range(0, len(rows), chunk_size)),
+                          limite=concorrencia)
+    inseridas = [linha for parte in partes for linha in parte]
+    if rows:
+        db._invalidar(*db._tags_insercao(table, rows + inseridas))
+    return inseridas
+
+async def salvar_item_com_series(item: dict, series: list) -> dict:
+    """Item do treino + todas as séries em duas requisições (ver db.salvar_item_com_series)."""
+    novo = await salvar_item(**item)
+    linhas = []
+    for i, s in enumerate(series):
+        reps, carga = (s["repeticoes"], s.get("carga")) if isinstance(s, dict) else s
+        linhas.append({"treino_item_id": novo["id"], "numero": i + 1,
+                       "repeticoes": reps, "carga": float(carga) if carga else None})
+    novo["series"] = await bulk_insert("series", linhas)
+    return novo
+
+
+# ── Histórico ──────────────────────────────────────────────────────────────
+
+async def iniciar_treino(aluno_id, treino_id) -> dict:
+    client = await get_client()
+    payload = {"aluno_id": aluno_id, "treino_id": treino_id,
+               "data": str(date.today()), "iniciado_em": _agora()}
+    resp = await _retry(client.table("historico_treinos").insert(payload))
+    db._invalidar(("historico", "*"))
+    return _primeira(resp, payload)
+
+async def finalizar_treino(historico_id: int):
+    client = await get_client()
+    await _retry(client.table("historico_treinos").update({"finalizado_em": _agora()}).eq("id", historico_id))
+    db._invalidar(("historico", "*"))
+
+async def registrar_serie_executada(historico_treino_id, treino_item_id, serie_numero,
+                                    repeticoes_feitas=None, carga_usada=None) -> dict:
+    client = await get_client()
+    payload = {
+        "historico_treino_id": historico_treino_id,
+        "treino_item_id": treino_item_id,
+        "serie_numero": serie_numero,
+        "repeticoes_feitas": repeticoes_feitas,
+        "carga_usada": float(carga_usada) if carga_usada else None,
+        "executado_em": _agora(),
+    }
+    resp = await _retry(client.table("historico_series").insert(payload))
+    db._invalidar(("historico", "*"))
+    return _primeira(resp, payload)
+
+async def sincronizar_treinos_executados(linhas: list[dict]) -> list[dict]:
+    salvos = await bulk_insert("historico_treinos", linhas, upsert=True, on_conflict="id_cliente")
+    db._invalidar(("historico", "*"))
+    return salvos
+
+async def registrar_series_executadas(linhas: list[dict]) -> list[dict]:
+    for linha in linhas:
+        if linha.get("carga_usada") is not None:
+            linha["carga_usada"] = float(linha["carga_usada"]) or None
+    salvas = await bulk_insert("historico_series", linhas, upsert=True, on_conflict="id_cliente",
+                               ignore_duplicates=True)
+    db._invalidar(("historico", "*"))
+    return salvas
+
+async def listar_historico(aluno_id, limit=30) -> pd.DataFrame:
+    client = await get_client()
+    resp = await _retry(client.table("historico_treinos")
+                        .select("*, treinos(nome, descricao)")
+                        .eq("aluno_id", aluno_id).order("data", desc=True).limit(limit))
+    return db._historico_df(resp)
+
+
+async def _varrer(tabela, colunas, filtros=(), page_size=1000, apos=None, funcao=None):
+    cursor = apos
+    while True:
+        df, cursor = await _pagina(tabela, db.ORDEM_ID, colunas, colunas, cursor, page_size, filtros,
+                                   funcao)
+        if not df.empty:
+            yield df
+        if cursor is None:
+            return
+
+async def _varrer_em(tabela, colunas, coluna, ids, page_size=1000, apos=None, funcao=None):
+    ids = sorted({int(i) for i in ids})
+    for i in range(0, len(ids), db._FATIA_IN):
+        fatia = [(coluna, ids[i:i + db._FATIA_IN])]
+        async for df in _varrer(tabela, colunas, fatia, page_size, apos, funcao):
+            yield df
+
+def iter_historico_treinos(aluno_id=None, page_size=1000, colunas=COLS_HIST_TREINO):
+    filtros = [("aluno_id", aluno_id)] if aluno_id else []
+    return _varrer("historico_treinos", colunas, filtros, page_size, funcao="iter_historico_treinos")
+
+def iter_historico_series(historico_ids=None, page_size=1000, colunas=COLS_HIST_SERIE, apos_id=None):
+    apos = (apos_id,) if apos_id is not None else None
+    if historico_ids is None:
+        return _varrer("historico_series", colunas, page_size=page_size, apos=apos,
+                       funcao="iter_historico_series")
+    return _varrer_em("historico_series", colunas, "historico_treino_id", historico_ids, page_size, apos,
+                      "iter_historico_series")
+
+async def mapa_itens_exercicio(item_ids) -> pd.DataFrame:
+    varredura = _varrer_em("treino_itens", "id, exercicio_id", "id", item_ids, funcao="mapa_itens_exercicio")
+    partes = [df async for df in varredura]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=["id", "exercicio_id"])
+
+
+# ── Progresso (agregados) ──────────────────────────────────────────────────
+
+async def iter_progresso_semanal(aluno_id, page_size=1000, colunas=COLS_PROGRESSO):
+    client = await get_client()
+    cursor = None
+    while True:
+        linhas = (await _retry(db._consulta_progresso(client, aluno_id, cursor, page_size, colunas))).data or []
+        if linhas:
+            yield pd.DataFrame(linhas)
+        if len(linhas) < page_size:
+            return
+        cursor = tuple(linhas[-1][c] for c, _ in db.ORDEM_PROGRESSO)
+
+async def recalcular_progresso():
+    client = await get_client()
+    await _retry(client.rpc("recalcular_progresso", {}))
+    db._invalidar(("historico", "*"))
@@ -0,0 +1,701 @@
+"""
+gymflow/db_local.py — Backend SQLite embutido (mesmo esquema do Supabase)
+
+Implementa o pedaço da API de consulta do PostgREST que o db.py usa
+(table().select().eq().order()...execute(), insert/upsert/update/delete, rpc),
+incluindo recursos embutidos como "*, exercicios(nome, grupo)". Serve para
+rodar o app, testes e benchmarks offline, ou como instalação de um nó só.
+"""
+from __future__ import annotations
+import re
+import sqlite3
+import threading
+from postgrest.exceptions import APIError
+
+SCHEMA = """
+create table if not exists alunos (
+    id integer primary key,
+    nome text not null,
+    email text,
+    telefone text,
+    ativo boolean not null default 1,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists alunos_nome_idx on alunos(nome);
+
+create table if not exists exercicios (
+    id integer primary key,
+    nome text not null unique,
+    grupo text,
+    descricao text,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists exercicios_grupo_nome_idx on exercicios(grupo, nome);
+
+create table if not exists planos (
+    id integer primary key,
+    aluno_id integer not null references alunos(id),
+    nome text not null,
+    mes text not null,
+    ativo boolean not null default 1,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists planos_aluno_id_idx on planos(aluno_id);
+create index if not exists planos_mes_idx on planos(mes);
+
+create table if not exists modelos (
+    id integer primary key,
+    nome text not null unique,
+    descricao text,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+create table if not exists modelo_itens (
+    id integer primary key,
+    modelo_id integer not null references modelos(id) on delete cascade,
+    exercicio_id integer not null references exercicios(id),
+    ordem integer not null default 0,
+    tipo_serie text not null default 'linear',
+    descanso_seg integer,
+    combinado_com integer references modelo_itens(id) on delete set null,
+    observacao text
+);
+create index if not exists modelo_itens_modelo_id_idx on modelo_itens(modelo_id);
+create index if not exists modelo_itens_exercicio_id_idx on modelo_itens(exercicio_id);
+create index if not exists modelo_itens_combinado_com_idx on modelo_itens(combinado_com);
+
+create table if not exists modelo_series (
+    id integer primary key,
+    modelo_item_id integer not null references modelo_itens(id) on delete cascade,
+    numero integer not null,
+    repeticoes integer,
+    carga real
+);
+create index if not exists modelo_series_modelo_item_id_idx on modelo_series(modelo_item_id);
+
+create table if not exists treinos (
+    id integer primary key,
+    plano_id integer not null references planos(id) on delete cascade,
+    nome text not null,
+    descricao text,
+    ordem integer not null default 0,
+    modelo_id integer references modelos(id),
+    personalizado boolean not null default 0,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists treinos_plano_id_idx on treinos(plano_id);
+create index if not exists treinos_modelo_id_idx on treinos(modelo_id);
+
+create table if not exists treino_itens (
+    id integer primary key,
+    treino_id integer not null references treinos(id) on delete cascade,
+    exercicio_id integer not null references exercicios(id),
+    ordem integer not null default 0,
+    tipo_serie text not null default 'linear',
+    descanso_seg integer,
+    combinado_com integer references treino_itens(id) on delete set null,
+    observacao text,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists treino_itens_treino_id_idx on treino_itens(treino_id);
+create index if not exists treino_itens_exercicio_id_idx on treino_itens(exercicio_id);
+create index if not exists treino_itens_combinado_com_idx on treino_itens(combinado_com);
+
+create table if not exists series (
+    id integer primary key,
+    treino_item_id integer not null references treino_itens(id) on delete cascade,
+    numero integer not null,
+    repeticoes integer,
+    carga real,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists series_treino_item_id_idx on series(treino_item_id);
+
+create table if not exists historico_treinos (
+    id integer primary key,
+    aluno_id integer not null references alunos(id),
+    treino_id integer references treinos(id) on delete set null,
+    data text not null,
+    iniciado_em text,
+    finalizado_em text,
+    id_cliente text unique,
+    created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+create index if not exists historico_treinos_aluno_data_idx on historico_treinos(aluno_id, data);
+create index if not exists historico_treinos_treino_id_idx on historico_treinos(treino_id);
+
+create table if not exists historico_series (
+    id integer primary key,
+    historico_treino_id integer not null references historico_treinos(id) on delete cascade,
+    treino_item_id integer references treino_itens(id) on delete set null,
+    exercicio_id integer references exercicios(id),
+    serie_numero integer not null,
+    repeticoes_feitas integer,
+    carga_usada real,
+    executado_em text,
+    id_cliente text unique
+);
+create index if not exists historico_series_historico_idx on historico_series(historico_treino_id);
+create index if not exists historico_series_treino_item_id_idx on historico_series(treino_item_id);
+create index if not exists historico_series_exercicio_id_idx on historico_series(exercicio_id);
+
+create table if not exists progresso_diario (
+    aluno_id integer not null references alunos(id) on delete cascade,
+    exercicio_id integer not null references exercicios(id) on delete cascade,
+    dia text not null,
+    series integer not null default 0,
+    reps integer not null default 0,
+    volume real not null default 0,
+    carga_max real,
+    e1rm_max real,
+    primary key (aluno_id, exercicio_id, dia)
+);
+create index if not exists progresso_diario_exercicio_idx on progresso_diario(exercicio_id);
+
+create table if not exists progresso_semanal (
+    aluno_id integer not null references alunos(id) on delete cascade,
+    exercicio_id integer not null references exercicios(id) on delete cascade,
+    semana text not null,
+    series integer not null default 0,
+    reps integer not null default 0,
+    volume real not null default 0,
+    carga_max real,
+    e1rm_max real,
+    primary key (aluno_id, exercicio_id, semana)
+);
+create index if not exists progresso_semanal_aluno_semana_idx on progresso_semanal(aluno_id, semana);
+create index if not exists progresso_semanal_exercicio_idx on progresso_semanal(exercicio_id);
+"""
+
+# Equivalente por linha do gatilho acumular_progresso do Supabase
+# (supabase/migrations/20261018000002_progresso_rollups.sql; exercicio_id da série em 20261018000000)
+_PROGRESSO_SELECT = """
+    select ht.aluno_id, hs.exercicio_id, {periodo},
+           count(*), sum(coalesce(hs.repeticoes_feitas, 0)),
+           sum(coalesce(hs.repeticoes_feitas, 0) * coalesce(hs.carga_usada, 0)),
+           max(coalesce(hs.carga_usada, 0)),
+           max(case when hs.repeticoes_feitas > 0 and hs.carga_usada > 0 then
+                    case when hs.repeticoes_feitas = 1 then hs.carga_usada
+                         else hs.carga_usada * (1 + hs.repeticoes_feitas / 30.0) end end)
+    from historico_series hs
+    join historico_treinos ht on ht.id = hs.historico_treino_id
+    where hs.exercicio_id is not null and ({filtro})
+    group by 1, 2, 3
+"""
+_SEMANA = "date(ht.data, 'weekday 0', '-6 days')"
+_PROGRESSO_UPSERT = """
+    insert into {tabela} (aluno_id, exercicio_id, {coluna}, series, reps, volume, carga_max, e1rm_max)
+    {select}
+    on conflict (aluno_id, exercicio_id, {coluna}) do update set
+        series = series + excluded.series,
+        reps = reps + excluded.reps,
+        volume = volume + excluded.volume,
+        carga_max = max(coalesce(carga_max, excluded.carga_max), coalesce(excluded.carga_max, carga_max)),
+        e1rm_max = max(coalesce(e1rm_max, excluded.e1rm_max), coalesce(excluded.e1rm_max, e1rm_max));
+"""
+
+
+def _sql_progresso(filtro) -> str:
+    return "".join(
+        _PROGRESSO_UPSERT.format(tabela=tabela, coluna=coluna,
+                                 select=_PROGRESSO_SELECT.format(periodo=periodo, filtro=filtro))
+        for tabela, coluna, periodo in (("progresso_diario", "dia", "ht.data"),
+                                        ("progresso_semanal", "semana", _SEMANA)))
+
+
+# O exercício vem do item antes do progresso (num gatilho só: a ordem entre
+# gatilhos do SQLite não é garantida). Recriado a cada abertura do arquivo.
+_PREENCHER_EXERCICIO = """
+    update historico_series set exercicio_id = (select exercicio_id from treino_itens where id = {item})
+    where {filtro} and exercicio_id is null and treino_item_id is not null
+"""
+
+GATILHOS = f"""
+drop trigger if exists historico_series_progresso;
+create trigger historico_series_progresso after insert on historico_series
+begin
+{_PREENCHER_EXERCICIO.format(item="new.treino_item_id", filtro="id = new.id")};
+{_sql_progresso("hs.id = new.id")}
+end;
+"""
+
+
+def _preencher_exercicio(conn):
+    """exercicio_id das séries gravadas sem ele (arquivos antigos, restauração de backup antigo)."""
+    conn.execute(_PREENCHER_EXERCICIO.format(item="historico_series.treino_item_id", filtro="true"))
+
+
+def _recalcular_progresso(conn):
+    conn.execute("delete from progresso_diario")
+    conn.execute("delete from progresso_semanal")
+    for sql in _sql_progresso("true").split(";"):
+        if sql.strip():
+            conn.execute(sql)
+
+
+# Colunas acrescentadas depois da criação (arquivos SQLite antigos): tabela, coluna, definição
+COLUNAS_NOVAS = [
+    ("treinos", "modelo_id", "integer references modelos(id)"),
+    ("treinos", "personalizado", "boolean not null default 0"),
+    ("historico_series", "exercicio_id", "integer references exercicios(id)"),
+]
+
+
+def _migrar(conn):
+    for tabela, coluna, definicao in COLUNAS_NOVAS:
+        existentes = {r[1] for r in conn.execute(f'pragma table_info("{tabela}")')}
+        if existentes and coluna not in existentes:
+            conn.execute(f'alter table "{tabela}" add column "{coluna}" {definicao}')
+            if (tabela, coluna) == ("historico_series", "exercicio_id"):
+                _preencher_exercicio(conn)
+                _recalcular_progresso(conn)
+
+
+# Equivalentes de clonar_plano / virar_mes / materializar_treino
+# (supabase/migrations/20261018000003_clonar_plano.sql e 20261018000004_modelos_treino.sql)
+
+def _copiar_itens(conn, itens, treino_id, series_de):
+    """Insere `itens` em treino_itens de `treino_id` com os pares remapeados; devolve o mapa velho → novo."""
+    mapa, pares = {}, []
+    for i in itens:
+        mapa[i["id"]] = conn.execute(
+            "insert into treino_itens (treino_id, exercicio_id, ordem, tipo_serie, descanso_seg, observacao) "
+            "values (?,?,?,?,?,?) returning id",
+            (treino_id, i["exercicio_id"], i["ordem"], i["tipo_serie"], i["descanso_seg"],
+             i["observacao"])).fetchone()[0]
+        if i["combinado_com"] is not None:
+            pares.append((i["id"], i["combinado_com"]))
+        conn.execute("insert into series (treino_item_id, numero, repeticoes, carga) "
+                     f"select ?, numero, repeticoes, carga from {series_de} = ?", (mapa[i["id"]], i["id"]))
+    conn.executemany("update treino_itens set combinado_com = ? where id = ?",
+                     [(mapa.get(par), mapa[item]) for item, par in pares])
+    return mapa
+
+
+def _clonar_plano(conn, p_plano_id, p_mes, p_nome=None, p_aluno_ids=None):
+    origem = conn.execute("select * from planos where id = ?", (p_plano_id,)).fetchone()
+    if origem is None:
+        raise APIError({"message": f"plano {p_plano_id} não existe", "code": "P0002",
+                        "hint": None, "details": None})
+    treinos = conn.execute("select * from treinos where plano_id = ? order by id", (p_plano_id,)).fetchall()
+    # Treino ainda fiel ao modelo é copiado só como vínculo
+    itens = {t["id"]: [] if t["modelo_id"] is not None and not t["personalizado"] else
+             conn.execute("select * from treino_itens where treino_id = ? order by id", (t["id"],)).fetchall()
+             for t in treinos}
+    # O par de um bi-set pode estar em outro treino do plano: todos os itens primeiro, pares por último
+    todos = {i["id"] for lista in itens.values() for i in lista}
+    novos = []
+    for aluno_id in p_aluno_ids or [origem["aluno_id"]]:
+        plano = conn.execute("insert into planos (aluno_id, nome, mes, ativo) values (?,?,?,1) returning *",
+                             (aluno_id, p_nome or origem["nome"], p_mes)).fetchone()
+        mapa = {}
+        for t in treinos:
+            treino_id = conn.execute(
+                "insert into treinos (plano_id, nome, descricao, ordem, modelo_id, personalizado) "
+                "values (?,?,?,?,?,?) returning id",
+                (plano["id"], t["nome"], t["descricao"], t["ordem"], t["modelo_id"], t["personalizado"])).fetchone()[0]
+            mapa.update(_copiar_itens(conn, [{**dict(i), "combinado_com": None} for i in itens[t["id"]]],
+                                      treino_id, "series where treino_item_id"))
+        conn.executemany("update treino_itens set combinado_com = ? where id = ?",
+                         [(mapa[i["combinado_com"]], mapa[i["id"]]) for lista in itens.values() for i in lista
+                          if i["combinado_com"] in todos])
+        novos.append(dict(plano))
+    return novos
+
+
+def _materializar_treino(conn, p_treino_id, p_personalizar=False):
+    alvo = conn.execute("select * from treinos where id = ?", (p_treino_id,)).fetchone()
+    if alvo is None:
+        raise APIError({"message": f"treino {p_treino_id} não existe", "code": "P0002",
+                        "hint": None, "details": None})
+    if p_personalizar and not alvo["personalizado"]:
+        conn.execute("update treinos set personalizado = 1 where id = ?", (p_treino_id,))
+    if alvo["modelo_id"] is None or alvo["personalizado"] or conn.execute(
+            "select 1 from treino_itens where treino_id = ? limit 1", (p_treino_id,)).fetchone():
+        return []
+    itens = conn.execute("select * from modelo_itens where modelo_id = ? order by id", (alvo["modelo_id"],)).fetchall()
+    mapa = _copiar_itens(conn, itens, p_treino_id, "modelo_series where modelo_item_id")
+    return [{"modelo_item_id": velho, "treino_item_id": novo} for velho, novo in mapa.items()]
+
+
+def _virar_mes(conn, p_mes_origem, p_mes_destino, p_nome=None):
+    origens = conn.execute(
+        "select max(p.id) from planos p join alunos a on a.id = p.aluno_id "
+        "where p.mes = ? and a.ativo and not exists "
+        "  (select 1 from planos d where d.aluno_id = p.aluno_id and d.mes = ?) "
+        "group by p.aluno_id order by p.aluno_id", (p_mes_origem, p_mes_destino)).fetchall()
+    return [p for (origem,) in origens for p in _clonar_plano(conn, origem, p_mes_destino, p_nome)]
+
+sqlite3.register_converter("boolean", lambda b: b not in (b"0", b""))
+
+_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+        "like": "like", "ilike": "like"}
+
+
+class Resposta:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _erro(e: sqlite3.Error) -> APIError:
+    """Traduz o erro do SQLite para o APIError que o cliente Supabase levantaria."""
+    msg = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        code = "23505" if "UNIQUE" in msg else "23503" if "FOREIGN KEY" in msg else "23502"
+    elif "locked" in msg or "busy" in msg:
+        code = "55P03"
+    else:
+        code = "42703" if "no such column" in msg else "42P01" if "no such table" in msg else "XX000"
+    return APIError({"message": msg, "code": code, "hint": None, "details": None})
+
+
+def _dividir(sel: str) -> list[str]:
+    """Separa "a, b(c, d), e" nas vírgulas de nível zero (respeitando "aspas")."""
+    partes, nivel, atual, aspas, escape = [], 0, "", False, False
+    for ch in sel:
+        if escape:
+            escape = False
+        elif ch == "\\" and aspas:
+            escape = True
+        elif ch == '"':
+            aspas = not aspas
+        elif not aspas and ch == "," and nivel == 0:
+            partes.append(atual.strip())
+            atual = ""
+            continue
+        elif not aspas:
+            nivel += ch == "("
+            nivel -= ch == ")"
+        atual += ch
+    if atual.strip():
+        partes.append(atual.strip())
+    return partes
+
+
+def _valor(v: str):
+    if len(v) >= 2 and v[0] == v[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", v[1:-1])
+    return {"true": 1, "false": 0}.get(v, v)
+
+
+def _expr_sql(expr: str, juncao=" or ") -> tuple[str, list]:
+    """Traduz o filtro or=(...) do PostgREST, ex. 'nome.gt."Ana",and(nome.eq."Ana",id.gt.3)'."""
+    sql, args = [], []
+    for termo in _dividir(expr):
+        m = re.fullmatch(r"(and|or)\((.*)\)", termo, re.S)
+        if m:
+            s, a = _expr_sql(m.group(2), " and " if m.group(1) == "and" else " or ")
+            sql.append(f"({s})")
+            args.extend(a)
+            continue
+        col, op, valor = termo.split(".", 2)
+        if op == "is":
+            sql.append(f'"{col}" is ' + {"null": "null", "true": "1", "false": "0"}[valor])
+        elif op in ("like", "ilike"):
+            sql.append(f'lower("{col}") like lower(?)' if op == "ilike" else f'"{col}" like ?')
+            args.append(str(_valor(valor)).replace("*", "%"))
+        else:
+            sql.append(f'"{col}" {_OPS[op]} ?')
+            args.append(_valor(valor))
+    return juncao.join(sql), args
+
+
+def _parse_select(sel: str) -> tuple[list[str], list[tuple[str, str]]]:
+    """Colunas simples e recursos embutidos ("tabela", "subselect") de um select."""
+    colunas, embutidos = [], []
+    for parte in _dividir(sel or "*"):
+        m = re.fullmatch(r"([\w]+)(?:!\w+)?\s*\((.*)\)", parte, re.S)
+        if m:
+            embutidos.append((m.group(1), m.group(2)))
+        else:
+            colunas.append(parte)
+    return colunas or ["*"], embutidos
+
+
+class Consulta:
+    """Builder encadeável no formato do postgrest-py; `execute()` roda no SQLite."""
+
+    def __init__(self, client: "LocalClient", tabela: str):
+        self.client = client
+        self.tabela = tabela
+        self.op = "select"
+        self.sel = "*"
+        self.payload = None
+        self.on_conflict = ""
+        self.ignorar_duplicados = False
+        self.contar = self.cabecalho = None
+        self.filtros: list[tuple[str, str, object]] = []
+        self.ordens: dict[str | None, list[tuple[str, bool, bool | None]]] = {}
+        self.limites: dict[str | None, int] = {}
+        self.offsets: dict[str | None, int] = {}
+
+    # ── verbos ─────────────────────────────────────────────────────────────
+    def select(self, *colunas, count=None, head=None):
+        self.sel = ",".join(colunas) if colunas else "*"
+        self.contar, self.cabecalho = count, head
+        return self
+
+    def insert(self, payload, **_):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="", ignore_duplicates=False, **_):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        self.ignorar_duplicados = ignore_duplicates
+        return self
+
+    def update(self, payload, **_):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self, **_):
+        self.op = "delete"
+        return self
+
+    # ── filtros e modificadores ────────────────────────────────────────────
+    def _filtro(self, op, col, valor):
+        self.filtros.append((op, col, valor))
+        return self
+
+    def eq(self, col, valor): return self._filtro("eq", col, valor)
+    def neq(self, col, valor): return self._filtro("neq", col, valor)
+    def gt(self, col, valor): return self._filtro("gt", col, valor)
+    def gte(self, col, valor): return self._filtro("gte", col, valor)
+    def lt(self, col, valor): return self._filtro("lt", col, valor)
+    def lte(self, col, valor): return self._filtro("lte", col, valor)
+    def like(self, col, valor): return self._filtro("like", col, valor)
+    def ilike(self, col, valor): return self._filtro("ilike", col, valor)
+    def in_(self, col, valores): return self._filtro("in", col, list(valores))
+    def is_(self, col, valor): return self._filtro("is", col, valor)
+    def or_(self, expr, reference_table=None): return self._filtro("or", None, expr)
+
+    def order(self, col, *, desc=False, nullsfirst=None, foreign_table=None):
+        self.ordens.setdefault(foreign_table, []).append((col, desc, nullsfirst))
+        return self
+
+    def limit(self, n, *, foreign_table=None):
+        self.limites[foreign_table] = n
+        return self
+
+    def offset(self, n):
+        self.offsets[None] = n
+        return self
+
+    def range(self, inicio, fim, foreign_table=None):
+        self.offsets[foreign_table] = inicio
+        self.limites[foreign_table] = fim - inicio + 1
+        return self
+
+    # ── execução ───────────────────────────────────────────────────────────
+    def _where(self):
+        sql, args = [], []
+        for op, col, valor in self.filtros:
+            if op == "or":
+                s, a = _expr_sql(valor)
+                sql.append(f"({s})")
+                args.extend(a)
+            elif op == "in":
+                if not valor:
+                    sql.append("0")
+                    continue
+                sql.append(f'"{col}" in ({",".join("?" * len(valor))})')
+                args.extend(valor)
+            elif op == "is":
+                sql.append(f'"{col}" is {"null" if valor in (None, "null") else "?"}')
+                if valor not in (None, "null"):
+                    args.append(valor in (True, "true"))
+            elif op == "ilike":
+                sql.append(f'lower("{col}") like lower(?)')
+                args.append(str(valor).replace("*", "%"))
+            else:
+                sql.append(f'"{col}" {_OPS[op]} ?')
+                args.append(str(valor).replace("*", "%") if op == "like" else valor)
+        return (" where " + " and ".join(sql)) if sql else "", args
+
+    def execute(self) -> Resposta:
+        with self.client._lock:
+            try:
+                with self.client.conn:
+                    total = None
+                    if self.contar and self.op == "select":
+                        where, args = self._where()
+                        total = self.client.conn.execute(
+                            f'select count(*) from "{self.tabela}"{where}', args).fetchone()[0]
+                        if self.cabecalho:
+                            return Resposta([], total)
+                    return Resposta(getattr(self, f"_{self.op}")(), total)
+            except sqlite3.Error as e:
+                raise _erro(e) from e
+
+    def _select(self):
+        conn = self.client.conn
+        colunas, embutidos = _parse_select(self.sel)
+        where, args = self._where()
+        sql = f'select * from "{self.tabela}"{where}{_order_sql(self.ordens.get(None))}'
+        if None in self.limites or None in self.offsets:
+            sql += f" limit {int(self.limites.get(None, -1))} offset {int(self.offsets.get(None, 0))}"
+        linhas = [dict(r) for r in conn.execute(sql, args)]
+        self.client._embutir(self.tabela, linhas, embutidos, self, prefixo="")
+        return [_projetar(r, colunas, embutidos) for r in linhas]
+
+    def _linhas(self):
+        return self.payload if isinstance(self.payload, list) else [self.payload]
+
+    def _insert(self):
+        conn = self.client.conn
+        saida = []
+        for row in self._linhas():
+            cols = list(row)
+            sql = (f'insert into "{self.tabela}" ({_cols(cols)}) values ({",".join("?" * len(cols))}) returning *'
+                   if cols else f'insert into "{self.tabela}" default values returning *')
+            saida.append(dict(conn.execute(sql, [row[c] for c in cols]).fetchone()))
+        return saida
+
+    def _upsert(self):
+        conn = self.client.conn
+        alvo = [c.strip() for c in (self.on_conflict or "id").split(",")]
+        saida = []
+        for row in self._linhas():
+            cols = list(row)
+            atualizar = [c for c in cols if c not in alvo]
+            acao = ("do nothing" if self.ignorar_duplicados or not atualizar else
+                    "do update set " + ",".join(f'"{c}"=excluded."{c}"' for c in atualizar))
+            sql = (f'insert into "{self.tabela}" ({_cols(cols)}) values ({",".join("?" * len(cols))}) '
+                   f'on conflict ({_cols(alvo)}) {acao} returning *')
+            r = conn.execute(sql, [row[c] for c in cols]).fetchone()
+            if r is not None:
+                saida.append(dict(r))
+        return saida
+
+    def _update(self):
+        where, args = self._where()
+        cols = list(self.payload)
+        sets = ",".join(f'"{c}"=?' for c in cols)
+        sql = f'update "{self.tabela}" set {sets}{where} returning *'
+        return [dict(r) for r in self.client.conn.execute(sql, [self.payload[c] for c in cols] + args)]
+
+    def _delete(self):
+        where, args = self._where()
+        return [dict(r) for r in self.client.conn.execute(f'delete from "{self.tabela}"{where} returning *', args)]
+
+
+def _cols(cols) -> str:
+    return ",".join(f'"{c}"' for c in cols)
+
+
+def _order_sql(ordens) -> str:
+    if not ordens:
+        return ""
+    partes = []
+    for col, desc, nullsfirst in ordens:
+        p = f'"{col}" {"desc" if desc else "asc"}'
+        if nullsfirst is not None:
+            p += " nulls first" if nullsfirst else " nulls last"
+        partes.append(p)
+    return " order by " + ", ".join(partes)
+
+
+def _projetar(row: dict, colunas: list[str], embutidos) -> dict:
+    if "*" in colunas:
+        return row
+    manter = set(colunas) | {nome for nome, _ in embutidos}
+    return {k: v for k, v in row.items() if k in manter}
+
+
+class RPC:
+    def __init__(self, client: "LocalClient", nome: str, params: dict):
+        self.client = client
+        self.tabela = f"rpc/{nome}"
+        self.nome = nome
+        self.params = params or {}
+
+    def execute(self) -> Resposta:
+        fn = self.client._rpcs.get(self.nome)
+        if fn is None:
+            raise APIError({"message": f"função {self.nome} não existe", "code": "PGRST202",
+                            "hint": None, "details": None})
+        with self.client._lock:
+            try:
+                with self.client.conn:
+                    return Resposta(fn(self.client.conn, **self.params))
+            except sqlite3.Error as e:
+                raise _erro(e) from e
+
+
+class LocalClient:
+    """Cliente SQLite com a mesma superfície que o db.py usa do cliente Supabase."""
+
+    def __init__(self, caminho: str = ":memory:"):
+        self.caminho = caminho
+        self.conn = sqlite3.connect(caminho, check_same_thread=False,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("pragma foreign_keys = on")
+        if caminho != ":memory:":
+            self.conn.execute("pragma journal_mode = wal")
+            self.conn.execute("pragma synchronous = normal")
+        _migrar(self.conn)
+        self.conn.executescript(SCHEMA + GATILHOS)
+        self._lock = threading.RLock()
+        self._rpcs: dict = {"recalcular_progresso": _recalcular_progresso,
+                            "clonar_plano": _clonar_plano, "virar_mes": _virar_mes,
+                            "materializar_treino": _materializar_treino}
+        self._fks = self._carregar_fks()
+
+    def table(self, nome: str) -> Consulta:
+        return Consulta(self, nome)
+
+    def from_(self, nome: str) -> Consulta:
+        return Consulta(self, nome)
+
+    def rpc(self, nome: str, params: dict | None = None) -> RPC:
+        return RPC(self, nome, params)
+
+    def registrar_rpc(self, nome: str, fn):
+        """Registra `fn(conn, **params)` como equivalente local de uma função SQL do Supabase."""
+        self._rpcs[nome] = fn
+
+    # ── embutidos ──────────────────────────────────────────────────────────
+    def _carregar_fks(self) -> dict:
+        fks = {}
+        tabelas = [r[0] for r in self.conn.execute("select name from sqlite_master where type='table'")]
+        for t in tabelas:
+            fks[t] = [(r["from"], r["table"], r["to"] or "id")
+                      for r in self.conn.execute(f'pragma foreign_key_list("{t}")')]
+        return fks
+
+    def _relacao(self, pai: str, filho: str):
+        """("um", col_pai, col_filho) se pai → filho é N:1, ("muitos", ...) se 1:N."""
+        for col, alvo, col_alvo in self._fks.get(pai, []):
+            if alvo == filho:
+                return "um", col, col_alvo
+        for col, alvo, col_alvo in self._fks.get(filho, []):
+            if alvo == pai:
+                return "muitos", col_alvo, col
+        raise APIError({"message": f"sem relação entre {pai} e {filho}", "code": "PGRST200",
+                        "hint": None, "details": None})
+
+    def _embutir(self, tabela, linhas, embutidos, consulta: Consulta, prefixo: str):
+        """Resolve cada recurso embutido com uma consulta em lote (where col in (...))."""
+        for nome, sub in embutidos:
+            caminho = f"{prefixo}{nome}"
+            tipo, col_pai, col_filho = self._relacao(tabela, nome)
+            chaves = sorted({r[col_pai] for r in linhas if r.get(col_pai) is not None})
+            filhos = []
+            if chaves:
+                sql = (f'select * from "{nome}" where "{col_filho}" in ({",".join("?" * len(chaves))})'
+                       f'{_order_sql(consulta.ordens.get(caminho))}')
+                filhos = [dict(r) for r in self.conn.execute(sql, chaves)]
+            sub_cols, sub_emb = _parse_select(sub)
+            self._embutir(nome, filhos, sub_emb, consulta, prefixo=caminho + ".")
+            grupos: dict = {}
+            for f in filhos:
+                grupos.setdefault(f[col_filho], []).append(_projetar(f, sub_cols, sub_emb))
+            limite = consulta.limites.get(caminho)
+            for r in linhas:
+                achados = grupos.get(r.get(col_pai), [])
+                if tipo == "um":
+                    r[nome] = achados[0] if achados else None
+                else:
+                    r[nome] = achados[:limite] if limite is not None else achados
@@ -0,0 +1,353 @@
+"""
+gymflow/exportar.py — Exportação de todos os dados para Parquet/Arrow e restauração no SQLite local
+
+Cada tabela é lida em páginas por cursor de chave (db._consulta_pagina, sem
+OFFSET) e vai direto para arquivos particionados, com memória limitada ao
+grupo de linhas em escrita:
+
+    destino/<tabela>/lote=<AAAAMMDDTHHMMSS>/parte-00000.parquet
+    destino/_marcas.json          marca d'água por tabela (created_at, id)
+
+A exportação completa troca a pasta da tabela inteira (escreve ao lado e só
+então substitui). A incremental (--incremental) lê só o que veio depois da
+marca e acrescenta uma partição lote=...; linhas alteradas ou apagadas depois
+da marca não aparecem — para isso, uma completa.
+
+`restaurar` carrega as partições no SQLite do db_local numa transação, com as
+FKs e o gatilho de progresso desligados durante a carga (o progresso é
+recalculado uma vez no fim).
+
+    python exportar.py exportar backup/
+    python exportar.py exportar backup/ --incremental
+    python exportar.py exportar backup/ --tabelas historico_treinos,historico_series --formato arrow
+    python exportar.py restaurar backup/ --banco gymflow_local.db
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import db
+
+PAGINA = 5_000               # linhas por requisição
+LINHAS_POR_GRUPO = 100_000   # row group do Parquet / lote do Arrow (o que fica em memória)
+LINHAS_POR_ARQUIVO = 2_000_000
+MARCAS = "_marcas.json"
+
+_TS = pa.timestamp("us", tz="UTC")
+
+# Na ordem de restauração (pais antes dos filhos)
+ESQUEMAS = {
+    "alunos": pa.schema([("id", pa.int64()), ("nome", pa.string()), ("email", pa.string()),
+                         ("telefone", pa.string()), ("ativo", pa.bool_()), ("created_at", _TS)]),
+    "exercicios": pa.schema([("id", pa.int64()), ("nome", pa.string()), ("grupo", pa.string()),
+                             ("descricao", pa.string()), ("created_at", _TS)]),
+    "modelos": pa.schema([("id", pa.int64()), ("nome", pa.string()), ("descricao", pa.string()),
+                          ("created_at", _TS)]),
+    "modelo_itens": pa.schema([("id", pa.int64()), ("modelo_id", pa.int64()), ("exercicio_id", pa.int64()),
+                               ("ordem", pa.int32()), ("tipo_serie", pa.string()), ("descanso_seg", pa.int32()),
+                               ("combinado_com", pa.int64()), ("observacao", pa.string())]),
+    "modelo_series": pa.schema([("id", pa.int64()), ("modelo_item_id", pa.int64()), ("numero", pa.int32()),
+                                ("repeticoes", pa.int32()), ("carga", pa.float64())]),
+    "planos": pa.schema([("id", pa.int64()), ("aluno_id", pa.int64()), ("nome", pa.string()),
+                         ("mes", pa.string()), ("ativo", pa.bool_()), ("created_at", _TS)]),
+    "treinos": pa.schema([("id", pa.int64()), ("plano_id", pa.int64()), ("nome", pa.string()),
+                          ("descricao", pa.string()), ("ordem", pa.int32()), ("modelo_id", pa.int64()),
+                          ("personalizado", pa.bool_()), ("created_at", _TS)]),
+    "treino_itens": pa.schema([("id", pa.int64()), ("treino_id", pa.int64()), ("exercicio_id", pa.int64()),
+                               ("ordem", pa.int32()), ("tipo_serie", pa.string()), ("descanso_seg", pa.int32()),
+                               ("combinado_com", pa.int64()), ("observacao", pa.string()), ("created_at", _TS)]),
+    "series": pa.schema([("id", pa.int64()), ("treino_item_id", pa.int64()), ("numero", pa.int32()),
+                         ("repeticoes", pa.int32()), ("carga", pa.float64()), ("created_at", _TS)]),
+    "historico_treinos": pa.schema([("id", pa.int64()), ("aluno_id", pa.int64()), ("treino_id", pa.int64()),
+                                    ("data", pa.date32()), ("iniciado_em", _TS), ("finalizado_em", _TS),
+                                    ("id_cliente", pa.string()), ("created_at", _TS)]),
+    "historico_series": pa.schema([("id", pa.int64()), ("historico_treino_id", pa.int64()),
+                                   ("treino_item_id", pa.int64()), ("exercicio_id", pa.int64()),
+                                   ("serie_numero", pa.int32()),
+                                   ("repeticoes_feitas", pa.int32()), ("carga_usada", pa.float64()),
+                                   ("executado_em", _TS), ("id_cliente", pa.string())]),
+}
+TABELAS = list(ESQUEMAS)
+
+# Coluna da marca d'água. historico_series vai pelo id: executado_em é a hora do
+# aparelho e chega atrasada quando a fila offline descarrega (fila.py), então
+# uma série sincronizada depois da exportação ficaria antes da marca.
+MARCA = {t: "created_at" if "created_at" in e.names else "id" for t, e in ESQUEMAS.items()}
+MARCA["historico_series"] = "id"
+
+
+def _ordem(tabela):
+    coluna = MARCA[tabela]
+    return db.ORDEM_ID if coluna == "id" else ((coluna, False), ("id", False))
+
+
+def _arrow(linhas, esquema) -> pa.Table:
+    """Página (lista de dicts do PostgREST/db_local) → tabela Arrow no esquema fixo."""
+    colunas = []
+    for campo in esquema:
+        valores = pa.array([linha.get(campo.name) for linha in linhas])
+        colunas.append(valores if valores.type == campo.type else pc.cast(valores, campo.type))
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+# ── Escrita particionada ───────────────────────────────────────────────────
+
+class _Escritor:
+    """Acumula páginas até LINHAS_POR_GRUPO e grava; abre arquivo novo a cada LINHAS_POR_ARQUIVO."""
+
+    def __init__(self, pasta, esquema, formato):
+        self.pasta, self.esquema, self.formato = pasta, esquema, formato
+        self.pendentes, self.n_pendentes = [], 0
+        self.arquivo, self.no_arquivo, self.linhas = None, 0, 0
+        # Duas exportações no mesmo segundo caem no mesmo lote: continua a numeração
+        self.partes = len(os.listdir(pasta)) if os.path.isdir(pasta) else 0
+
+    def _abrir(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        caminho = os.path.join(self.pasta, f"parte-{self.partes:05d}.{self.formato}")
+        self.partes += 1
+        self.no_arquivo = 0
+        if self.formato == "parquet":
+            self.arquivo = pq.ParquetWriter(caminho, self.esquema, compression="zstd")
+        else:
+            self.arquivo = pa.ipc.new_file(caminho, self.esquema)
+
+    def escrever(self, tabela: pa.Table):
+        self.pendentes.append(tabela)
+        self.n_pendentes += tabela.num_rows
+        if self.n_pendentes >= LINHAS_POR_GRUPO:
+            self._descarregar()
+
+    def _descarregar(self):
+        if not self.n_pendentes:
+            return
+        if self.arquivo is None or self.no_arquivo >= LINHAS_POR_ARQUIVO:
+            self.fechar_arquivo()
+            self._abrir()
+        grupo = pa.concat_tables(self.pendentes).combine_chunks()
+        if self.formato == "parquet":
+            self.arquivo.write_table(grupo, row_group_size=len(grupo))
+        else:
+            self.arquivo.write_table(grupo, max_chunksize=len(grupo))
+        self.no_arquivo += len(grupo)
+        self.linhas += len(grupo)
+        self.pendentes, self.n_pendentes = [], 0
+
+    def fechar_arquivo(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+
+    def fechar(self) -> int:
+        self._descarregar()
+        self.fechar_arquivo()
+        return self.linhas
+
+
+def _ler_marcas(destino) -> dict:
+    caminho = os.path.join(destino, MARCAS)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _gravar_marcas(destino, marcas):
+    caminho = os.path.join(destino, MARCAS)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(marcas, f, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+# ── Exportação ─────────────────────────────────────────────────────────────
+
+def exportar_tabela(tabela, pasta, apos=None, formato="parquet", lote=None, pagina=PAGINA,
+                    progresso=None) -> dict:
+    """Grava `tabela` (ou só o que vem depois do cursor `apos`) em <pasta>/lote=<lote>/.
+
+    Devolve {"linhas", "cursor"}: cursor = (marca, id) da última linha, a marca
+    d'água da próxima incremental (o próprio `apos` se nada veio).
+    """
+    esquema, ordem = ESQUEMAS[tabela], _ordem(tabela)
+    lote = lote or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    escritor = _Escritor(os.path.join(pasta, f"lote={lote}"), esquema, formato)
+    cliente = db.get_client()
+    # A completa anda pela PK; a marca sai do maior (created_at, id) visto
+    leitura = ordem if apos is not None else db.ORDEM_ID
+    cursor = tuple(apos) if apos is not None else None
+    marca = cursor
+    try:
+        while True:
+            resp = db._retry(db._consulta_pagina(cliente, tabela, leitura, ", ".join(esquema.names),
+                                                 cursor, pagina))
+            linhas = resp.data or []
+            if linhas:
+                escritor.escrever(_arrow(linhas, esquema))
+                chaves = [tuple(l[c] for c, _ in ordem) for l in linhas]
+                maior = max((k for k in chaves if None not in k), default=None)
+                if maior is not None and (marca is None or maior > marca):
+                    marca = maior
+                if progresso:
+                    progresso(tabela, escritor.linhas + escritor.n_pendentes)
+            if len(linhas) < pagina:
+                break
+            cursor = tuple(linhas[-1][c] for c, _ in leitura)
+    finally:
+        n = escritor.fechar()
+    return {"linhas": n, "cursor": list(marca) if marca is not None else None}
+
+
+def exportar(destino, tabelas=None, incremental=False, formato="parquet", pagina=PAGINA, progresso=None) -> dict:
+    """Exporta `tabelas` (todas por padrão) para `destino`; devolve linhas gravadas por tabela.
+
+    incremental=True parte da marca d'água de cada tabela em _marcas.json (a
+    tabela ainda sem marca sai inteira).
+    """
+    tabelas = list(tabelas or TABELAS)
+    desconhecidas = [t for t in tabelas if t not in ESQUEMAS]
+    if desconhecidas:
+        raise ValueError(f"tabela desconhecida: {', '.join(desconhecidas)} (use {', '.join(TABELAS)})")
+    os.makedirs(destino, exist_ok=True)
+    marcas = _ler_marcas(destino)
+    lote = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    feitas = {}
+    for tabela in tabelas:
+        pasta = os.path.join(destino, tabela)
+        anterior = marcas.get(tabela) if incremental else None
+        if anterior is not None and anterior["formato"] != formato:
+            raise ValueError(f"{tabela} foi exportada como {anterior['formato']}; "
+                             "use o mesmo formato ou uma exportação completa")
+        if anterior is None:
+            # Completa: grava ao lado e só troca a pasta com tudo escrito
+            nova = pasta + ".nova"
+            shutil.rmtree(nova, ignore_errors=True)
+            r = exportar_tabela(tabela, nova, None, formato, lote, pagina, progresso)
+            shutil.rmtree(pasta, ignore_errors=True)
+            if os.path.exists(nova):
+                os.replace(nova, pasta)
+            total = r["linhas"]
+        else:
+            r = exportar_tabela(tabela, pasta, anterior["cursor"], formato, lote, pagina, progresso)
+            total = anterior["linhas"] + r["linhas"]
+        marcas[tabela] = {"coluna": MARCA[tabela], "cursor": r["cursor"], "formato": formato,
+                          "linhas": total, "ultimo_lote": lote}
+        _gravar_marcas(destino, marcas)
+        feitas[tabela] = r["linhas"]
+    return feitas
+
+
+# ── Restauração no SQLite local ────────────────────────────────────────────
+
+def _sqlite(coluna: pa.ChunkedArray) -> list:
+    """Coluna Arrow → valores no formato que o db_local grava (datas e horas em texto ISO)."""
+    if pa.types.is_timestamp(coluna.type):
+        # No Arrow o %S leva a fração na unidade do timestamp: em ms sai "05.123", o
+        # mesmo SS.SSS do %f do default de created_at no SQLite (ordena igual como texto)
+        coluna = pc.strftime(pc.cast(coluna, pa.timestamp("ms", tz="UTC"), safe=False),
+                             format="%Y-%m-%dT%H:%M:%SZ")
+    elif pa.types.is_date(coluna.type):
+        coluna = coluna.cast(pa.string())
+    return coluna.to_pylist()
+
+
+def restaurar(origem, caminho, tabelas=None, limpar=True, progresso=None) -> dict:
+    """Carrega as partições de `origem` no SQLite `caminho` (criado se faltar); devolve linhas por tabela.
+
+    limpar=True esvazia antes as tabelas restauradas, deixando o banco igual à
+    exportação. Linhas repetidas entre lotes (mesmo id) ficam com a última.
+    """
+    import db_local
+    tabelas = [t for t in TABELAS if t in (tabelas or TABELAS)]
+    formato = {t: m["formato"] for t, m in _ler_marcas(origem).items()}
+    cliente = db_local.LocalClient(caminho)
+    conn = cliente.conn
+    feitas = {}
+    conn.execute("pragma foreign_keys = off")  # só vale fora de transação
+    try:
+        with conn:
+            conn.execute("drop trigger if exists historico_series_progresso")
+            if limpar:
+                for tabela in reversed(tabelas):
+                    conn.execute(f'delete from "{tabela}"')
+            for tabela in tabelas:
+                pasta = os.path.join(origem, tabela)
+                feitas[tabela] = 0
+                if not os.path.isdir(pasta):
+                    continue
+                dados = ds.dataset(pasta, format="ipc" if formato.get(tabela) == "arrow" else "parquet",
+                                   partitioning="hive")
+                # Exportação de antes de uma coluna nova: carrega as que existem
+                nomes = [c for c in ESQUEMAS[tabela].names if c in dados.schema.names]
+                sql = (f'insert or replace into "{tabela}" ({", ".join(nomes)}) '
+                       f'values ({", ".join("?" * len(nomes))})')
+                for lote in dados.to_batches(columns=nomes, batch_size=LINHAS_POR_GRUPO):
+                    conn.executemany(sql, zip(*(_sqlite(lote.column(c)) for c in nomes)))
+                    feitas[tabela] += lote.num_rows
+                    if progresso:
+                        progresso(tabela, feitas[tabela])
+            # Sem o gatilho: exercício das séries e agregados de progresso de uma vez
+            db_local._preencher_exercicio(conn)
+            db_local._recalcular_progresso(conn)
+            # Checagem antes do commit: com filho órfão a carga inteira é desfeita
+            quebradas = conn.execute("pragma foreign_key_check").fetchall()
+            if quebradas:
+                raise ValueError(f"{len(quebradas)} linha(s) com chave estrangeira sem o pai "
+                                 f"(ex.: {quebradas[0][0]} → {quebradas[0][2]}); "
+                                 "restaure as tabelas pai junto")
+    finally:
+        conn.executescript(db_local.GATILHOS)
+        conn.execute("pragma foreign_keys = on")
+    conn.execute("analyze")
+    return feitas
+
+
+# ── Linha de comando ───────────────────────────────────────────────────────
+
+def _mostrar_progresso(tabela, linhas):
+    print(f"\r{tabela}: {linhas} linhas".ljust(40), end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="comando", required=True)
+    ex = sub.add_parser("exportar", help="banco → arquivos")
+    ex.add_argument("destino")
+    ex.add_argument("--incremental", action="store_true", help="só o que veio depois da última marca")
+    ex.add_argument("--tabelas", help=f"separadas por vírgula (padrão: {','.join(TABELAS)})")
+    ex.add_argument("--formato", choices=["parquet", "arrow"], default="parquet")
+    ex.add_argument("--pagina", type=int, default=PAGINA, help="linhas por requisição")
+    rs = sub.add_parser("restaurar", help="arquivos → SQLite local")
+    rs.add_argument("origem")
+    rs.add_argument("--banco", default=os.environ.get("GYMFLOW_SQLITE"), help="arquivo SQLite (padrão: GYMFLOW_SQLITE)")
+    rs.add_argument("--tabelas", help="separadas por vírgula (padrão: todas)")
+    rs.add_argument("--manter", action="store_true", help="não esvazia as tabelas antes")
+    args = ap.parse_args(argv)
+    tabelas = args.tabelas.split(",") if args.tabelas else None
+
+    t0 = time.perf_counter()
+    if args.comando == "exportar":
+        feitas = exportar(args.destino, tabelas, args.incremental, args.formato, args.pagina, _mostrar_progresso)
+    else:
+        if not args.banco:
+            ap.error("informe --banco ou GYMFLOW_SQLITE")
+        feitas = restaurar(args.origem, args.banco, tabelas, not args.manter, _mostrar_progresso)
+    print(file=sys.stderr)
+    for tabela, n in feitas.items():
+        print(f"  {tabela:<18} {n:>10} linhas")
+    print(f"{sum(feitas.values())} linhas em {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+gymflow/fila.py — Fila durável de escritas do app do aluno
+
+Cada treino iniciado / série marcada vai primeiro para um SQLite local (resposta
+instantânea, sobrevive a queda de rede e a reinício do app) e uma thread em
+segundo plano descarrega em lote para historico_treinos / historico_series.
+A linha só sai da fila depois que o banco confirmou; o id_cliente (uuid) faz o
+reenvio ser idempotente.
+
+Erro de rede / banco fora deixa tudo na fila. Linha que o banco recusa de vez
+(FK para um item já apagado, dado inválido) vai para `rejeitados` — o lote é
+repartido até isolá-la — e o resto da fila continua saindo; o app mostra as
+recusadas para reenviar ou descartar.
+"""
+import json, os, sqlite3, threading, uuid
+import time as time_module
+from datetime import date, datetime, timezone
+import httpx
+from postgrest.exceptions import APIError
+import db
+
+CAMINHO_PADRAO = os.environ.get("GYMFLOW_FILA", "gymflow_fila.db")
+
+SCHEMA = """
+create table if not exists pendentes (
+    seq integer primary key autoincrement,
+    tipo text not null,              -- 'treino' | 'serie'
+    sessao text not null,            -- id_cliente do historico_treinos
+    payload text not null,
+    criado_em real not null
+);
+create table if not exists sessoes (
+    id_cliente text primary key,
+    payload text not null,
+    historico_id integer
+);
+create table if not exists rejeitados (
+    seq integer primary key,         -- o mesmo de pendentes (reenviar volta na ordem)
+    tipo text not null,
+    sessao text not null,
+    payload text not null,
+    criado_em real not null,
+    erro text not null,
+    rejeitado_em real not null
+);
+"""
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _recusado(e: Exception) -> bool:
+    """O banco respondeu e recusou os dados: repetir não adianta."""
+    return isinstance(e, (APIError, httpx.HTTPStatusError)) and not db.RETRY_PADRAO.transitorio(e)
+
+
+class FilaEscrita:
+    """Fila local + descarga em lote. Uma instância por processo (o app guarda em st.cache_resource)."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO, lote=200, intervalo=5.0, teto_espera=60.0):
+        self.lote, self.intervalo, self.teto_espera = lote, intervalo, teto_espera
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        if caminho != ":memory:":
+            self.conn.execute("pragma journal_mode=wal")
+        self._lock = threading.RLock()
+        self._descarga = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self.ultimo_erro = None
+        self.ultima_sincronizacao = None
+        self._thread = None
+
+    # ── Escrita (caminho rápido, só SQLite local) ──────────────────────────
+
+    def _enfileirar(self, tipo, sessao, payload, urgente=False):
+        with self._lock, self.conn:
+            self.conn.execute("insert into pendentes (tipo, sessao, payload, criado_em) values (?,?,?,?)",
+                              (tipo, sessao, json.dumps(payload), time_module.time()))
+        if urgente:
+            self._acordar.set()   # senão a thread junta tudo que chegar em `intervalo`
+
+    def iniciar_treino(self, aluno_id, treino_id) -> str:
+        """Abre uma sessão de treino; devolve o id_cliente dela."""
+        sessao = str(uuid.uuid4())
+        payload = {"id_cliente": sessao, "aluno_id": int(aluno_id), "treino_id": int(treino_id),
+                   "data": str(date.today()), "iniciado_em": _agora()}
+        with self._lock, self.conn:
+            self.conn.execute("insert into sessoes (id_cliente, payload) values (?,?)",
+                              (sessao, json.dumps(payload)))
+        self._enfileirar("treino", sessao, payload)
+        return sessao
+
+    def registrar_serie(self, sessao, treino_item_id, serie_numero,
+                        repeticoes_feitas=None, carga_usada=None) -> str:
+        id_cliente = str(uuid.uuid4())
+        self._enfileirar("serie", sessao, {
+            "id_cliente": id_cliente,
+            "treino_item_id": int(treino_item_id),
+            "serie_numero": int(serie_numero),
+            "repeticoes_feitas": repeticoes_feitas,
+            "carga_usada": float(carga_usada) if carga_usada else None,
+            "executado_em": _agora(),
+        })
+        return id_cliente
+
+    def finalizar_treino(self, sessao):
+        with self._lock, self.conn:
+            linha = self.conn.execute("select payload from sessoes where id_cliente=?", (sessao,)).fetchone()
+            if linha is None:
+                raise KeyError(f"sessão desconhecida: {sessao}")
+            payload = {**json.loads(linha[0]), "finalizado_em": _agora()}
+            self.conn.execute("update sessoes set payload=? where id_cliente=?", (json.dumps(payload), sessao))
+        self._enfileirar("treino", sessao, payload, urgente=True)
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return self.conn.execute("select count(*) from pendentes").fetchone()[0]
+
+    def rejeitados(self) -> list[dict]:
+        """Linhas recusadas pelo banco (seq, tipo, sessao, payload, erro, rejeitado_em), da mais antiga."""
+        with self._lock:
+            linhas = self.conn.execute("select seq, tipo, sessao, payload, erro, rejeitado_em "
+                                       "from rejeitados order by seq").fetchall()
+        return [{"seq": seq, "tipo": tipo, "sessao": sessao, "payload": json.loads(payload),
+                 "erro": erro, "rejeitado_em": em} for seq, tipo, sessao, payload, erro, em in linhas]
+
+    def reenviar_rejeitados(self) -> int:
+        """Devolve as recusadas à fila (depois de corrigido o que o banco recusava)."""
+        with self._lock, self.conn:
+            self.conn.execute("insert into pendentes (seq, tipo, sessao, payload, criado_em) "
+                              "select seq, tipo, sessao, payload, criado_em from rejeitados")
+            n = self.conn.execute("delete from rejeitados").rowcount
+        self._acordar.set()
+        return n
+
+    def descartar_rejeitados(self) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute("delete from rejeitados").rowcount
+
+    # ── Descarga ───────────────────────────────────────────────────────────
+
+    def _enviar(self, enviar, itens):
+        """Manda [(chave, linha)] com `enviar`; devolve (salvas, {chave: erro} das recusadas).
+
+        Lote recusado é repartido ao meio até sobrar a linha culpada; erro
+        passageiro sobe (a fila inteira espera).
+        """
+        try:
+            return enviar([linha for _, linha in itens]), {}
+        except Exception as e:
+            if not _recusado(e):
+                raise
+            if len(itens) == 1:
+                return [], {itens[0][0]: str(e)}
+            meio = len(itens) // 2
+            salvas_a, recusadas_a = self._enviar(enviar, itens[:meio])
+            salvas_b, recusadas_b = self._enviar(enviar, itens[meio:])
+            return salvas_a + salvas_b, {**recusadas_a, **recusadas_b}
+
+    def _rejeitar(self, coluna, recusadas) -> int:
+        """Move de pendentes para rejeitados as linhas com `coluna` (seq ou sessao) recusada."""
+        agora = time_module.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "insert or replace into rejeitados select seq, tipo, sessao, payload, criado_em, ?, ? "
+                f"from pendentes where {coluna}=?", [(erro, agora, chave) for chave, erro in recusadas.items()])
+            return self.conn.executemany(f"delete from pendentes where {coluna}=?",
+                                         [(chave,) for chave in recusadas]).rowcount
+
+    def descarregar(self) -> int:
+        """Envia até `lote` pendentes; devolve quantos saíram da fila (enviados ou recusados).
+
+        São 2 requisições no máximo, mais as do isolamento quando o banco recusa
+        alguma linha.
+        """
+        with self._descarga:
+            with self._lock:
+                linhas = self.conn.execute(
+                    "select seq, tipo, sessao, payload from pendentes order by seq limit ?",
+                    (self.lote,)).fetchall()
+            if not linhas:
+                return 0
+
+            recusados, recusadas = 0, {}
+            treinos = {}
+            for seq, tipo, sessao, payload in linhas:
+                if tipo == "treino":
+                    treinos[sessao] = json.loads(payload)   # vale a versão mais recente
+            if treinos:
+                salvos, recusadas = self._enviar(db.sincronizar_treinos_executados, list(treinos.items()))
+                with self._lock, self.conn:
+                    self.conn.executemany("update sessoes set historico_id=? where id_cliente=?",
+                                          [(r["id"], r["id_cliente"]) for r in salvos])
+                with self._lock:
+                    ja_salvas = {r[0] for r in self.conn.execute(
+                        "select id_cliente from sessoes where historico_id is not null")} & recusadas.keys()
+                # Sessão nunca salva: as séries não têm a que se prender e saem junto.
+                # Já salva (recusou só a atualização): sai só a linha do treino.
+                recusados += self._rejeitar("sessao", {k: v for k, v in recusadas.items() if k not in ja_salvas})
+                recusados += self._rejeitar("seq", {seq: recusadas[sessao] for seq, tipo, sessao, _ in linhas
+                                                    if tipo == "treino" and sessao in ja_salvas})
+            enviados = [seq for seq, tipo, sessao, _ in linhas if tipo == "treino" and sessao in treinos
+                        and sessao not in recusadas]
+
+            with self._lock:
+                mapa = dict(self.conn.execute(
+                    "select id_cliente, historico_id from sessoes where historico_id is not null"))
+            series = [(seq, {**json.loads(payload), "historico_treino_id": mapa[sessao]})
+                      for seq, tipo, sessao, payload in linhas if tipo == "serie" and sessao in mapa]
+            if series:
+                _, recusadas = self._enviar(db.registrar_series_executadas, series)
+                recusados += self._rejeitar("seq", recusadas)
+                enviados += [seq for seq, _ in series if seq not in recusadas]
+
+            with self._lock, self.conn:
+                self.conn.executemany("delete from pendentes where seq=?", [(s,) for s in enviados])
+            self.ultima_sincronizacao = time_module.time()
+            self.ultimo_erro = None
+            return len(enviados) + recusados
+
+    def _loop(self):
+        espera = self.intervalo
+        while not self._parar.is_set():
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            try:
+                while self.descarregar() >= self.lote:
+                    pass
+                espera = self.intervalo
+            except Exception as e:
+                # Sem rede / Supabase fora (recusas já saíram da fila): tenta de novo mais devagar
+                self.ultimo_erro = str(e)
+                espera = min(espera * 2, self.teto_espera)
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="gymflow-fila", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, descarregar=True):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if descarregar:
+            try:
+                while self.descarregar():
+                    pass
+            except Exception as e:
+                self.ultimo_erro = str(e)
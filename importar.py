@@ -0,0 +1,389 @@
+"""
+gymflow/importar.py — Importação em lote de alunos, exercícios e planos (CSV/Excel)
+
+Lê o arquivo em blocos (pd.read_csv com chunksize; openpyxl em modo read_only
+para .xlsx), valida cada linha, descarta repetidas dentro do arquivo, casa com
+o que já está no banco (exercícios pelo nome sem acento/caixa, como o upsert de
+salvar_exercicio; alunos pelo e-mail ou nome; planos por aluno + mês) e grava
+cada bloco com bulk_insert / upsert em lote. `simular=True` faz tudo menos gravar.
+
+    python importar.py alunos alunos.csv --simular
+    python importar.py exercicios exercicios.xlsx --folha Exercicios
+    python importar.py planos planos.csv --lote 1000 --erros erros.csv
+
+Colunas (cabeçalho sem acento/caixa; * = obrigatória):
+    alunos      nome*, email, telefone
+    exercicios  nome*, grupo, descricao
+    planos      aluno* (e-mail, nome ou id), mes* (AAAA-MM ou MM/AAAA), nome
+"""
+from __future__ import annotations
+import argparse
+import csv
+import os
+import re
+import sys
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import db
+from catalogo import normalizar
+
+TIPOS = ("alunos", "exercicios", "planos")
+LOTE = 500
+GRUPOS = ["Peito", "Costas", "Pernas", "Ombro", "Bíceps", "Tríceps", "Abdômen", "Cardio", "Outro"]
+
+OBRIGATORIAS = {"alunos": ["nome"], "exercicios": ["nome"], "planos": ["aluno", "mes"]}
+COLUNAS = {
+    "alunos": "nome*, email, telefone",
+    "exercicios": "nome*, grupo, descricao",
+    "planos": "aluno* (e-mail, nome ou id), mes* (AAAA-MM ou MM/AAAA), nome",
+}
+APELIDOS = {
+    "alunos": {"e_mail": "email", "fone": "telefone", "celular": "telefone", "whatsapp": "telefone",
+               "aluno": "nome"},
+    "exercicios": {"exercicio": "nome", "grupo_muscular": "grupo", "descricao_opcional": "descricao",
+                   "observacao": "descricao"},
+    "planos": {"aluno_id": "aluno", "email": "aluno", "e_mail": "aluno", "aluno_email": "aluno",
+               "aluno_nome": "aluno", "mes_ano": "mes", "plano": "nome"},
+}
+
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_MES = re.compile(r"^(\d{4})[-/](\d{1,2})$|^(\d{1,2})[-/](\d{4})$")
+_GRUPO = {normalizar(g): g for g in GRUPOS}
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+# ── Leitura em blocos ──────────────────────────────────────────────────────
+
+def _formato(arquivo, nome=None) -> str:
+    nome = (nome or getattr(arquivo, "name", None) or str(arquivo)).lower()
+    return "excel" if nome.endswith((".xlsx", ".xlsm")) else "csv"
+
+
+def _cabecalho(arquivo, encoding) -> str:
+    if hasattr(arquivo, "read"):
+        inicio = arquivo.read(64 * 1024)
+        arquivo.seek(0)
+    else:
+        with open(arquivo, "rb") as f:
+            inicio = f.read(64 * 1024)
+    if isinstance(inicio, bytes):
+        inicio = inicio.decode(encoding, errors="replace")
+    return inicio.splitlines()[0] if inicio else ""
+
+
+def contar_linhas(arquivo, nome=None, folha=None) -> int | None:
+    """Linhas de dados (sem o cabeçalho), para a barra de progresso; None se não der para saber."""
+    if _formato(arquivo, nome) == "excel":
+        from openpyxl import load_workbook
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            ws = wb[folha] if folha else wb.active
+            return ws.max_row - 1 if ws.max_row else None
+        finally:
+            wb.close()
+            if hasattr(arquivo, "seek"):
+                arquivo.seek(0)
+    n = 0
+    if hasattr(arquivo, "read"):
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            if not bloco:
+                break
+            n += bloco.count(b"\n" if isinstance(bloco, bytes) else "\n")
+        arquivo.seek(0)
+    else:
+        with open(arquivo, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                n += bloco.count(b"\n")
+    return max(n - 1, 0)
+
+
+def _texto(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))  # telefone/id que o Excel guardou como número
+    return str(v).strip()
+
+
+def ler(arquivo, lote=LOTE, nome=None, folha=None, encoding="utf-8-sig"):
+    """Gera DataFrames de até `lote` linhas, tudo como texto, com a coluna "_linha" do arquivo."""
+    inicio = 2  # linha 1 é o cabeçalho
+    if _formato(arquivo, nome) == "excel":
+        from openpyxl import load_workbook
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = (wb[folha] if folha else wb.active).iter_rows(values_only=True)
+            colunas = [_texto(c) for c in next(linhas, ())]
+            bloco = []
+            for valores in linhas:
+                bloco.append([_texto(v) for v in valores[:len(colunas)]])
+                if len(bloco) == lote:
+                    yield _bloco(bloco, colunas, inicio)
+                    inicio += len(bloco)
+                    bloco = []
+            if bloco:
+                yield _bloco(bloco, colunas, inicio)
+        finally:
+            wb.close()
+        return
+
+    # CSV exportado do Excel em pt-BR costuma vir com ";"
+    cab = _cabecalho(arquivo, encoding)
+    sep = ";" if cab.count(";") > cab.count(",") else ","
+    for df in pd.read_csv(arquivo, sep=sep, chunksize=lote, dtype=str, keep_default_na=False,
+                          encoding=encoding, skipinitialspace=True):
+        df = df.apply(lambda c: c.str.strip())
+        df["_linha"] = range(inicio, inicio + len(df))
+        inicio += len(df)
+        yield df
+
+
+def _bloco(linhas, colunas, inicio) -> pd.DataFrame:
+    df = pd.DataFrame(linhas, columns=colunas).fillna("")
+    df["_linha"] = range(inicio, inicio + len(df))
+    return df
+
+
+def _renomear(df: pd.DataFrame, tipo) -> pd.DataFrame:
+    nomes = {}
+    for c in df.columns:
+        if c == "_linha":
+            continue
+        n = normalizar(c).replace(" ", "_")
+        nomes[c] = APELIDOS[tipo].get(n, n)
+    df = df.rename(columns=nomes)
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+# ── Regras por tipo ────────────────────────────────────────────────────────
+# Cada tipo tem: _estado_* (o que já existe no banco, lido uma vez em páginas),
+# _linha_* (valida e devolve chave + linha pronta, ou o id a atualizar) e
+# _gravar_* (um bloco de novas + atualizadas).
+
+def _registros(pagina: pd.DataFrame) -> list[dict]:
+    """Linhas da página com célula vazia como None (o DataFrame traz NaN, que não é JSON
+    e nunca é igual a si mesmo)."""
+    return pagina.astype(object).where(pagina.notna(), None).to_dict("records")
+
+
+def _estado_alunos() -> dict:
+    por_email, por_nome = {}, defaultdict(list)
+    for pagina in db.iter_alunos(apenas_ativos=False, colunas="id, nome, email, telefone"):
+        for a in _registros(pagina):
+            if a.get("email"):
+                por_email[a["email"].strip().lower()] = a
+            por_nome[normalizar(a["nome"])].append(a)
+    return {"por_email": por_email, "por_nome": por_nome}
+
+
+def _aluno_existente(estado, nome, email):
+    if email and email in estado["por_email"]:
+        return estado["por_email"][email]
+    mesmos = estado["por_nome"].get(normalizar(nome), [])
+    # Só casa pelo nome quando não há dúvida (um homônimo, sem outro e-mail)
+    if len(mesmos) == 1 and not (email and mesmos[0].get("email")):
+        return mesmos[0]
+    return None
+
+
+def _linha_alunos(r, estado):
+    nome, email, telefone = r.get("nome", ""), r.get("email", "").lower(), r.get("telefone", "")
+    if not nome:
+        raise LinhaInvalida("nome vazio")
+    if email and not _EMAIL.match(email):
+        raise LinhaInvalida(f"e-mail inválido: {email}")
+    chave = email or "nome:" + normalizar(nome)
+    atual = _aluno_existente(estado, nome, email)
+    if atual is None:
+        return chave, {"nome": nome, "email": email or None, "telefone": telefone or None, "ativo": True}, None
+    # Célula vazia não apaga o que já existe
+    linha = {"id": int(atual["id"]), "nome": nome, "email": email or atual.get("email"),
+             "telefone": telefone or atual.get("telefone")}
+    mudou = any(linha[k] != atual.get(k) for k in ("nome", "email", "telefone"))
+    return chave, linha if mudou else None, atual
+
+
+def _gravar_alunos(novas, atualizadas, estado):
+    for a in db.bulk_insert("alunos", novas) + db.bulk_insert("alunos", atualizadas, upsert=True, on_conflict="id"):
+        if a.get("email"):
+            estado["por_email"][a["email"].lower()] = a
+        mesmos = estado["por_nome"][normalizar(a["nome"])]
+        mesmos[:] = [m for m in mesmos if int(m["id"]) != int(a["id"])] + [a]
+
+
+def _estado_exercicios() -> dict:
+    por_nome = {}
+    for pagina in db.iter_exercicios(colunas="id, nome, grupo, descricao"):
+        for e in _registros(pagina):
+            por_nome[normalizar(e["nome"])] = e
+    return {"por_nome": por_nome}
+
+
+def _linha_exercicios(r, estado):
+    nome, grupo, descricao = r.get("nome", ""), r.get("grupo", ""), r.get("descricao", "")
+    if not nome:
+        raise LinhaInvalida("nome vazio")
+    if grupo:
+        if normalizar(grupo) not in _GRUPO:
+            raise LinhaInvalida(f"grupo desconhecido: {grupo} (use {', '.join(GRUPOS)})")
+        grupo = _GRUPO[normalizar(grupo)]
+    chave = normalizar(nome)
+    atual = estado["por_nome"].get(chave)
+    if atual is None:
+        return chave, {"nome": nome, "grupo": grupo or "Outro", "descricao": descricao or None}, None
+    # O nome gravado continua o do banco: o upsert casa por nome exato
+    linha = {"nome": atual["nome"], "grupo": grupo or atual.get("grupo"),
+             "descricao": descricao or atual.get("descricao")}
+    mudou = any(linha[k] != atual.get(k) for k in ("grupo", "descricao"))
+    return chave, linha if mudou else None, atual
+
+
+def _gravar_exercicios(novas, atualizadas, estado):
+    # Mesmo upsert por nome de salvar_exercicio, num POST por bloco
+    for e in db.bulk_insert("exercicios", novas + atualizadas, upsert=True, on_conflict="nome"):
+        estado["por_nome"][normalizar(e["nome"])] = e
+
+
+def _estado_planos() -> dict:
+    alunos = _estado_alunos()
+    alunos["ids"] = {int(a["id"]) for lista in alunos["por_nome"].values() for a in lista}
+    alunos["planos"] = {(int(p["aluno_id"]), p["mes"])
+                        for pagina in db.iter_planos(colunas="aluno_id, mes")
+                        for p in _registros(pagina)}
+    return alunos
+
+
+def _mes(texto) -> str:
+    m = _MES.match(texto)
+    if not m:
+        raise LinhaInvalida(f"mês inválido: {texto} (use AAAA-MM)")
+    ano, mes = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+    if not 1 <= int(mes) <= 12:
+        raise LinhaInvalida(f"mês inválido: {texto}")
+    return f"{ano}-{int(mes):02d}"
+
+
+def _linha_planos(r, estado):
+    aluno, mes = r.get("aluno", ""), _mes(r.get("mes", ""))
+    if not aluno:
+        raise LinhaInvalida("aluno vazio")
+    if aluno.isdigit():
+        aluno_id = int(aluno) if int(aluno) in estado["ids"] else None
+    elif "@" in aluno:
+        a = estado["por_email"].get(aluno.lower())
+        aluno_id = int(a["id"]) if a else None
+    else:
+        mesmos = estado["por_nome"].get(normalizar(aluno), [])
+        if len(mesmos) > 1:
+            raise LinhaInvalida(f"há {len(mesmos)} alunos chamados {aluno}; use o e-mail")
+        aluno_id = int(mesmos[0]["id"]) if mesmos else None
+    if aluno_id is None:
+        raise LinhaInvalida(f"aluno não encontrado: {aluno}")
+    chave = (aluno_id, mes)
+    if chave in estado["planos"]:
+        return chave, None, chave  # um plano por aluno e mês: o existente fica
+    return chave, {"aluno_id": aluno_id, "nome": r.get("nome") or db.nome_do_mes(mes), "mes": mes, "ativo": True}, None
+
+
+def _gravar_planos(novas, atualizadas, estado):
+    for p in db.bulk_insert("planos", novas):
+        estado["planos"].add((int(p["aluno_id"]), p["mes"]))
+
+
+_REGRAS = {
+    "alunos": (_estado_alunos, _linha_alunos, _gravar_alunos),
+    "exercicios": (_estado_exercicios, _linha_exercicios, _gravar_exercicios),
+    "planos": (_estado_planos, _linha_planos, _gravar_planos),
+}
+
+
+# ── Importação ─────────────────────────────────────────────────────────────
+
+def importar(tipo, arquivo, lote=LOTE, simular=False, progresso=None, nome=None, folha=None,
+             encoding="utf-8-sig") -> dict:
+    """Importa `arquivo` (caminho ou arquivo aberto; CSV ou .xlsx) como `tipo`.
+
+    Devolve o resumo: lidas, novas, atualizadas, sem_mudanca, repetidas (no
+    próprio arquivo) e erros [(linha, motivo)]. `progresso(resumo)` é chamado a
+    cada bloco; resumo["total"] é o nº de linhas do arquivo, se conhecido.
+    """
+    if tipo not in _REGRAS:
+        raise ValueError(f"tipo desconhecido: {tipo} (use {', '.join(TIPOS)})")
+    estado_fn, linha_fn, gravar_fn = _REGRAS[tipo]
+    resumo = {"tipo": tipo, "simulado": simular, "total": contar_linhas(arquivo, nome, folha),
+              "lidas": 0, "novas": 0, "atualizadas": 0, "sem_mudanca": 0, "repetidas": 0, "erros": []}
+    estado = estado_fn()
+    vistas = set()
+    for df in ler(arquivo, lote, nome=nome, folha=folha, encoding=encoding):
+        df = _renomear(df, tipo)
+        faltam = [c for c in OBRIGATORIAS[tipo] if c not in df.columns]
+        if faltam:
+            raise ValueError(f"coluna obrigatória ausente: {', '.join(faltam)} (colunas: "
+                             f"{', '.join(c for c in df.columns if c != '_linha')})")
+        novas, atualizadas = [], []
+        for r in df.to_dict("records"):
+            resumo["lidas"] += 1
+            try:
+                chave, linha, atual = linha_fn(r, estado)
+            except LinhaInvalida as e:
+                resumo["erros"].append((r["_linha"], str(e)))
+                continue
+            if chave in vistas:
+                resumo["repetidas"] += 1
+                continue
+            vistas.add(chave)
+            if linha is None:
+                resumo["sem_mudanca"] += 1
+            else:
+                (novas if atual is None else atualizadas).append(linha)
+        if not simular and (novas or atualizadas):
+            gravar_fn(novas, atualizadas, estado)
+        resumo["novas"] += len(novas)
+        resumo["atualizadas"] += len(atualizadas)
+        if progresso:
+            progresso(resumo)
+    return resumo
+
+
+def _mostrar_progresso(resumo):
+    total = f"/{resumo['total']}" if resumo["total"] is not None else ""
+    print(f"\r{resumo['lidas']}{total} linhas · {resumo['novas']} novas · {resumo['atualizadas']} atualizadas"
+          f" · {len(resumo['erros'])} erros", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("tipo", choices=TIPOS)
+    ap.add_argument("arquivo", help=".csv ou .xlsx")
+    ap.add_argument("--simular", "--dry-run", action="store_true", help="valida e conta, sem gravar")
+    ap.add_argument("--lote", type=int, default=LOTE, help="linhas por bloco lido e gravado")
+    ap.add_argument("--folha", help="planilha do .xlsx (padrão: a ativa)")
+    ap.add_argument("--encoding", default="utf-8-sig", help="do CSV (ex.: latin-1)")
+    ap.add_argument("--erros", help="grava as linhas recusadas (linha, motivo) neste CSV")
+    args = ap.parse_args(argv)
+
+    resumo = importar(args.tipo, args.arquivo, args.lote, args.simular, _mostrar_progresso,
+                      folha=args.folha, encoding=args.encoding)
+    print(file=sys.stderr)
+    acao = "seriam gravadas" if args.simular else "gravadas"
+    print(f"{args.tipo}: {resumo['lidas']} lidas · {resumo['novas']} novas e {resumo['atualizadas']} "
+          f"atualizadas {acao} · {resumo['sem_mudanca']} sem mudança · {resumo['repetidas']} repetidas "
+          f"no arquivo · {len(resumo['erros'])} com erro")
+    if args.erros and resumo["erros"]:
+        with open(args.erros, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows([("linha", "motivo"), *resumo["erros"]])
+    for linha, motivo in resumo["erros"][:20]:
+        print(f"  linha {linha}: {motivo}")
+    if len(resumo["erros"]) > 20:
+        print(f"  … e mais {len(resumo['erros']) - 20}" + ("" if args.erros else " (use --erros arquivo.csv)"))
+    return 1 if resumo["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+gymflow/otimista.py — Mutações otimistas do app do professor
+
+A escrita aparece na hora na visão da sessão (como pendente), vai ao banco numa
+thread e, quando a resposta chega, é confirmada ou desfeita com um toast.
+Uso no app: reconciliar() no topo do script, pendentes(...) ao montar cada
+lista, enviar(...) no lugar da chamada síncrona e acompanhar() no fim.
+"""
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gymflow-escrita")
+_ids = itertools.count(1)
+_CHAVE = "_mutacoes_pendentes"
+
+
+def _fila() -> dict:
+    return st.session_state.setdefault(_CHAVE, {})
+
+
+def enviar(tipo, linha: dict, rotulo: str, fn, *args, **kwargs) -> int:
+    """Agenda `fn(*args, **kwargs)` numa thread e já expõe `linha` em pendentes(tipo).
+
+    Devolve o id provisório (negativo) dado à linha.
+    """
+    temp = -next(_ids)
+    _fila()[temp] = {"tipo": tipo, "linha": {**linha, "id": temp}, "rotulo": rotulo,
+                     "futuro": _executor.submit(fn, *args, **kwargs)}
+    return temp
+
+
+def pendentes(tipo, **filtro) -> list[dict]:
+    """Linhas ainda sem resposta do banco para `tipo` (ex.: treino_id=3)."""
+    return [dict(p["linha"]) for p in _fila().values()
+            if p["tipo"] == tipo and not p["futuro"].done()
+            and all(p["linha"].get(k) == v for k, v in filtro.items())]
+
+
+def reconciliar() -> int:
+    """Tira da fila o que já voltou: toast de confirmação, ou de erro (a linha some)."""
+    fila = _fila()
+    prontos = [k for k, p in fila.items() if p["futuro"].done()]
+    for k in prontos:
+        p = fila.pop(k)
+        erro = p["futuro"].exception()
+        if erro is None:
+            st.toast(f"✓ {p['rotulo']} salvo")
+        else:
+            st.toast(f"Não foi possível salvar {p['rotulo']}: {erro}", icon="⚠️")
+    return len(prontos)
+
+
+@st.fragment(run_every=1)
+def _vigiar():
+    if any(p["futuro"].done() for p in _fila().values()):
+        st.rerun()  # o app inteiro: as visões trocam o pendente pelo dado real
+
+
+def acompanhar():
+    """Enquanto houver escrita pendente, confere a cada segundo (fim do script)."""
+    if _fila():
+        _vigiar()
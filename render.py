@@ -0,0 +1,145 @@
+"""
+gymflow/render.py — HTML dos cartões (treino inteiro, lista de exercícios, planos)
+
+Cada função monta o bloco todo numa passada (templates + join / operações de
+string do pandas, sem `+=` por linha) para um único st.markdown, e memoiza o
+resultado pelo hash do conteúdo: treino que não mudou não é re-renderizado.
+Texto vindo do banco passa por html.escape.
+"""
+import hashlib, html, json, threading
+from collections import OrderedDict
+import pandas as pd
+
+_LIMITE_MEMO = 512
+_memo: "OrderedDict[str, str]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _hash_obj(obj) -> str:
+    return hashlib.blake2b(json.dumps(obj, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def _hash_df(df: pd.DataFrame) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(",".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _memoizado(chave, gerar) -> str:
+    with _memo_lock:
+        pronto = _memo.get(chave)
+        if pronto is not None:
+            _memo.move_to_end(chave)
+            return pronto
+    pronto = gerar()
+    with _memo_lock:
+        _memo[chave] = pronto
+        while len(_memo) > _LIMITE_MEMO:
+            _memo.popitem(last=False)
+    return pronto
+
+
+def _esc(v) -> str:
+    return html.escape(str(v)) if v is not None else ""
+
+
+def _fmt(v) -> str:
+    """Número sem ".0" sobrando (20.0 → 20, 22.5 → 22.5)."""
+    return f"{float(v):g}"
+
+
+# ── Treino (ficha) ─────────────────────────────────────────────────────────
+
+_TREINO = """<div style="background:#16181f;border:1px solid #2a2d3a;border-top:3px solid #c8f564;border-radius:14px;padding:16px 20px;margin-bottom:4px">
+<div style="display:flex;justify-content:space-between;align-items:center">
+<div><span style="font-family:'DM Serif Display',serif;font-size:20px;color:#c8f564">Treino {nome}</span>
+<span style="font-size:13px;color:#7a7f96;margin-left:10px">{descricao}</span>{modelo}</div>
+<span style="font-size:12px;color:#7a7f96">{n} exercício(s)</span>
+</div></div>
+{corpo}"""
+
+_ITEM = """<div style="background:#1e2029;border-left:3px solid #2a2d3a;border-radius:0 10px 10px 0;padding:12px 16px;margin-bottom:6px">
+<div style="display:flex;justify-content:space-between;align-items:center;margin-bottom:6px">
+<span style="font-weight:600;color:#e8eaf0;font-size:14px">{badge} {nome}</span>
+<span style="font-size:11px;color:#7a7f96">⏱ {descanso}s{combinado}</span>
+</div>
+<div style="flex-wrap:wrap">{series}</div>{obs}
+</div>"""
+
+_SERIE = ('<span style="background:#1e2029;border:1px solid #2a2d3a;border-radius:6px;padding:3px 8px;'
+          'margin-right:4px;font-family:DM Mono,monospace;font-size:11px;color:#c8f564">{n}ª {reps}x{carga}</span>')
+
+_OBS = '<div style="font-size:11px;color:#6af0c8;margin-top:6px">📝 {}</div>'
+
+_MODELO = '<span style="font-size:11px;color:#6af0c8;margin-left:10px">📚 {}</span>'
+
+_SEM_ITENS = '<div style="color:#7a7f96;font-size:13px;padding:8px 20px;margin-bottom:12px">Nenhum exercício ainda.</div>'
+
+
+def _item_html(item, itens_por_id) -> str:
+    comb = itens_por_id.get(item.get("combinado_com")) if item.get("combinado_com") else None
+    series = "".join(
+        _SERIE.format(n=int(s["numero"]), reps=int(s["repeticoes"] or 0),
+                      carga=f"/{_fmt(s['carga'])}kg" if s.get("carga") else "")
+        for s in item["series"])
+    return _ITEM.format(
+        badge="🔺" if item["tipo_serie"] == "piramide" else "➡️",
+        nome=_esc(item["exercicio_nome"]),
+        descanso=_esc(item.get("descanso_seg")),
+        combinado=f" · 🔗 {_esc(comb['exercicio_nome'])}" if comb else "",
+        series=series,
+        obs=_OBS.format(_esc(item["observacao"])) if item.get("observacao") else "",
+    )
+
+
+def treino_html(treino: dict) -> str:
+    """Cabeçalho + todos os exercícios (com séries) de um treino de db.carregar_ficha."""
+    def gerar():
+        itens = treino["itens"]
+        itens_por_id = {it["id"]: it for it in itens}
+        corpo = "".join(_item_html(it, itens_por_id) for it in itens) if itens else _SEM_ITENS
+        # Selo só enquanto o treino segue o modelo (editado = personalizado)
+        modelo = (_MODELO.format(_esc(treino["modelo_nome"]))
+                  if treino.get("modelo_nome") and not treino.get("personalizado") else "")
+        return _TREINO.format(nome=_esc(treino["nome"]), descricao=_esc(treino.get("descricao")),
+                              modelo=modelo, n=len(itens), corpo=corpo)
+    return _memoizado("treino:" + _hash_obj(treino), gerar)
+
+
+# ── Listas (exercícios, planos) ────────────────────────────────────────────
+
+_GRUPO = ('<div style="font-size:12px;font-weight:700;color:#c8f564;text-transform:uppercase;'
+          'letter-spacing:1.5px;margin:14px 0 6px">')
+_EXERCICIO = ('<div style="background:#16181f;border:1px solid #2a2d3a;border-radius:10px;padding:10px 14px;'
+              'font-size:13px;color:#e8eaf0;margin-bottom:6px">')
+_DESC = '<span style="font-size:11px;color:#7a7f96;margin-left:8px">— '
+
+
+def _col_esc(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).map(html.escape)
+
+
+def exercicios_html(df: pd.DataFrame) -> str:
+    """Exercícios agrupados por grupo muscular (colunas nome, grupo, descricao)."""
+    def gerar():
+        d = df.sort_values(["grupo", "nome"], kind="stable")
+        desc = _col_esc(d["descricao"] if "descricao" in d else pd.Series("", index=d.index))
+        linhas = _EXERCICIO + _col_esc(d["nome"]) + desc.where(desc == "", _DESC + desc + "</span>") + "</div>"
+        blocos = linhas.groupby(d["grupo"].fillna("—"), sort=True).agg("".join)
+        return "".join(_GRUPO + html.escape(str(g)) + "</div>" + corpo for g, corpo in blocos.items())
+    return _memoizado("exercicios:" + _hash_df(df), gerar)
+
+
+_ALUNO = '<div style="font-weight:600;color:#e8eaf0;margin:14px 0 6px">👤 '
+_PLANO = ('<div style="font-size:14px;color:#e8eaf0;padding:4px 0 4px 8px">📅 ')
+_MES = ' — <code style="font-family:DM Mono,monospace;color:#c8f564;background:#1e2029;padding:1px 6px;border-radius:4px">'
+
+
+def planos_html(df: pd.DataFrame) -> str:
+    """Planos agrupados por aluno, na ordem recebida (colunas aluno_nome, nome, mes)."""
+    def gerar():
+        linhas = _PLANO + _col_esc(df["nome"]) + _MES + _col_esc(df["mes"]) + "</code></div>"
+        blocos = linhas.groupby(df["aluno_nome"], sort=False).agg("".join)
+        return "".join(_ALUNO + html.escape(str(a)) + "</div>" + corpo for a, corpo in blocos.items())
+    return _memoizado("planos:" + _hash_df(df), gerar)
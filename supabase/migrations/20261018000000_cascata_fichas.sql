@@ -0,0 +1,71 @@
+-- GymFlow — exclusão em cascata da ficha de treino
+-- Apagar um plano remove treinos → itens → séries no próprio Postgres,
+-- numa única requisição (DELETE em planos/treinos/treino_itens).
+-- O histórico do aluno é preservado: as referências passam a NULL, e a série
+-- executada guarda o próprio exercicio_id (preenchido aqui para o que já existe,
+-- antes de qualquer item poder ser apagado, e no insert pelo gatilho).
+
+begin;
+
+alter table treinos
+    drop constraint if exists treinos_plano_id_fkey,
+    add constraint treinos_plano_id_fkey
+        foreign key (plano_id) references planos(id) on delete cascade;
+
+alter table treino_itens
+    drop constraint if exists treino_itens_treino_id_fkey,
+    add constraint treino_itens_treino_id_fkey
+        foreign key (treino_id) references treinos(id) on delete cascade;
+
+alter table treino_itens
+    drop constraint if exists treino_itens_combinado_com_fkey,
+    add constraint treino_itens_combinado_com_fkey
+        foreign key (combinado_com) references treino_itens(id) on delete set null;
+
+alter table series
+    drop constraint if exists series_treino_item_id_fkey,
+    add constraint series_treino_item_id_fkey
+        foreign key (treino_item_id) references treino_itens(id) on delete cascade;
+
+alter table historico_treinos
+    alter column treino_id drop not null,
+    drop constraint if exists historico_treinos_treino_id_fkey,
+    add constraint historico_treinos_treino_id_fkey
+        foreign key (treino_id) references treinos(id) on delete set null;
+
+alter table historico_series add column if not exists exercicio_id bigint references exercicios(id);
+
+update historico_series hs set exercicio_id = ti.exercicio_id
+from treino_itens ti
+where ti.id = hs.treino_item_id and hs.exercicio_id is null;
+
+create or replace function preencher_exercicio_serie()
+returns trigger language plpgsql as $$
+begin
+    if new.exercicio_id is null and new.treino_item_id is not null then
+        select exercicio_id into new.exercicio_id from treino_itens where id = new.treino_item_id;
+    end if;
+    return new;
+end $$;
+
+drop trigger if exists historico_series_exercicio on historico_series;
+create trigger historico_series_exercicio
+    before insert on historico_series
+    for each row execute function preencher_exercicio_serie();
+
+alter table historico_series
+    alter column treino_item_id drop not null,
+    drop constraint if exists historico_series_treino_item_id_fkey,
+    add constraint historico_series_treino_item_id_fkey
+        foreign key (treino_item_id) references treino_itens(id) on delete set null;
+
+-- Índices nas FKs: sem eles cada cascata faz varredura sequencial nos filhos
+create index if not exists treinos_plano_id_idx on treinos(plano_id);
+create index if not exists treino_itens_treino_id_idx on treino_itens(treino_id);
+create index if not exists treino_itens_combinado_com_idx on treino_itens(combinado_com);
+create index if not exists series_treino_item_id_idx on series(treino_item_id);
+create index if not exists historico_treinos_treino_id_idx on historico_treinos(treino_id);
+create index if not exists historico_series_treino_item_id_idx on historico_series(treino_item_id);
+create index if not exists historico_series_exercicio_id_idx on historico_series(exercicio_id);
+
+commit;
@@ -0,0 +1,13 @@
+-- GymFlow — id gerado no cliente para o histórico do aluno
+-- O app do aluno grava numa fila local e reenvia em lote; com id_cliente único
+-- o reenvio vira upsert idempotente (nenhuma série duplicada nem perdida).
+
+begin;
+
+alter table historico_treinos add column if not exists id_cliente uuid;
+create unique index if not exists historico_treinos_id_cliente_key on historico_treinos(id_cliente);
+
+alter table historico_series add column if not exists id_cliente uuid;
+create unique index if not exists historico_series_id_cliente_key on historico_series(id_cliente);
+
+commit;
@@ -0,0 +1,109 @@
+-- GymFlow — Agregados de progresso (diário e semanal por aluno × exercício)
+-- Um gatilho por instrução em historico_series soma as séries recém-inseridas
+-- nas duas tabelas; o painel de progresso lê O(semanas) em vez de O(séries).
+-- Reenvios ignorados pelo upsert (id_cliente repetido) não entram na tabela de
+-- transição, então não contam duas vezes. recalcular_progresso() reconstrói
+-- tudo a partir do histórico (carga inicial e reparo).
+
+begin;
+
+create table if not exists progresso_diario (
+    aluno_id bigint not null references alunos(id) on delete cascade,
+    exercicio_id bigint not null references exercicios(id) on delete cascade,
+    dia date not null,
+    series integer not null default 0,
+    reps integer not null default 0,
+    volume numeric not null default 0,
+    carga_max numeric,
+    e1rm_max numeric,
+    primary key (aluno_id, exercicio_id, dia)
+);
+
+create table if not exists progresso_semanal (
+    aluno_id bigint not null references alunos(id) on delete cascade,
+    exercicio_id bigint not null references exercicios(id) on delete cascade,
+    semana date not null,                    -- segunda-feira
+    series integer not null default 0,
+    reps integer not null default 0,
+    volume numeric not null default 0,
+    carga_max numeric,
+    e1rm_max numeric,
+    primary key (aluno_id, exercicio_id, semana)
+);
+create index if not exists progresso_semanal_aluno_semana_idx on progresso_semanal(aluno_id, semana);
+create index if not exists progresso_diario_exercicio_idx on progresso_diario(exercicio_id);
+create index if not exists progresso_semanal_exercicio_idx on progresso_semanal(exercicio_id);
+
+-- Séries → linhas diárias agregadas (1RM estimado por Epley, igual ao analytics.py);
+-- o exercício é o gravado na série (20261018000000), não depende da ficha existir
+create or replace function _progresso_diario_de(series_ids bigint[] default null)
+returns table (aluno_id bigint, exercicio_id bigint, dia date, series integer, reps integer,
+               volume numeric, carga_max numeric, e1rm_max numeric)
+language sql stable as $$
+    select ht.aluno_id, hs.exercicio_id, ht.data,
+           count(*)::integer,
+           sum(coalesce(hs.repeticoes_feitas, 0))::integer,
+           sum(coalesce(hs.repeticoes_feitas, 0) * coalesce(hs.carga_usada, 0)),
+           max(coalesce(hs.carga_usada, 0)),
+           max(case when hs.repeticoes_feitas > 0 and hs.carga_usada > 0 then
+                    case when hs.repeticoes_feitas = 1 then hs.carga_usada
+                         else hs.carga_usada * (1 + hs.repeticoes_feitas / 30.0) end end)
+    from historico_series hs
+    join historico_treinos ht on ht.id = hs.historico_treino_id
+    where hs.exercicio_id is not null and (series_ids is null or hs.id = any(series_ids))
+    group by 1, 2, 3
+$$;
+
+create or replace function _somar_progresso(series_ids bigint[])
+returns void language plpgsql as $$
+begin
+    create temporary table _novos as select * from _progresso_diario_de(series_ids);
+
+    insert into progresso_diario as p
+    select * from _novos
+    on conflict (aluno_id, exercicio_id, dia) do update set
+        series = p.series + excluded.series,
+        reps = p.reps + excluded.reps,
+        volume = p.volume + excluded.volume,
+        carga_max = greatest(p.carga_max, excluded.carga_max),
+        e1rm_max = greatest(p.e1rm_max, excluded.e1rm_max);
+
+    insert into progresso_semanal as p
+    select aluno_id, exercicio_id, date_trunc('week', dia)::date,
+           sum(series), sum(reps), sum(volume), max(carga_max), max(e1rm_max)
+    from _novos group by 1, 2, 3
+    on conflict (aluno_id, exercicio_id, semana) do update set
+        series = p.series + excluded.series,
+        reps = p.reps + excluded.reps,
+        volume = p.volume + excluded.volume,
+        carga_max = greatest(p.carga_max, excluded.carga_max),
+        e1rm_max = greatest(p.e1rm_max, excluded.e1rm_max);
+
+    drop table _novos;
+end $$;
+
+create or replace function acumular_progresso()
+returns trigger language plpgsql as $$
+begin
+    perform _somar_progresso(array(select id from novas_series));
+    return null;
+end $$;
+
+drop trigger if exists historico_series_progresso on historico_series;
+create trigger historico_series_progresso
+    after insert on historico_series
+    referencing new table as novas_series
+    for each statement execute function acumular_progresso();
+
+create or replace function recalcular_progresso()
+returns void language plpgsql as $$
+begin
+    lock table progresso_diario, progresso_semanal in exclusive mode;
+    delete from progresso_diario;
+    delete from progresso_semanal;
+    perform _somar_progresso(null);
+end $$;
+
+select recalcular_progresso();
+
+commit;
@@ -0,0 +1,74 @@
+-- GymFlow — Cópia de plano (virada de mês) numa única transação
+-- clonar_plano copia treinos → itens → séries de um plano para um novo mês,
+-- para o mesmo aluno ou para vários; combinado_com passa a apontar para o item
+-- copiado. Os ids novos são reservados antes (nextval), então o mapa velho → novo
+-- sai de uma vez e cada tabela é copiada com um único INSERT ... SELECT.
+-- virar_mes faz isso para todos os alunos ativos que ainda não têm o mês novo.
+
+begin;
+
+create or replace function clonar_plano(p_plano_id bigint, p_mes text, p_nome text default null,
+                                        p_aluno_ids bigint[] default null)
+returns setof planos language plpgsql as $$
+declare
+    origem planos;
+begin
+    select * into origem from planos where id = p_plano_id;
+    if not found then
+        raise exception 'plano % não existe', p_plano_id using errcode = 'P0002';
+    end if;
+
+    drop table if exists _copia_planos, _copia_treinos, _copia_itens;
+    create temporary table _copia_planos on commit drop as
+        select a.aluno_id, nextval(pg_get_serial_sequence('planos', 'id')) as novo
+        from unnest(coalesce(p_aluno_ids, array[origem.aluno_id])) as a(aluno_id);
+    create temporary table _copia_treinos on commit drop as
+        select cp.novo as plano_novo, t.id as velho, nextval(pg_get_serial_sequence('treinos', 'id')) as novo
+        from _copia_planos cp cross join treinos t
+        where t.plano_id = p_plano_id;
+    create temporary table _copia_itens on commit drop as
+        select ct.plano_novo, ct.novo as treino_novo, i.id as velho,
+               nextval(pg_get_serial_sequence('treino_itens', 'id')) as novo
+        from _copia_treinos ct join treino_itens i on i.treino_id = ct.velho;
+
+    insert into planos (id, aluno_id, nome, mes, ativo)
+        select novo, aluno_id, coalesce(p_nome, origem.nome), p_mes, true from _copia_planos;
+
+    insert into treinos (id, plano_id, nome, descricao, ordem)
+        select ct.novo, ct.plano_novo, t.nome, t.descricao, t.ordem
+        from _copia_treinos ct join treinos t on t.id = ct.velho;
+
+    -- O par do bi-set é o item copiado do mesmo plano novo (FK checada no fim da instrução)
+    insert into treino_itens (id, treino_id, exercicio_id, ordem, tipo_serie, descanso_seg,
+                              combinado_com, observacao)
+        select ci.novo, ci.treino_novo, i.exercicio_id, i.ordem, i.tipo_serie, i.descanso_seg,
+               par.novo, i.observacao
+        from _copia_itens ci
+        join treino_itens i on i.id = ci.velho
+        left join _copia_itens par on par.velho = i.combinado_com and par.plano_novo = ci.plano_novo;
+
+    insert into series (treino_item_id, numero, repeticoes, carga)
+        select ci.novo, s.numero, s.repeticoes, s.carga
+        from _copia_itens ci join series s on s.treino_item_id = ci.velho;
+
+    return query select p.* from planos p join _copia_planos cp on cp.novo = p.id order by p.id;
+end $$;
+
+create or replace function virar_mes(p_mes_origem text, p_mes_destino text, p_nome text default null)
+returns setof planos language plpgsql as $$
+declare
+    origem bigint;
+begin
+    -- Um plano por aluno (o mais recente do mês); quem já tem o mês novo fica de fora
+    for origem in
+        select distinct on (p.aluno_id) p.id
+        from planos p join alunos a on a.id = p.aluno_id
+        where p.mes = p_mes_origem and a.ativo
+          and not exists (select 1 from planos d where d.aluno_id = p.aluno_id and d.mes = p_mes_destino)
+        order by p.aluno_id, p.id desc
+    loop
+        return query select * from clonar_plano(origem, p_mes_destino, p_nome);
+    end loop;
+end $$;
+
+commit;
@@ -0,0 +1,136 @@
+-- GymFlow — Modelos de treino (biblioteca reutilizável)
+-- Um modelo guarda itens e séries uma vez só; atribuir o modelo a N alunos cria
+-- N linhas em treinos (modelo_id), sem copiar itens nem séries. O treino só
+-- ganha itens próprios (materializar_treino) quando precisa: na primeira edição
+-- do professor (personalizado = true) ou no primeiro treino executado, porque o
+-- histórico aponta para treino_itens. clonar_plano passa a copiar só o vínculo
+-- dos treinos não personalizados.
+
+begin;
+
+create table if not exists modelos (
+    id bigserial primary key,
+    nome text not null unique,
+    descricao text,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists modelo_itens (
+    id bigserial primary key,
+    modelo_id bigint not null references modelos(id) on delete cascade,
+    exercicio_id bigint not null references exercicios(id),
+    ordem integer not null default 0,
+    tipo_serie text not null default 'linear',
+    descanso_seg integer,
+    combinado_com bigint references modelo_itens(id) on delete set null,
+    observacao text
+);
+create index if not exists modelo_itens_modelo_id_idx on modelo_itens(modelo_id);
+create index if not exists modelo_itens_exercicio_id_idx on modelo_itens(exercicio_id);
+create index if not exists modelo_itens_combinado_com_idx on modelo_itens(combinado_com);
+
+create table if not exists modelo_series (
+    id bigserial primary key,
+    modelo_item_id bigint not null references modelo_itens(id) on delete cascade,
+    numero integer not null,
+    repeticoes integer,
+    carga numeric
+);
+create index if not exists modelo_series_modelo_item_id_idx on modelo_series(modelo_item_id);
+
+-- Modelo em uso não pode ser apagado (os treinos vinculados ficariam vazios)
+alter table treinos
+    add column if not exists modelo_id bigint references modelos(id),
+    add column if not exists personalizado boolean not null default false;
+create index if not exists treinos_modelo_id_idx on treinos(modelo_id);
+
+-- Copia os itens do modelo para o treino (uma vez); devolve o mapa item do modelo → item do treino
+create or replace function materializar_treino(p_treino_id bigint, p_personalizar boolean default false)
+returns table (modelo_item_id bigint, treino_item_id bigint) language plpgsql as $$
+declare
+    alvo treinos;
+begin
+    select * into alvo from treinos where id = p_treino_id for update;
+    if not found then
+        raise exception 'treino % não existe', p_treino_id using errcode = 'P0002';
+    end if;
+    if p_personalizar and not alvo.personalizado then
+        update treinos set personalizado = true where id = p_treino_id;
+    end if;
+    -- Personalizado já tem itens próprios (mesmo que o professor tenha apagado todos)
+    if alvo.modelo_id is null or alvo.personalizado
+       or exists (select 1 from treino_itens where treino_id = p_treino_id) then
+        return;
+    end if;
+
+    drop table if exists _mat_itens;
+    create temporary table _mat_itens on commit drop as
+        select mi.id as velho, nextval(pg_get_serial_sequence('treino_itens', 'id')) as novo
+        from modelo_itens mi where mi.modelo_id = alvo.modelo_id;
+
+    insert into treino_itens (id, treino_id, exercicio_id, ordem, tipo_serie, descanso_seg,
+                              combinado_com, observacao)
+        select m.novo, p_treino_id, mi.exercicio_id, mi.ordem, mi.tipo_serie, mi.descanso_seg,
+               par.novo, mi.observacao
+        from _mat_itens m
+        join modelo_itens mi on mi.id = m.velho
+        left join _mat_itens par on par.velho = mi.combinado_com;
+
+    insert into series (treino_item_id, numero, repeticoes, carga)
+        select m.novo, ms.numero, ms.repeticoes, ms.carga
+        from _mat_itens m join modelo_series ms on ms.modelo_item_id = m.velho;
+
+    return query select velho, novo from _mat_itens;
+end $$;
+
+-- Mesma cópia de 20261018000003, agora levando modelo_id / personalizado:
+-- treino ainda fiel ao modelo é copiado só como vínculo
+create or replace function clonar_plano(p_plano_id bigint, p_mes text, p_nome text default null,
+                                        p_aluno_ids bigint[] default null)
+returns setof planos language plpgsql as $$
+declare
+    origem planos;
+begin
+    select * into origem from planos where id = p_plano_id;
+    if not found then
+        raise exception 'plano % não existe', p_plano_id using errcode = 'P0002';
+    end if;
+
+    drop table if exists _copia_planos, _copia_treinos, _copia_itens;
+    create temporary table _copia_planos on commit drop as
+        select a.aluno_id, nextval(pg_get_serial_sequence('planos', 'id')) as novo
+        from unnest(coalesce(p_aluno_ids, array[origem.aluno_id])) as a(aluno_id);
+    create temporary table _copia_treinos on commit drop as
+        select cp.novo as plano_novo, t.id as velho, nextval(pg_get_serial_sequence('treinos', 'id')) as novo,
+               t.modelo_id is not null and not t.personalizado as so_vinculo
+        from _copia_planos cp cross join treinos t
+        where t.plano_id = p_plano_id;
+    create temporary table _copia_itens on commit drop as
+        select ct.plano_novo, ct.novo as treino_novo, i.id as velho,
+               nextval(pg_get_serial_sequence('treino_itens', 'id')) as novo
+        from _copia_treinos ct join treino_itens i on i.treino_id = ct.velho
+        where not ct.so_vinculo;
+
+    insert into planos (id, aluno_id, nome, mes, ativo)
+        select novo, aluno_id, coalesce(p_nome, origem.nome), p_mes, true from _copia_planos;
+
+    insert into treinos (id, plano_id, nome, descricao, ordem, modelo_id, personalizado)
+        select ct.novo, ct.plano_novo, t.nome, t.descricao, t.ordem, t.modelo_id, t.personalizado
+        from _copia_treinos ct join treinos t on t.id = ct.velho;
+
+    insert into treino_itens (id, treino_id, exercicio_id, ordem, tipo_serie, descanso_seg,
+                              combinado_com, observacao)
+        select ci.novo, ci.treino_novo, i.exercicio_id, i.ordem, i.tipo_serie, i.descanso_seg,
+               par.novo, i.observacao
+        from _copia_itens ci
+        join treino_itens i on i.id = ci.velho
+        left join _copia_itens par on par.velho = i.combinado_com and par.plano_novo = ci.plano_novo;
+
+    insert into series (treino_item_id, numero, repeticoes, carga)
+        select ci.novo, s.numero, s.repeticoes, s.carga
+        from _copia_itens ci join series s on s.treino_item_id = ci.velho;
+
+    return query select p.* from planos p join _copia_planos cp on cp.novo = p.id order by p.id;
+end $$;
+
+commit;
@@ -0,0 +1,17 @@
+-- GymFlow — Índices da exportação incremental (exportar.py)
+-- A incremental lê cada tabela por cursor (created_at, id) a partir da marca
+-- d'água; sem o índice composto cada página vira uma varredura ordenada da
+-- tabela. historico_series e as tabelas de modelo vão pela PK e não precisam.
+
+begin;
+
+create index if not exists alunos_created_at_id_idx on alunos(created_at, id);
+create index if not exists exercicios_created_at_id_idx on exercicios(created_at, id);
+create index if not exists modelos_created_at_id_idx on modelos(created_at, id);
+create index if not exists planos_created_at_id_idx on planos(created_at, id);
+create index if not exists treinos_created_at_id_idx on treinos(created_at, id);
+create index if not exists treino_itens_created_at_id_idx on treino_itens(created_at, id);
+create index if not exists series_created_at_id_idx on series(created_at, id);
+create index if not exists historico_treinos_created_at_id_idx on historico_treinos(created_at, id);
+
+commit;
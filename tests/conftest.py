@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    """db apontado para um SQLite novo (db_local), sem cache de outro teste."""
+    import db
+    monkeypatch.setenv("GYMFLOW_SQLITE", str(tmp_path / "gymflow.db"))
+    db.get_client.clear()
+    db.limpar_cache()
+    yield db
+    db.get_client.clear()
+    db.limpar_cache()
@@ -0,0 +1,24 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "aluno-gymflow", "app.py")
+XSS = '<img src=x onerror="alert(1)">'
+
+
+def test_texto_do_professor_sai_escapado(banco, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # a fila local (gymflow_fila.db) fica no temporário
+    a = banco.salvar_aluno("Ana")
+    e = banco.salvar_exercicio(f"Supino {XSS}", "Peito")
+    p = banco.salvar_plano(a["id"], "Jan/2026", "2026-01")
+    t = banco.salvar_treino(p["id"], f"A {XSS}", "Peito", 0)
+    banco.salvar_item_com_series(dict(treino_id=t["id"], exercicio_id=e["id"], ordem=0, tipo_serie="linear",
+                                      descanso_seg=60, observacao=f"nota {XSS}"), [(12, 20)])
+
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    assert not at.exception
+    at.button[0].click().run()   # ▶ Iniciar treino: mostra o cabeçalho da sessão
+    assert not at.exception
+    html = "".join(m.value for m in at.markdown)
+    assert "Supino &lt;img" in html and "nota &lt;img" in html and "A &lt;img" in html
+    assert XSS not in html
@@ -0,0 +1,73 @@
+from streamlit.testing.v1 import AppTest
+
+
+def _script():
+    import streamlit as st
+    import db
+    db.nova_execucao()
+    # 1º rerun lê alunos; os seguintes, exercícios
+    if st.session_state.get("_gymflow_rerun", {}).get("execucao", 0) <= 1:
+        db.listar_alunos()
+    else:
+        db.listar_exercicios()
+
+
+def _lidos(at):
+    return [chave[0] for chave in at.session_state["_gymflow_rerun"]["lidos"]]
+
+
+def test_leituras_do_rerun_ficam_na_sessao(banco):
+    banco.salvar_aluno("Ana")
+    primeira = AppTest.from_function(_script).run()
+    assert not primeira.exception
+    assert _lidos(primeira) == ["listar_alunos"]
+
+    primeira.run()
+    assert primeira.session_state["_gymflow_rerun"]["execucao"] == 2
+    assert _lidos(primeira) == ["listar_exercicios"]   # o rerun anterior não fica
+
+    outra = AppTest.from_function(_script).run()
+    assert _lidos(outra) == ["listar_alunos"] and outra.session_state["_gymflow_rerun"]["execucao"] == 1
+
+
+def _script_ttl():
+    import streamlit as st
+    import db
+    db.nova_execucao()
+    antes = db.metricas_retry().get("chamadas", 0)
+    db.listar_alunos()
+    for k in list(db._cache):
+        db._cache[k] = (0, *db._cache[k][1:])   # TTL venceu no meio do rerun
+    db.listar_alunos()
+    st.session_state["consultas"] = db.metricas_retry()["chamadas"] - antes
+
+
+def test_rerun_nao_repete_consulta_com_ttl_vencido(banco):
+    at = AppTest.from_function(_script_ttl).run()
+    assert at.session_state["consultas"] == 1
+    at.run()   # rerun novo: o TTL vencido vale
+    assert at.session_state["consultas"] == 1
+
+
+def test_escrita_derruba_as_tags_lidas(banco):
+    a = banco.salvar_aluno("Ana")
+    e = banco.salvar_exercicio("Supino", "Peito")
+    p = banco.salvar_plano(a["id"], "Jan/2026", "2026-01")
+    t = banco.salvar_treino(p["id"], "A", "Peito", 0)
+    assert banco.listar_alunos()["nome"].tolist() == ["Ana"]
+    assert banco.carregar_ficha(p["id"])[0]["itens"] == []
+
+    antes = banco.metricas_retry()["chamadas"]
+    banco.listar_alunos()
+    banco.carregar_ficha(p["id"])
+    assert banco.metricas_retry()["chamadas"] == antes   # sem escrita, vem do cache
+
+    banco.salvar_aluno("Bia")
+    banco.salvar_item(t["id"], e["id"], 0, "linear", 60)
+    assert banco.listar_alunos()["nome"].tolist() == ["Ana", "Bia"]
+    assert [it["exercicio_id"] for it in banco.carregar_ficha(p["id"])[0]["itens"]] == [e["id"]]
+
+    banco.atualizar_exercicio(e["id"], "Supino reto", "Peito")
+    assert banco.listar_exercicios()["nome"].tolist() == ["Supino reto"]
+    banco.excluir_plano(p["id"])
+    assert banco.listar_planos(a["id"]).empty and banco.carregar_ficha(p["id"]) == []
@@ -0,0 +1,48 @@
+import pytest
+
+
+def _plano(banco):
+    a = banco.salvar_aluno("Ana")
+    b = banco.salvar_aluno("Bia")
+    ex = [banco.salvar_exercicio(f"E{i}", "Peito")["id"] for i in range(4)]
+    p = banco.salvar_plano(a["id"], "Jan/2026", "2026-01")
+    # Dois treinos e três itens com a mesma ordem; o 2º item é bi-set do 1º
+    t1 = banco.salvar_treino(p["id"], "A", "", 0)
+    t2 = banco.salvar_treino(p["id"], "B", "", 0)
+    i1 = banco.salvar_item_com_series(dict(treino_id=t1["id"], exercicio_id=ex[0], ordem=0,
+                                           tipo_serie="linear", descanso_seg=60), [(10, 40), (8, 45)])
+    banco.salvar_item_com_series(dict(treino_id=t1["id"], exercicio_id=ex[1], ordem=0, tipo_serie="linear",
+                                      descanso_seg=60, combinado_com=i1["id"]), [(12, 20)])
+    banco.salvar_item_com_series(dict(treino_id=t1["id"], exercicio_id=ex[2], ordem=0,
+                                      tipo_serie="linear", descanso_seg=60), [(15, None)])
+    banco.salvar_item_com_series(dict(treino_id=t2["id"], exercicio_id=ex[3], ordem=0,
+                                      tipo_serie="linear", descanso_seg=90), [(6, 100)])
+    return p, [a["id"], b["id"]]
+
+
+def _resumo(ficha):
+    """Ficha sem ids nem ordem: treino → (exercício, exercício do par do bi-set, séries)."""
+    por_id = {it["id"]: it for t in ficha for it in t["itens"]}
+    return [(t["nome"], [(it["exercicio_id"],
+                          por_id[it["combinado_com"]]["exercicio_id"] if it["combinado_com"] else None,
+                          [(s["numero"], s["repeticoes"], s["carga"]) for s in it["series"]])
+                         for it in t["itens"]])
+            for t in ficha]
+
+
+@pytest.mark.parametrize("invertido", [False, True])
+def test_copia_em_lote_igual_a_do_rpc(banco, monkeypatch, invertido):
+    p, alunos = _plano(banco)
+    original = _resumo(banco.carregar_ficha(p["id"]))
+    pelo_rpc = banco.clonar_plano(p["id"], "2026-02", alunos)
+
+    banco.get_client()._rpcs.pop("clonar_plano")   # servidor sem a migração
+    if invertido:
+        # O PostgREST não garante a ordem das linhas devolvidas
+        inserir = banco.bulk_insert
+        monkeypatch.setattr(banco, "bulk_insert", lambda *a, **kw: inserir(*a, **kw)[::-1])
+    em_lote = banco.clonar_plano(p["id"], "2026-03", alunos)
+
+    assert sorted(c["aluno_id"] for c in em_lote) == sorted(alunos)
+    for copia in pelo_rpc + em_lote:
+        assert _resumo(banco.carregar_ficha(copia["id"])) == original
@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+import exportar
+
+
+def test_horas_restauradas_com_milissegundos(banco):
+    coluna = pa.chunked_array([pa.array([datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+                                         datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)],
+                                        pa.timestamp("us", tz="UTC"))])
+    assert exportar._sqlite(coluna) == ["2026-01-02T03:04:05.123Z", "2026-01-02T03:04:05.000Z"]
+    # mesmo formato do default de created_at
+    agora = banco.get_client().conn.execute("select strftime('%Y-%m-%dT%H:%M:%fZ', 'now')").fetchone()[0]
+    assert len(agora) == len("2026-01-02T03:04:05.123Z") and agora[19] == "."
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+
+import fila as filamod
+
+
+@pytest.fixture
+def ficha(banco):
+    a = banco.salvar_aluno("Ana")
+    e = banco.salvar_exercicio("Supino", "Peito")
+    p = banco.salvar_plano(a["id"], "Jan/2026", "2026-01")
+    t = banco.salvar_treino(p["id"], "A", "Peito", 0)
+    it = banco.salvar_item_com_series(dict(treino_id=t["id"], exercicio_id=e["id"], ordem=0,
+                                           tipo_serie="linear", descanso_seg=60), [(12, None)])
+    return a["id"], t["id"], it["id"]
+
+
+def _esvaziar(f):
+    while f.descarregar():
+        pass
+
+
+def test_linha_recusada_nao_trava_a_fila(banco, ficha):
+    aluno_id, treino_id, item_id = ficha
+    f = filamod.FilaEscrita(":memory:", lote=3)
+    s = f.iniciar_treino(aluno_id, treino_id)
+    f.registrar_serie(s, item_id, 1, 12, 20)
+    f.registrar_serie(s, 999_999, 2, 10, 20)      # item que não existe mais (23503)
+    f.registrar_serie(s, item_id, 3, 8, 25)
+    f.finalizar_treino(s)
+    ruim = f.iniciar_treino(aluno_id, 999_999)     # treino apagado: a sessão inteira é recusada
+    f.registrar_serie(ruim, item_id, 1, 12, 20)
+    depois = f.iniciar_treino(aluno_id, treino_id)
+    f.registrar_serie(depois, item_id, 1, 12, 20)
+
+    _esvaziar(f)
+
+    assert f.pendentes() == 0
+    conn = banco.get_client().conn
+    assert conn.execute("select count(*) from historico_series").fetchone()[0] == 3
+    assert conn.execute("select count(*) from historico_treinos").fetchone()[0] == 2
+    rejeitados = f.rejeitados()
+    assert [(r["tipo"], r["sessao"]) for r in rejeitados] == [("serie", s), ("treino", ruim), ("serie", ruim)]
+    assert all(r["erro"] for r in rejeitados)
+
+    assert f.reenviar_rejeitados() == 3 and f.pendentes() == 3
+    _esvaziar(f)
+    assert len(f.rejeitados()) == 3
+    assert f.descartar_rejeitados() == 3 and f.rejeitados() == []
+
+
+def test_erro_passageiro_mantem_na_fila(banco, ficha, monkeypatch):
+    aluno_id, treino_id, item_id = ficha
+    f = filamod.FilaEscrita(":memory:")
+    f.registrar_serie(f.iniciar_treino(aluno_id, treino_id), item_id, 1, 12, 20)
+
+    def sem_rede(linhas):
+        raise httpx.ConnectError("sem rede")
+    monkeypatch.setattr(filamod.db, "sincronizar_treinos_executados", sem_rede)
+    with pytest.raises(httpx.ConnectError):
+        f.descarregar()
+    assert f.pendentes() == 2 and f.rejeitados() == []
+
+    monkeypatch.undo()
+    _esvaziar(f)
+    assert f.pendentes() == 0 and f.rejeitados() == []
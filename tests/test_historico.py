@@ -0,0 +1,23 @@
+import analytics
+
+
+def test_historico_sobrevive_a_exclusao_do_plano(banco):
+    a = banco.salvar_aluno("Ana")
+    e = banco.salvar_exercicio("Supino", "Peito")
+    p = banco.salvar_plano(a["id"], "Jan/2026", "2026-01")
+    t = banco.salvar_treino(p["id"], "A", "Peito", 0)
+    it = banco.salvar_item_com_series(dict(treino_id=t["id"], exercicio_id=e["id"], ordem=0,
+                                           tipo_serie="linear", descanso_seg=60), [(10, 40)])
+    h = banco.iniciar_treino(a["id"], t["id"])
+    banco.registrar_serie_executada(h["id"], it["id"], 1, 10, 40)
+    banco.registrar_serie_executada(h["id"], it["id"], 2, 8, 45)
+
+    banco.excluir_plano(p["id"])
+    linhas = banco.get_client().conn.execute("select treino_item_id, exercicio_id from historico_series").fetchall()
+    assert [tuple(r) for r in linhas] == [(None, e["id"]), (None, e["id"])]
+    banco.recalcular_progresso()
+
+    series = analytics.carregar_series(a["id"])
+    assert series["exercicio"].tolist() == ["Supino", "Supino"]
+    sem = analytics.carregar_progresso(a["id"])
+    assert sem["exercicio"].tolist() == ["Supino"] and int(sem["series"].iloc[0]) == 2
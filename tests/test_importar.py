@@ -0,0 +1,29 @@
+import io
+
+import importar
+
+
+def _csv(texto):
+    return io.BytesIO(texto.encode("utf-8"))
+
+
+def test_aluno_sem_email_no_banco(banco):
+    banco.salvar_aluno("Beto")
+    banco.salvar_aluno("Caio", "caio@x.com")
+    r = importar.importar("alunos", _csv("nome,email\nAna,ana@x.com\nBeto,\n"), nome="a.csv")
+    assert r["erros"] == []
+    assert (r["novas"], r["atualizadas"], r["sem_mudanca"]) == (1, 0, 1)
+
+    r = importar.importar("planos", _csv("aluno,mes\nBeto,2026-10\nana@x.com,2026-10\n"), nome="p.csv")
+    assert r["erros"] == [] and r["novas"] == 2
+
+
+def test_exercicio_sem_descricao_reimportado_sem_mudanca(banco):
+    banco.salvar_exercicio("Supino reto", "Peito")
+    banco.salvar_exercicio("Agachamento", "Pernas", "Barra livre")
+    arquivo = "nome,grupo,descricao\nSupino reto,Peito,\nRemada,Costas,\n"
+    r = importar.importar("exercicios", _csv(arquivo), nome="e.csv")
+    assert (r["novas"], r["atualizadas"], r["sem_mudanca"]) == (1, 0, 1)
+
+    r = importar.importar("exercicios", _csv(arquivo), nome="e.csv")
+    assert (r["novas"], r["atualizadas"], r["sem_mudanca"]) == (0, 0, 2)
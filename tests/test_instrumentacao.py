@@ -0,0 +1,41 @@
+import asyncio
+
+from streamlit.testing.v1 import AppTest
+
+
+def _funcoes(db, inicio):
+    return [(r["funcao"], r["tabela"]) for r in list(db._registros)[inicio:]]
+
+
+def test_helpers_registram_a_funcao_publica(banco):
+    import db_async
+    db = banco
+    db.salvar_aluno("Ana")
+    inicio = len(db._registros)
+    list(db.iter_alunos())
+    list(db.iter_historico_series([1]))
+    db.mapa_itens_exercicio([1])
+    asyncio.run(db_async.bulk_insert("alunos", [{"nome": "Bia"}]))
+    assert _funcoes(db, inicio) == [("pagina_alunos", "alunos"), ("iter_historico_series", "historico_series"),
+                                    ("mapa_itens_exercicio", "treino_itens"), ("bulk_insert", "alunos")]
+
+
+def _script():
+    import streamlit as st
+    import db
+    db.nova_execucao()
+    db.medir_bytes(st.session_state.get("medir", False))
+    inicio = len(db._registros)
+    db.listar_alunos.sem_cache()
+    st.session_state["bytes"] = [r["bytes"] for r in list(db._registros)[inicio:]]
+
+
+def test_medir_bytes_vale_so_para_a_sessao(banco):
+    banco.salvar_aluno("Ana")
+    medindo = AppTest.from_function(_script)
+    medindo.session_state["medir"] = True
+    medindo.run()
+    outra = AppTest.from_function(_script).run()
+    assert medindo.session_state["bytes"][0] > 0
+    assert outra.session_state["bytes"] == [None]
+    assert banco._perfil["bytes"] is False
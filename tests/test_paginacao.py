@@ -0,0 +1,22 @@
+def test_keyset_com_chaves_repetidas(banco):
+    # Nomes repetidos (e com vírgula/aspas, que vão para o filtro or=) desempatam pelo id
+    nomes = ["Bia", "Ana", 'Ana, "A"', "Ana", "Bia", "Ana", 'Ana, "A"']
+    ids = [banco.salvar_aluno(n)["id"] for n in nomes]
+    esperado = [i for _, i in sorted(zip(nomes, ids))]
+    for tamanho in (1, 2, 3, 7):
+        vistos = [i for df in banco.iter_alunos(page_size=tamanho) for i in df["id"].tolist()]
+        assert vistos == esperado
+
+
+def test_keyset_descendente_com_mes_repetido(banco):
+    a = banco.salvar_aluno("Ana")
+    planos = [banco.salvar_plano(a["id"], f"P{i}", mes)["id"]
+              for i, mes in enumerate(["2026-01", "2026-02", "2026-01", "2026-02", "2026-01"])]
+    esperado = [planos[i] for i in (3, 1, 4, 2, 0)]   # mês desc, id desc
+    cursor, vistos = None, []
+    while True:
+        df, cursor = banco.pagina_planos.sem_cache(apos=cursor, page_size=2)
+        vistos += df["id"].tolist()
+        if cursor is None:
+            break
+    assert vistos == esperado
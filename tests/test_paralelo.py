@@ -0,0 +1,37 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+
+def _script():
+    import threading
+    import streamlit as st
+    import db
+    db.nova_execucao()
+
+    def na_thread():
+        # Precisa da sessão (st.session_state) e do rótulo de quem pediu
+        return threading.current_thread().name, db._rotulo.get(), db._rerun()["execucao"], len(db.listar_alunos())
+
+    with db.rotulo("aba"):
+        st.session_state["res"] = db.em_paralelo(na_thread, na_thread, na_thread)
+
+
+def test_em_paralelo_leva_a_sessao(banco):
+    banco.salvar_aluno("Ana")
+    at = AppTest.from_function(_script).run()
+    assert not at.exception
+    res = at.session_state["res"]
+    assert [r[1:] for r in res] == [("aba", 1, 1)] * 3
+    assert all(nome.startswith("gymflow-leitura") for nome, *_ in res)
+    at.run()
+    assert [r[2] for r in at.session_state["res"]] == [2, 2, 2]
+
+
+def test_em_paralelo_fora_do_streamlit(banco):
+    banco.salvar_aluno("Ana")
+
+    def falha():
+        raise ValueError("boom")
+    assert [len(df) for df in banco.em_paralelo(banco.listar_alunos, banco.listar_alunos)] == [1, 1]
+    with pytest.raises(ValueError, match="boom"):
+        banco.em_paralelo(banco.listar_alunos, falha)
@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import pytest
+from postgrest.exceptions import APIError
+
+import db
+
+
+class Relogio:
+    """Substitui db.time_module: o tempo só anda com sleep()."""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.dormidas = []
+
+    def monotonic(self):
+        return self.agora
+
+    perf_counter = time = monotonic
+
+    def sleep(self, s):
+        self.dormidas.append(s)
+        self.agora += s
+
+
+class Consulta:
+    """Query falsa: devolve ou levanta, em ordem, os resultados dados."""
+
+    def __init__(self, tabela, *resultados):
+        self.tabela = tabela
+        self.resultados = list(resultados)
+        self.execucoes = 0
+
+    def execute(self):
+        self.execucoes += 1
+        r = self.resultados.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return SimpleNamespace(data=r)
+
+
+def _erro(code):
+    return APIError({"message": "erro", "code": code, "hint": None, "details": None})
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = Relogio()
+    monkeypatch.setattr(db, "time_module", r)
+    monkeypatch.setattr(db.random, "uniform", lambda a, b: b)   # jitter no teto
+    monkeypatch.setattr(db, "_disjuntores", {})
+    return r
+
+
+def test_backoff_exponencial_ate_o_teto(relogio):
+    q = Consulta("t_backoff", _erro("503"), _erro("503"), _erro("503"), [{"id": 1}])
+    resp = db._retry(q, db.RetryPolicy(tentativas=4, base=0.5, teto=1.5))
+    assert resp.data == [{"id": 1}]
+    assert relogio.dormidas == [0.5, 1.0, 1.5]
+    assert db._disjuntor("t_backoff").falhas == 0
+
+
+def test_classifica_transitorios():
+    politica = db.RetryPolicy()
+    # Resposta 5xx sem JSON: o postgrest monta o APIError com o status (int) no code
+    assert politica.transitorio(_erro(502))
+    assert politica.transitorio(_erro(429))
+    assert politica.transitorio(_erro("40P01"))
+    assert politica.transitorio(_erro("08006"))
+    assert not politica.transitorio(_erro(404))
+    assert not politica.transitorio(_erro("23505"))
+    assert not politica.transitorio(KeyError("id"))
+
+
+def test_5xx_sem_json_e_repetido(relogio):
+    q = Consulta("t_502", _erro(502), [])
+    assert db._retry(q).data == []
+    assert q.execucoes == 2 and len(relogio.dormidas) == 1
+
+
+def test_so_resposta_do_servidor_zera_o_disjuntor(relogio):
+    disjuntor = db._disjuntor("t_reset")
+    disjuntor.falhas = 3
+    with pytest.raises(TypeError):
+        db._retry(Consulta("t_reset", TypeError("bug nosso")))
+    assert disjuntor.falhas == 3
+    with pytest.raises(APIError):
+        db._retry(Consulta("t_reset", _erro("23505")))
+    assert disjuntor.falhas == 0
+
+
+def test_disjuntor_aberto_meio_aberto_fechado(relogio):
+    disjuntor = db._disjuntores["t_disj"] = db.CircuitBreaker(limite=2, esfriar=30.0)
+    uma = db.RetryPolicy(tentativas=1)
+    for _ in range(2):
+        with pytest.raises(APIError):
+            db._retry(Consulta("t_disj", _erro("503")), uma)
+
+    # aberto: falha na hora, sem ir ao servidor
+    q = Consulta("t_disj", [])
+    with pytest.raises(db.CircuitoAberto):
+        db._retry(q, uma)
+    assert q.execucoes == 0
+
+    # esfriou: passa uma sonda; enquanto ela roda, as demais seguem barradas
+    relogio.agora += 30.0
+    barradas = []
+
+    class Sonda(Consulta):
+        def execute(self):
+            barradas.append(not disjuntor.permitir())
+            return super().execute()
+
+    assert db._retry(Sonda("t_disj", [{"id": 1}]), uma).data == [{"id": 1}]
+    assert barradas == [True]
+
+    # fechado: a sonda deu certo
+    assert disjuntor.falhas == 0
+    assert db._retry(Consulta("t_disj", []), uma).data == []
+
+
+def test_async_usa_a_mesma_decisao(relogio, monkeypatch):
+    import asyncio
+    import db_async
+    dormidas = []
+
+    async def dormir(s):
+        dormidas.append(s)
+    monkeypatch.setattr(db_async.asyncio, "sleep", dormir)
+    disjuntor = db._disjuntor("t_async")
+    disjuntor.falhas = 2
+    with pytest.raises(KeyError):
+        asyncio.run(db_async._retry(Consulta("t_async", KeyError("id"))))
+    assert disjuntor.falhas == 2
+    q = Consulta("t_async", _erro(502), [{"id": 1}])
+    assert asyncio.run(db_async._retry(q)).data == [{"id": 1}]
+    assert dormidas == [0.2] and disjuntor.falhas == 0